@@ -0,0 +1,95 @@
+import os
+import time
+import hashlib
+import tempfile
+from app.core.metrics import metrics
+
+# --- CONFIGURAZIONE RETENTION (0 = nessun limite) ---
+OUTPUT_RETENTION = {
+    "max_files": int(os.getenv("OUTPUT_RETENTION_FILES", "200")),
+    "max_age_s": float(os.getenv("OUTPUT_RETENTION_DAYS", "30")) * 86400,
+    "max_bytes": int(float(os.getenv("OUTPUT_RETENTION_MB", "500")) * 1024 * 1024),
+}
+LOG_RETENTION = {
+    "max_files": int(os.getenv("LOG_RETENTION_FILES", "100")),
+    "max_age_s": float(os.getenv("LOG_RETENTION_DAYS", "14")) * 86400,
+    "max_bytes": int(float(os.getenv("LOG_RETENTION_MB", "100")) * 1024 * 1024),
+}
+
+HASH_CHARS = 10
+
+
+def write_artifact(directory, stem, suffix, chunks, session_id=""):
+    """
+    Scrive un artefatto con nome `{stem}_{session}_{hash}{suffix}`.
+    I chunk (str o bytes) sono scritti in streaming su un file temporaneo e
+    hashati al volo; se esiste già un file con lo stesso contenuto (stesso nome)
+    il temporaneo viene scartato e il file esistente non è riscritto.
+    Ritorna il percorso finale.
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                digest.update(data)
+                f.write(data)
+        name = "_".join(part for part in (stem, session_id, digest.hexdigest()[:HASH_CHARS]) if part)
+        final_path = os.path.join(directory, name + suffix)
+        if os.path.exists(final_path):
+            metrics.incr("artifacts_unchanged")
+            os.remove(tmp_path)
+        else:
+            # Rename atomico: nessun lettore vede un file scritto a metà
+            os.replace(tmp_path, final_path)
+            metrics.incr("artifacts_written")
+        return final_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def enforce_retention(directory, max_files=0, max_age_s=0, max_bytes=0, keep=(), prefix=""):
+    """
+    Elimina i file più vecchi (per mtime) finché la cartella rispetta età massima,
+    numero massimo di file e dimensione totale. Con `prefix` considera solo i file
+    il cui nome inizia così (gli altri, es. file condivisi, non contano e non vengono toccati).
+    I percorsi in `keep` non vengono toccati. Ritorna il numero di file rimossi.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    keep = {os.path.abspath(path) for path in keep if path}
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False) and entry.name.startswith(prefix):
+                stat = entry.stat(follow_symlinks=False)
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort(reverse=True)  # più recenti prima
+
+    now = time.time()
+    kept_files = 0
+    kept_bytes = 0
+    removed = 0
+    for mtime, size, path in entries:
+        protected = os.path.abspath(path) in keep
+        expired = (
+            (max_age_s and now - mtime > max_age_s)
+            or (max_files and kept_files >= max_files)
+            or (max_bytes and kept_bytes + size > max_bytes)
+        )
+        if expired and not protected:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            continue
+        kept_files += 1
+        kept_bytes += size
+    if removed:
+        metrics.incr("artifacts_pruned", removed)
+    return removed
@@ -0,0 +1,134 @@
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from app.core.utils import norm_text
+
+# Mesi italiani e inglesi, nomi completi e abbreviazioni
+MONTHS = {
+    "gennaio": 1, "gen": 1, "january": 1, "jan": 1,
+    "febbraio": 2, "feb": 2, "february": 2,
+    "marzo": 3, "mar": 3, "march": 3,
+    "aprile": 4, "apr": 4, "april": 4,
+    "maggio": 5, "mag": 5, "may": 5,
+    "giugno": 6, "giu": 6, "june": 6, "jun": 6,
+    "luglio": 7, "lug": 7, "july": 7, "jul": 7,
+    "agosto": 8, "ago": 8, "august": 8, "aug": 8,
+    "settembre": 9, "set": 9, "sett": 9, "september": 9, "sep": 9, "sept": 9,
+    "ottobre": 10, "ott": 10, "october": 10, "oct": 10,
+    "novembre": 11, "nov": 11, "november": 11,
+    "dicembre": 12, "dic": 12, "december": 12, "dec": 12,
+}
+WEEKDAYS = {
+    "lunedi": 0, "monday": 0,
+    "martedi": 1, "tuesday": 1,
+    "mercoledi": 2, "wednesday": 2,
+    "giovedi": 3, "thursday": 3,
+    "venerdi": 4, "friday": 4,
+    "sabato": 5, "saturday": 5,
+    "domenica": 6, "sunday": 6,
+}
+RELATIVE_DAYS = {"oggi": 0, "today": 0, "domani": 1, "tomorrow": 1, "dopodomani": 2}
+UNIT_DAYS = {"giorno": 1, "giorni": 1, "day": 1, "days": 1, "settimana": 7, "settimane": 7, "week": 7, "weeks": 7}
+
+_ISO = re.compile(r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})")
+_NUMERIC = re.compile(r"(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{2}|\d{4}))?")  # giorno/mese[/anno]
+_DAY_MONTH = re.compile(r"(\d{1,2})(?:°|o)?\s+([a-z]+)\.?(?:\s+(\d{4}))?")  # 1 marzo [2027]
+_MONTH_DAY = re.compile(r"([a-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?(?:\s+(\d{4}))?")  # march 1[, 2027]
+_IN_UNITS = re.compile(r"(?:tra|fra|in|\+)\s*(\d{1,3})\s*([a-z]*)")  # tra 3 giorni / in 2 weeks / +5
+_WEEKDAY = re.compile(r"(?:(?:next|prossimo|prossima)\s+)?([a-z]+)(?:\s+(?:prossimo|prossima))?")
+
+
+def _safe_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _without_year(month, day, today):
+    """Data senza anno: la prossima occorrenza (anno corrente o successivo)."""
+    parsed = _safe_date(today.year, month, day)
+    if parsed and parsed < today:
+        parsed = _safe_date(today.year + 1, month, day)
+    return parsed
+
+
+def _with_year(year, month, day, today):
+    if year is None:
+        return _without_year(month, day, today)
+    year = int(year)
+    return _safe_date(year + 2000 if year < 100 else year, month, day)
+
+
+@lru_cache(maxsize=1024)
+def _parse(text: str, today: date):
+    match = _ISO.fullmatch(text)
+    if match:
+        return _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    match = _NUMERIC.fullmatch(text)
+    if match:
+        return _with_year(match.group(3), int(match.group(2)), int(match.group(1)), today)
+
+    match = _DAY_MONTH.fullmatch(text)
+    if match and match.group(2) in MONTHS:
+        return _with_year(match.group(3), MONTHS[match.group(2)], int(match.group(1)), today)
+
+    match = _MONTH_DAY.fullmatch(text)
+    if match and match.group(1) in MONTHS:
+        return _with_year(match.group(3), MONTHS[match.group(1)], int(match.group(2)), today)
+
+    if text in RELATIVE_DAYS:
+        return today + timedelta(days=RELATIVE_DAYS[text])
+
+    match = _IN_UNITS.fullmatch(text)
+    if match and (match.group(2) or "giorni") in UNIT_DAYS:
+        return today + timedelta(days=int(match.group(1)) * UNIT_DAYS[match.group(2) or "giorni"])
+
+    match = _WEEKDAY.fullmatch(text)
+    if match and match.group(1) in WEEKDAYS:
+        # Prossimo giorno della settimana indicato (mai oggi)
+        ahead = (WEEKDAYS[match.group(1)] - today.weekday()) % 7 or 7
+        return today + timedelta(days=ahead)
+    return None
+
+
+def parse_date(raw_text, today: date = None):
+    """
+    Data da input libero, None se non interpretabile. Formati supportati:
+    ISO ("2027-03-01"), numerico giorno/mese ("01/03", "1.3.2027"),
+    testuale IT/EN ("1 marzo", "1° mar 2027", "March 1"), relativo
+    ("domani", "tra 3 giorni", "in 2 weeks", "venerdì prossimo").
+    Le date senza anno sono la prossima occorrenza. Risultati memoizzati.
+    """
+    text = re.sub(r"\s+", " ", norm_text(str(raw_text or "")))
+    if not text:
+        return None
+    return _parse(text, today or date.today())
+
+
+def to_iso(raw_text, today: date = None):
+    """Come parse_date, ma in formato YYYY-MM-DD (None se non valida)."""
+    parsed = parse_date(raw_text, today)
+    return parsed.isoformat() if parsed else None
+
+
+def validate_trip_dates(depart_text, return_text="", today: date = None):
+    """
+    Controllo delle date di viaggio prima di qualsiasi chiamata di rete.
+    Ritorna (andata ISO, ritorno ISO o "", errore o None).
+    """
+    today = today or date.today()
+    depart = parse_date(depart_text, today)
+    if depart is None:
+        return None, "", f"Data andata non valida: '{depart_text}'"
+    if depart < today:
+        return None, "", f"Data andata nel passato: {depart.isoformat()}"
+    if not str(return_text or "").strip():
+        return depart.isoformat(), "", None
+    ret = parse_date(return_text, today)
+    if ret is None:
+        return depart.isoformat(), "", f"Data ritorno non valida: '{return_text}'"
+    if ret < depart:
+        return depart.isoformat(), "", f"Data ritorno ({ret.isoformat()}) precedente all'andata ({depart.isoformat()})"
+    return depart.isoformat(), ret.isoformat(), None
@@ -0,0 +1,60 @@
+from app.core.metrics import metrics
+
+
+class ItineraryDelta:
+    """
+    Aggiornamento parziale dell'itinerario: solo i giorni cambiati, per day_number.
+    I giorni non toccati restano gli stessi oggetti dello stato precedente
+    (condivisi, mai copiati): il costo di un passo del grafo dipende dai giorni
+    modificati, non dalla lunghezza del viaggio.
+    """
+
+    __slots__ = ("days",)
+
+    def __init__(self, days):
+        self.days = {day.get("day_number"): day for day in days}
+
+    def __len__(self):
+        return len(self.days)
+
+    def apply(self, itinerary):
+        merged = []
+        seen = set()
+        for day in itinerary or []:
+            day_number = day.get("day_number")
+            merged.append(self.days.get(day_number, day))
+            seen.add(day_number)
+        merged.extend(day for day_number, day in self.days.items() if day_number not in seen)
+        return merged
+
+
+def diff_itinerary(before, after):
+    """
+    Delta dei soli giorni diversi tra `before` e `after`.
+    Se cambia l'insieme dei giorni (giorni rimossi o rinumerati) ritorna `after` intero.
+    """
+    before_by_day = {day.get("day_number"): day for day in before or []}
+    after = list(after or [])
+    if not before_by_day or set(before_by_day) != {day.get("day_number") for day in after}:
+        return after
+    return ItineraryDelta(
+        day for day in after
+        if before_by_day[day.get("day_number")] is not day and before_by_day[day.get("day_number")] != day
+    )
+
+
+def merge_itinerary(current, update):
+    """Reducer LangGraph: una lista sostituisce l'itinerario, un ItineraryDelta lo aggiorna per giorni."""
+    if isinstance(update, ItineraryDelta):
+        metrics.incr("itinerary_delta_updates")
+        metrics.incr("itinerary_delta_days", len(update))
+        return update.apply(current)
+    return update
+
+
+def apply_update(state: dict, update: dict):
+    """Come `state.update(update)`, ma con il reducer dell'itinerario (nodi invocati fuori dal grafo)."""
+    if "itinerary" in update:
+        update = {**update, "itinerary": merge_itinerary(state.get("itinerary"), update["itinerary"])}
+    state.update(update)
+    return state
@@ -6,9 +6,11 @@ import time
 import random
 import inspect
 import shutil
+import threading
 from datetime import datetime
 from colorama import Fore, Style, init
-from app.core.utils import typing_print
+from app.core.utils import typing_print, TYPING_EFFECT
+from app.core.artifacts import enforce_retention, LOG_RETENTION
 
 # Inizializza colorama
 init(autoreset=True)
@@ -20,12 +22,14 @@ class TravelLogger:
         self.node_start_time = time.time()     # Timer per calcolare la latenza (Span)
         
         self.LOG_DIR = "logs"
-        if not os.path.exists(self.LOG_DIR):
-            os.makedirs(self.LOG_DIR)
-        
+        # False nei processi figli (es. DOCX nel process pool): solo console, niente file né retention
+        self.file_enabled = True
+        self._file_ready = False
+        self._file_lock = threading.Lock()
+
         self.session_file = os.path.join(
             self.LOG_DIR, 
-            f"log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+            f"log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{self.trace_id}.txt"
         )
         
         # Colori Originali
@@ -49,9 +53,13 @@ class TravelLogger:
             "init_node": "INIT"
         }
 
-        self._init_log_file()
+    def disable_file(self):
+        """Log solo a console: per i processi figli, che non devono aprire sessioni proprie."""
+        self.file_enabled = False
 
     def _init_log_file(self):
+        """File di sessione creato alla prima scrittura (un processo figlio importa il logger senza usarlo)."""
+        os.makedirs(self.LOG_DIR, exist_ok=True)
         header = f"""
 {'='*60}
 TRAVEL AGENT AI ARCHITECT - SESSIONE AVVIATA
@@ -62,6 +70,9 @@ Trace ID: {self.trace_id}
 """
         with open(self.session_file, "w", encoding="utf-8") as f:
             f.write(header + "\n")
+        self._file_ready = True
+        # Retention dei log delle sessioni precedenti (la sessione corrente è sempre conservata)
+        enforce_retention(self.LOG_DIR, keep=[self.session_file], **LOG_RETENTION)
 
     def _calculate_latency(self):
         """Calcola i ms passati dall'ultimo evento (Attributes - Slide 18)"""
@@ -80,6 +91,12 @@ Trace ID: {self.trace_id}
         return " " * pad_len
 
     def _write(self, content):
+        if not self.file_enabled:
+            return
+        if not self._file_ready:
+            with self._file_lock:
+                if not self._file_ready:
+                    self._init_log_file()
         clean_content = self._strip_ansi(content)
         with open(self.session_file, "a", encoding="utf-8") as f:
             f.write(clean_content + "\n")
@@ -141,11 +158,14 @@ Trace ID: {self.trace_id}
         header_text = f"[{timestamp}] {node_name} {icon} [{event_type}]"
         print(f"{prefix}{tab_pad}{color}{header_text}{Style.RESET_ALL}")
         
-        for char in message:
-            sys.stdout.write(char)
-            sys.stdout.flush()
-            delay = 0.01 if event_type == "THOUGHT" else 0.004
-            time.sleep(delay + random.uniform(0, 0.01))
+        if TYPING_EFFECT:
+            for char in message:
+                sys.stdout.write(char)
+                sys.stdout.flush()
+                delay = 0.01 if event_type == "THOUGHT" else 0.004
+                time.sleep(delay + random.uniform(0, 0.01))
+        else:
+            sys.stdout.write(message)
         
         print(f"{Style.RESET_ALL}")
         self._write(f"[{timestamp}] --- {node_name} --- {latency}ms --- {icon} [{event_type}] {message}")
@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import defaultdict
+
+
+class RunMetrics:
+    """
+    Contatori di sessione condivisi tra nodi e tool.
+    Tiene traccia dell'uso token LLM per nodo (prompt/completion/caratteri),
+    dei tempi per fase (es. formato report) e permette di imporre un tetto di spesa (LLM_TOKEN_BUDGET).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.token_budget = int(os.getenv("LLM_TOKEN_BUDGET", "0") or 0)  # 0 = nessun limite
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = defaultdict(int)
+            self.llm_usage = {}
+            self.timings = {}
+
+    # --- Contatori generici ---
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    # --- Tempi ---
+    def record_time(self, name, seconds):
+        """Accumula la durata di una fase: chiamate, totale e ultimo valore in ms."""
+        with self._lock:
+            entry = self.timings.setdefault(name, {"calls": 0, "total_ms": 0.0, "last_ms": 0.0})
+            entry["calls"] += 1
+            entry["last_ms"] = round(seconds * 1000, 3)
+            entry["total_ms"] = round(entry["total_ms"] + seconds * 1000, 3)
+
+    # --- Token accounting ---
+    def record_llm_call(self, node_name, prompt_text, response):
+        """
+        Registra una chiamata LLM. I token arrivano da `usage_metadata` (LangChain);
+        se il provider non li riporta si stimano dai caratteri (~4 char/token).
+        """
+        completion_text = getattr(response, "content", "") or ""
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens")
+        completion_tokens = usage.get("output_tokens")
+        if prompt_tokens is None:
+            prompt_tokens = len(prompt_text) // 4
+        if completion_tokens is None:
+            completion_tokens = len(completion_text) // 4
+
+        with self._lock:
+            entry = self.llm_usage.setdefault(node_name, {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "prompt_chars": 0,
+                "completion_chars": 0,
+            })
+            entry["calls"] += 1
+            entry["prompt_tokens"] += int(prompt_tokens)
+            entry["completion_tokens"] += int(completion_tokens)
+            entry["prompt_chars"] += len(prompt_text)
+            entry["completion_chars"] += len(completion_text)
+            return dict(entry)
+
+    def total_tokens(self):
+        with self._lock:
+            return sum(e["prompt_tokens"] + e["completion_tokens"] for e in self.llm_usage.values())
+
+    def token_budget_exhausted(self):
+        return self.token_budget > 0 and self.total_tokens() >= self.token_budget
+
+    def usage_snapshot(self):
+        with self._lock:
+            return {node: dict(entry) for node, entry in self.llm_usage.items()}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "llm_usage": {node: dict(entry) for node, entry in self.llm_usage.items()},
+                "timings": {name: dict(entry) for name, entry in self.timings.items()},
+            }
+
+    def merge(self, snapshot):
+        """Somma uno snapshot prodotto altrove (es. processo figlio) ai contatori di sessione."""
+        if not snapshot:
+            return
+        with self._lock:
+            for name, value in (snapshot.get("counters") or {}).items():
+                self.counters[name] += value
+            for node, usage in (snapshot.get("llm_usage") or {}).items():
+                entry = self.llm_usage.setdefault(node, {key: 0 for key in usage})
+                for key, value in usage.items():
+                    entry[key] = entry.get(key, 0) + value
+            for name, timing in (snapshot.get("timings") or {}).items():
+                entry = self.timings.setdefault(name, {"calls": 0, "total_ms": 0.0, "last_ms": 0.0})
+                entry["calls"] += timing.get("calls", 0)
+                entry["total_ms"] = round(entry["total_ms"] + timing.get("total_ms", 0.0), 3)
+                entry["last_ms"] = timing.get("last_ms", entry["last_ms"])
+
+
+metrics = RunMetrics()
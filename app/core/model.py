@@ -11,9 +11,17 @@ load_dotenv()
 if not os.environ.get("GROQ_API_KEY"):
     raise ValueError("ERRORE: Manca la GROQ_API_KEY nel file .env")
 
+# Endpoint alternativo compatibile (es. app/devtools/fake_services.py); None = api.groq.com
+GROQ_API_BASE = os.getenv("GROQ_API_BASE") or None
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+GROQ_TIMEOUT_S = float(os.getenv("GROQ_TIMEOUT", "60"))
+
 llm = ChatGroq(
     temperature=0, 
-    model_name="llama-3.3-70b-versatile"
+    model_name="llama-3.3-70b-versatile",
+    groq_api_base=GROQ_API_BASE,
+    max_retries=GROQ_MAX_RETRIES,
+    request_timeout=GROQ_TIMEOUT_S,
 )
 
 # --- OPZIONE B: MISTRAL AI (Fallback) ---
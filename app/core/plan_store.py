@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.utils import norm_text
+from app.core.textindex import place_key
+
+load_dotenv()
+
+# --- CONFIGURAZIONE ---
+PLAN_STORE_ENABLED = os.getenv("PLAN_STORE", "1") != "0"
+PLAN_STORE_PATH = Path(os.getenv("PLAN_STORE_PATH", Path(__file__).resolve().parents[1] / "data" / "plan_store.sqlite"))
+PLAN_TTL_S = float(os.getenv("PLAN_STORE_TTL", str(30 * 86400)))  # età massima di un piano servibile
+PLACE_TTL_S = float(os.getenv("PLAN_STORE_PLACE_TTL", str(7 * 86400)))  # oltre: luogo da ri-verificare
+BUDGET_BUCKET_EUR = float(os.getenv("PLAN_STORE_BUDGET_BUCKET", "250"))
+# 1 = i luoghi oltre PLACE_TTL vengono ri-verificati dal Finder; 0 = piano servito così com'è
+REVERIFY_STALE = os.getenv("PLAN_STORE_REVERIFY", "1") != "0"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_conn = None
+_conn_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            try:
+                PLAN_STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                _conn = sqlite3.connect(str(PLAN_STORE_PATH), check_same_thread=False)
+            except (sqlite3.Error, OSError):
+                logger.log_event("SYSTEM", "WARNING", "Plan store non scrivibile: uso un DB in memoria.")
+                _conn = sqlite3.connect(":memory:", check_same_thread=False)
+            _conn.executescript(_SCHEMA)
+        return _conn
+
+
+def budget_bucket(budget_value) -> str:
+    """Fascia di budget (es. 800 -> '750-1000'); 'nd' se non indicato."""
+    if budget_value is None:
+        return "nd"
+    low = int(budget_value // BUDGET_BUCKET_EUR * BUDGET_BUCKET_EUR)
+    return f"{low}-{int(low + BUDGET_BUCKET_EUR)}"
+
+
+def plan_params(state) -> dict:
+    """
+    Parametri normalizzati che identificano un viaggio "equivalente"
+    (giorni e budget dai campi tipizzati di normalize_node).
+    Lo stile del Router non è ancora noto prima della lookup: al suo posto
+    si usano gli interessi normalizzati (da cui il Router lo deriva).
+    """
+    return {
+        "destination": place_key(state.get("destination") or ""),
+        "days": str(state.get("days_count") or ""),
+        "interests": " ".join(sorted(set(place_key(state.get("interests") or "").split()))),
+        "budget": budget_bucket(state.get("budget_value")),
+        "companion": norm_text(state.get("companion") or ""),
+    }
+
+
+def plan_key(params: dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_plan(key: str):
+    """Piano salvato e non scaduto, con `stale_places` (nomi da ri-verificare); None se assente."""
+    if not PLAN_STORE_ENABLED:
+        return None
+    conn = _get_conn()
+    with _conn_lock:
+        row = conn.execute("SELECT payload, created FROM plans WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        metrics.incr("plan_store_misses")
+        return None
+    payload, created = json.loads(row[0]), row[1]
+    now = time.time()
+    if now - created > PLAN_TTL_S:
+        metrics.incr("plan_store_expired")
+        return None
+
+    verified_at = payload.get("verified_at", {})
+    payload["stale_places"] = [
+        place.get("name")
+        for day in payload.get("itinerary", [])
+        for place in day.get("places", [])
+        if REVERIFY_STALE and now - verified_at.get(place_key(place.get("name") or ""), 0) > PLACE_TTL_S
+    ]
+    payload["age_s"] = int(now - created)
+    with _conn_lock:
+        conn.execute("UPDATE plans SET hits = hits + 1 WHERE key = ?", (key,))
+        conn.commit()
+    metrics.incr("plan_store_hits")
+    return payload
+
+
+def _is_verified(place) -> bool:
+    # Descrizioni del Finder: "Verificato con ..." / "Non verificato (...)"
+    return (place.get("description") or "").startswith("Verificato")
+
+
+def save_plan(key: str, params: dict, state, previous_verified_at=None):
+    """
+    Salva un piano approvato. I luoghi ancora freschi mantengono il timestamp
+    di verifica precedente, quelli appena verificati prendono "adesso";
+    i luoghi non verificati restano senza timestamp (da ri-verificare al prossimo hit).
+    """
+    if not PLAN_STORE_ENABLED:
+        return
+    now = time.time()
+    previous_verified_at = previous_verified_at or {}
+    verified_at = {}
+    for day in state.get("itinerary") or []:
+        for place in day.get("places", []):
+            name_key = place_key(place.get("name") or "")
+            previous = previous_verified_at.get(name_key)
+            if previous and now - previous <= PLACE_TTL_S:
+                verified_at[name_key] = previous
+            elif _is_verified(place):
+                verified_at[name_key] = now
+
+    payload = {
+        "travel_style": state.get("travel_style"),
+        "itinerary": state.get("itinerary") or [],
+        "route_metrics": state.get("route_metrics"),
+        "confidence_score": state.get("confidence_score"),
+        "verified_at": verified_at,
+    }
+    conn = _get_conn()
+    with _conn_lock:
+        conn.execute(
+            "INSERT OR REPLACE INTO plans (key, params, payload, created, hits) "
+            "VALUES (?, ?, ?, ?, COALESCE((SELECT hits FROM plans WHERE key = ?), 0))",
+            (key, json.dumps(params, ensure_ascii=False), json.dumps(payload, ensure_ascii=False), now, key),
+        )
+        conn.commit()
+    metrics.incr("plan_store_saves")
@@ -0,0 +1,45 @@
+# Validatore minimale di schemi stile JSON-Schema (sottoinsieme):
+# type, required, properties, items, minItems, enum.
+# Evita una dipendenza esterna per i pochi schemi degli output LLM.
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+}
+
+
+def validate(data, schema, path="$"):
+    """Ritorna la lista degli errori (vuota se `data` rispetta lo schema)."""
+    errors = []
+    expected = schema.get("type")
+    if expected and not _TYPE_CHECKS[expected](data):
+        return [f"{path}: atteso {expected}, trovato {type(data).__name__}"]
+
+    enum = schema.get("enum")
+    if enum is not None:
+        normalized = data.upper() if isinstance(data, str) else data
+        if normalized not in enum:
+            errors.append(f"{path}: valore '{data}' non ammesso ({', '.join(map(str, enum))})")
+
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: campo obbligatorio mancante")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in data and data[key] is not None:
+                errors.extend(validate(data[key], sub_schema, f"{path}.{key}"))
+
+    if expected == "array":
+        min_items = schema.get("minItems")
+        if min_items is not None and len(data) < min_items:
+            errors.append(f"{path}: almeno {min_items} elementi richiesti")
+        item_schema = schema.get("items")
+        if item_schema:
+            for idx, item in enumerate(data):
+                errors.extend(validate(item, item_schema, f"{path}[{idx}]"))
+
+    return errors
@@ -1,4 +1,6 @@
-from typing import TypedDict, List, Optional
+from datetime import date
+from typing import TypedDict, List, Optional, Dict, Any, Annotated
+from app.core.itinerary import merge_itinerary
 
 # Struttura di un Luogo
 class PlaceInfo(TypedDict, total=False):
@@ -6,6 +8,9 @@ class PlaceInfo(TypedDict, total=False):
     address: str
     rating: str
     description: Optional[str]
+    place_id: Optional[str]  # id Google Maps (luoghi verificati con Maps)
+    lat: Optional[float]
+    lng: Optional[float]
 
 # Struttura di un Giorno
 class DayPlan(TypedDict):
@@ -29,6 +34,10 @@ class FlightOption(TypedDict, total=False):
     stops: str
     source: str
     link: str
+    score: Optional[float]  # punteggio multi-criterio (più basso = migliore)
+    return_duration: Optional[str]
+    return_stops: Optional[str]
+    return_score: Optional[float]
 
 # Stato dell'Agente
 class TravelAgentState(TypedDict):
@@ -41,20 +50,40 @@ class TravelAgentState(TypedDict):
     budget_total: Optional[str]
     companion: str
     banned_places: Optional[List[str]]
+    planner_variant: Optional[str]  # variante di prompt (modalità speculativa)
     origin: Optional[str]
     depart_date: Optional[str]
     return_date: Optional[str]
+
+    # Parametri normalizzati (normalize_node): parsati una volta, letti dai nodi a valle
+    days_count: int
+    budget_value: Optional[float]  # budget totale in EUR (None se non indicato)
+    daily_budget: Optional[float]  # budget_value / days_count
+    depart_on: Optional[date]
+    return_on: Optional[date]
     
     # Output
     travel_style: str
-    itinerary: List[DayPlan]
+    itinerary: Annotated[List[DayPlan], merge_itinerary]  # lista = sostituzione, ItineraryDelta = solo giorni cambiati
     flight_options: Optional[List[FlightOption]]
     flight_summary: Optional[str]
+    flight_top_options: Optional[List[FlightOption]]  # top-N andata per punteggio
+    return_top_options: Optional[List[FlightOption]]  # top-N ritorno per punteggio
+    report_formats: Optional[List[str]]  # formati report richiesti (terminal/html/docx/json); default REPORT_FORMATS
+    report_files: Optional[Dict[str, str]]  # formato -> percorso del report generato
     
     # Controllo
     critic_feedback: Optional[str]
+    rejected_days: Optional[List[int]]  # giorni bocciati dal Critic (ri-pianificazione parziale)
     budget_context: Optional[str]
     confidence_score: float
+    route_metrics: Optional[Dict[str, Any]]  # km totali/per giorno dopo l'ottimizzazione percorso
+    verification_aborted: Optional[str]  # "maps_quota" | "maps_unavailable" | "low_confidence" se il Finder si è fermato prima
+    plan_cache: Optional[Dict[str, Any]]  # lookup nel plan store: key, params, hit, stale_places, verified_at
+    tool_status: Optional[Dict[str, str]]  # stato circuit breaker per provider (closed/open/half_open)
     flight_confidence_score: Optional[float]
     is_approved: bool
     retry_count: int
+
+    # Osservabilità: token LLM per nodo (calls, prompt/completion tokens, chars)
+    token_usage: Optional[Dict[str, Dict[str, int]]]
@@ -0,0 +1,115 @@
+import os
+import re
+from collections import Counter, defaultdict
+from app.core.utils import norm_text
+
+# Soglia di similarità (Dice sui trigrammi) per i nomi "quasi uguali": "Colosseo" ~ "Colosseum"
+FUZZY_THRESHOLD = float(os.getenv("PLACE_FUZZY_THRESHOLD", "0.7"))
+
+# Articoli/preposizioni ignorati nei nomi dei luoghi ("Il Colosseo" == "Colosseo")
+_STOPWORDS = {
+    "il", "lo", "la", "i", "gli", "le", "l", "un", "una", "di", "del", "della", "dei", "degli", "delle",
+    "the", "of", "el", "los", "las", "les", "de", "du", "des", "der", "die", "das",
+}
+
+
+def place_key(name: str) -> str:
+    """Chiave canonica di un nome luogo: norm_text + sola punteggiatura alfanumerica, senza articoli."""
+    tokens = re.sub(r"[^a-z0-9]+", " ", norm_text(name)).split()
+    kept = [t for t in tokens if t not in _STOPWORDS]
+    return " ".join(kept or tokens)
+
+
+def unique_places(names):
+    """Deduplica una lista di nomi per chiave canonica, mantenendo il primo (nessun match approssimato)."""
+    seen = set()
+    unique = []
+    for name in names or []:
+        key = place_key(name or "")
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        unique.append(name.strip())
+    return unique
+
+
+def trigrams(key: str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Indice fuzzy per nomi di luoghi: trigrammi -> voci (indice invertito).
+    La ricerca confronta solo le voci che condividono almeno un trigramma
+    (O(candidati), non confronto a coppie) con similarità di Dice.
+    Nomi simili possono essere luoghi diversi ("Trattoria da Mario" / "da Maria"):
+    va usato per filtri e suggerimenti (luoghi vietati), mai come verifica di un luogo.
+    """
+
+    def __init__(self, names=()):
+        self._keys = []
+        self._grams = []
+        self._payloads = []
+        self._exact = {}
+        self._postings = defaultdict(list)
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, name: str, payload=None):
+        key = place_key(name or "")
+        if not key:
+            return
+        idx = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append(key)
+        self._grams.append(len(grams))
+        self._payloads.append(payload if payload is not None else name)
+        self._exact.setdefault(key, idx)
+        for gram in grams:
+            self._postings[gram].append(idx)
+
+    def search(self, name: str, threshold: float = None, limit: int = 5):
+        """Ritorna [(score, payload)] ordinati per similarità decrescente."""
+        threshold = FUZZY_THRESHOLD if threshold is None else threshold
+        key = place_key(name or "")
+        if not key:
+            return []
+        exact = self._exact.get(key)
+        if exact is not None:
+            return [(1.0, self._payloads[exact])]
+
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        scored = []
+        for idx, count in shared.items():
+            score = 2 * count / (len(grams) + self._grams[idx])
+            if score >= threshold:
+                scored.append((score, idx))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(round(score, 3), self._payloads[idx]) for score, idx in scored[:limit]]
+
+    def best(self, name: str, threshold: float = None):
+        matches = self.search(name, threshold=threshold, limit=1)
+        return matches[0][1] if matches else None
+
+    def contains(self, name: str, threshold: float = None) -> bool:
+        return bool(self.search(name, threshold=threshold, limit=1))
+
+
+def fuzzy_unique(names, threshold: float = None):
+    """Un nome per ogni gruppo di nomi simili (il primo): per elenchi compatti nei prompt."""
+    index = TrigramIndex()
+    unique = []
+    for name in names or []:
+        if not (name or "").strip() or index.contains(name, threshold=threshold):
+            continue
+        index.add(name)
+        unique.append(name.strip())
+    return unique
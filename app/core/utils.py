@@ -1,8 +1,10 @@
+import os
 import json
 import re
 import sys
 import time
 import random
+import unicodedata
 
 def extract_json(text: str) -> str:
     """
@@ -16,9 +18,122 @@ def extract_json(text: str) -> str:
         text = text.split("```")[1].split("```")[0]
     return text.strip()
 
+
+_JSON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _scan_json(text: str):
+    """
+    Riscrive il testo carattere per carattere correggendo i difetti tipici:
+    stringhe con apici singoli, letterali Python, virgole finali.
+    Si ferma alla chiusura della radice (scarta la prosa successiva).
+    Ritorna (testo, stack delle parentesi aperte, dentro_stringa).
+    """
+    out = []
+    stack = []
+    quote = None
+    escape = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+                # \' non è un escape JSON valido: resta solo l'apice
+                out.append(ch if ch == "'" else "\\" + ch)
+            elif ch == "\\":
+                escape = True
+            elif ch == quote:
+                quote = None
+                out.append('"')
+            elif ch == '"':
+                out.append('\\"')  # virgolette dentro una stringa con apici singoli
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in ('"', "'"):
+            quote = ch
+            out.append('"')
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+        elif ch == ",":
+            j = i + 1
+            while j < len(text) and text[j].isspace():
+                j += 1
+            if j >= len(text) or text[j] not in "}]":
+                out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < len(text) and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_JSON_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return "".join(out), stack, quote is not None
+
+
+def _close_truncated(text: str, stack, in_string: bool) -> str:
+    """Chiude un JSON troncato scartando l'ultimo elemento incompleto."""
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # Chiave senza valore: `, "chiave":` oppure `{"chiave"`
+    text = re.sub(r'[,]?\s*"(?:[^"\\]|\\.)*"\s*:\s*$', "", text)
+    if stack and stack[-1] == "{":
+        text = re.sub(r'(?<=[{,])\s*"(?:[^"\\]|\\.)*"$', "", text)
+    text = text.rstrip().rstrip(",")
+    return text + "".join(_CLOSERS[b] for b in reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """
+    Riparazione locale di output LLM quasi-JSON, senza richiamare il modello:
+    prosa prima/dopo il JSON, apici singoli, True/False/None,
+    virgole finali, array/oggetti troncati.
+    """
+    text = extract_json(text or "")
+    starts = [idx for idx in (text.find("{"), text.find("[")) if idx != -1]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    repaired, stack, in_string = _scan_json(text)
+    if not stack and not in_string:
+        return repaired
+
+    # Troncato: proviamo a chiudere, scartando un elemento alla volta se serve
+    candidate = repaired
+    for _ in range(5):
+        closed = _close_truncated(candidate, stack, in_string)
+        try:
+            json.loads(closed, strict=False)
+            return closed
+        except ValueError:
+            cut = candidate.rfind(",")
+            if cut == -1:
+                return closed
+            candidate, stack, in_string = _scan_json(candidate[:cut])
+    return closed
+
+
 def safe_json_parse(json_str: str, default_value=None):
     """
     Tenta di parsare il JSON in modo robusto.
+    Se il parsing diretto fallisce prova una riparazione locale (repair_json).
     Restituisce default_value in caso di errore.
     """
     if default_value is None:
@@ -28,11 +143,23 @@ def safe_json_parse(json_str: str, default_value=None):
         clean_str = extract_json(json_str)
         # strict=False aiuta a gestire caratteri di controllo illegali
         return json.loads(clean_str, strict=False)
+    except Exception:
+        pass
+
+    try:
+        return json.loads(repair_json(json_str), strict=False)
     except Exception:
         return default_value
     
 
 
+def norm_text(value: str) -> str:
+    """Minuscolo, senza spazi esterni e senza accenti (es. 'Città' -> 'citta')."""
+    text = (value or "").strip().lower()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
 def extract_budget_number(budget_str: str) -> float:
     """
     Estrae il budget gestendo milioni, k, e formati testuali.
@@ -64,8 +191,63 @@ def extract_budget_number(budget_str: str) -> float:
     return number
 
 
+def _short_address(address) -> str:
+    """Prima parte dell'indirizzo (via/piazza): basta al Critic per la logistica."""
+    text = (address or "").strip()
+    if not text or text.upper() == "N/A":
+        return ""
+    return text.split(",")[0].strip()
+
+
+def compact_itinerary(itinerary, day_km=None) -> str:
+    """
+    Serializza l'itinerario in formato tabellare compatto per i prompt.
+    Una riga per giorno: `giorno|tema|nome (zona; rating; V/NV); ...[|km]`
+    V = verificato su Maps, NV = non verificato, ? = non ancora verificato.
+    Niente indentazione né chiavi ripetute.
+    """
+    lines = []
+    for day in itinerary or []:
+        cells = []
+        for place in day.get("places", []):
+            description = place.get("description") or ""
+            if not description:
+                verified = "?"
+            elif description.startswith("Non verificato"):
+                verified = "NV"
+            else:
+                verified = "V"
+            details = [d for d in (_short_address(place.get("address")), str(place.get("rating") or "N/A"), verified) if d]
+            cells.append(f"{place.get('name', 'Luogo')} ({'; '.join(details)})")
+        line = f"{day.get('day_number', '?')}|{day.get('focus', '')}|{'; '.join(cells)}"
+        if day_km and day.get("day_number") in day_km:
+            line += f"|{day_km[day.get('day_number')]} km"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def compact_name_list(names, limit=25) -> str:
+    """Lista di nomi deduplicata (case-insensitive) e troncata per i prompt."""
+    seen = set()
+    unique = []
+    for name in names or []:
+        key = (name or "").strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(name.strip())
+    if len(unique) > limit:
+        return "; ".join(unique[:limit]) + f" (+{len(unique) - limit} altri)"
+    return "; ".join(unique)
+
+
+# Effetto "typing" nei log a terminale (LOG_TYPING=0 per benchmark e run non interattivi)
+TYPING_EFFECT = os.getenv("LOG_TYPING", "1") != "0"
+
 def typing_print(text, speed=0.003):
     """Stampa il testo con un effetto 'typing' live."""
+    if not TYPING_EFFECT:
+        print(text)
+        return
     for char in text:
         sys.stdout.write(char)
         sys.stdout.flush()
@@ -0,0 +1,325 @@
+"""
+Servizi finti per benchmark e test di carico in locale: Groq (chat OpenAI-compatibile),
+Google Maps Places e SerpApi Google Flights sullo stesso server, con latenza
+configurabile, errori e quota iniettati e risposte da fixture (formato benchmarks/fixtures).
+
+    python -m app.devtools.fake_services --port 8766 --fixture benchmarks/fixtures/week_7d.json \\
+        --latency groq=lognormal:400,0.5 --latency maps=uniform:20,120 --error-rate serpapi=0.1 --quota maps=50
+
+    GROQ_API_BASE=http://127.0.0.1:8766 GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8766 \\
+    SERPAPI_BASE_URL=http://127.0.0.1:8766 GROQ_API_KEY=fake GOOGLE_MAPS_API_KEY=AIzaFake \\
+    SERPAPI_API_KEY=fake python main.py
+
+Route: POST /openai/v1/chat/completions, GET /maps/api/place/{findplacefromtext,textsearch}/json,
+GET /search.json; GET /_stats ritorna i contatori per provider.
+"""
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from app.devtools.flights_payload import build_flights_payload, stable_seed
+
+PROVIDERS = ("groq", "maps", "serpapi")
+
+# Marcatori dei prompt (app/engine/prompts.py) per riconoscere il nodo chiamante
+PROMPT_MARKERS = (("Stile di Viaggio", "ROUTER"), ("Revisore Logistico", "CRITIC"))
+
+# Risposte LLM senza fixture (il Planner richiede una fixture: dipende dalla destinazione)
+DEFAULT_LLM_RESPONSES = {
+    "ROUTER": json.dumps({"reasoning": "Risposta predefinita del servizio finto.", "style": "CULTURALE"}),
+    "CRITIC": json.dumps({"approved": True, "critique": "Itinerario coerente.", "thought_process": "ok"}),
+}
+
+
+def llm_node_for(prompt_text):
+    """Nodo (ROUTER / CRITIC / PLANNER) a cui appartiene il prompt."""
+    return next((node for marker, node in PROMPT_MARKERS if marker in prompt_text), "PLANNER")
+
+
+class LatencyModel:
+    """
+    Distribuzione della latenza in millisecondi, da stringa:
+    "fixed:50", "uniform:20,200", "normal:150,40", "lognormal:120,0.6" (mediana, sigma).
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec="fixed:0"):
+        kind, _, args = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Distribuzione di latenza sconosciuta: '{spec}'")
+        self.spec = spec
+        self.kind = kind
+        self.args = [float(value) for value in args.split(",") if value.strip()] or [0.0]
+
+    def sample_ms(self, rng):
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[-1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.args[0], self.args[1] if len(self.args) > 1 else 0.0))
+        if self.kind == "lognormal":
+            median = max(self.args[0], 0.001)
+            return rng.lognormvariate(math.log(median), self.args[1] if len(self.args) > 1 else 0.5)
+        return self.args[0]
+
+
+class FaultPolicy:
+    """
+    Comportamento di rete di un provider: latenza, errori casuali (error_rate)
+    e quota (max `quota` richieste per finestra di `quota_window_s`, 0 = illimitata).
+    """
+
+    def __init__(self, latency="fixed:0", error_rate=0.0, quota=0, quota_window_s=60.0, seed=0):
+        self.latency = LatencyModel(latency)
+        self.error_rate = float(error_rate)
+        self.quota = int(quota)
+        self.quota_window_s = float(quota_window_s)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "over_quota": 0}
+
+    def decide(self):
+        """(latenza in secondi, esito) con esito "ok", "error" o "quota"."""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if now - self._window_start >= self.quota_window_s:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            delay = self.latency.sample_ms(self._rng) / 1000
+            if self.quota and self._window_count > self.quota:
+                outcome = "quota"
+            elif self.error_rate and self._rng.random() < self.error_rate:
+                outcome = "error"
+            else:
+                outcome = "ok"
+            self.stats[{"ok": "ok", "error": "errors", "quota": "over_quota"}[outcome]] += 1
+        return delay, outcome
+
+    def describe(self):
+        return {
+            "latency": self.latency.spec,
+            "error_rate": self.error_rate,
+            "quota": self.quota,
+            "quota_window_s": self.quota_window_s,
+            **self.stats,
+        }
+
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    # Configurati da serve()
+    policies = {}
+    fixture = {}
+    price_period_s = 600
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/_stats":
+            return self._send(200, {name: policy.describe() for name, policy in self.policies.items()})
+        if url.path.startswith("/maps/api/place/"):
+            return self._maps(url.path, query)
+        if url.path == "/search.json":
+            return self._serpapi(query)
+        self._send(404, {"error": f"Route non supportata: {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/openai/v1/chat/completions":
+            return self._send(404, {"error": {"message": f"Unknown route: {url.path}", "type": "invalid_request_error"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+        except json.JSONDecodeError:
+            return self._send(400, {"error": {"message": "Invalid JSON body.", "type": "invalid_request_error"}})
+        self._groq(body)
+
+    def _apply_policy(self, provider):
+        delay, outcome = self.policies[provider].decide()
+        if delay:
+            time.sleep(delay)
+        return outcome
+
+    # --- Groq (OpenAI chat completions) ---
+
+    def _groq(self, body):
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            return self._send(401, {"error": {"message": "Invalid API Key", "type": "invalid_request_error"}})
+        outcome = self._apply_policy("groq")
+        if outcome == "quota":
+            return self._send(429, {"error": {
+                "message": "Rate limit reached (fake service).", "type": "tokens", "code": "rate_limit_exceeded"
+            }}, headers={"retry-after": "1"})
+        if outcome == "error":
+            return self._send(503, {"error": {"message": "Service unavailable (fake service).", "type": "internal_server_error"}})
+
+        messages = body.get("messages") or [{}]
+        prompt = str(messages[-1].get("content") or "")
+        node = llm_node_for(prompt)
+        content = (self.fixture.get("llm") or {}).get(node) or DEFAULT_LLM_RESPONSES.get(node)
+        if content is None:
+            return self._send(404, {"error": {
+                "message": f"Nessuna risposta registrata per {node}: avviare il server con --fixture.",
+                "type": "invalid_request_error",
+            }})
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        self._send(200, {
+            "id": f"chatcmpl-fake-{stable_seed(prompt):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    # --- Google Maps Places (Find Place / Text Search) ---
+
+    def _maps(self, path, query):
+        endpoint = path.rstrip("/").split("/")[-2]
+        if endpoint not in ("findplacefromtext", "textsearch"):
+            return self._send(404, {"status": "INVALID_REQUEST", "error_message": f"Endpoint non supportato: {endpoint}"})
+        if not query.get("key"):
+            return self._send(200, {"status": "REQUEST_DENIED", "error_message": "The provided API key is invalid."})
+        outcome = self._apply_policy("maps")
+        if outcome == "quota":
+            return self._send(200, {"status": "OVER_QUERY_LIMIT", "error_message": "You have exceeded your quota (fake service)."})
+        if outcome == "error":
+            return self._send(200, {"status": "UNKNOWN_ERROR", "error_message": "Server error (fake service)."})
+
+        text = query.get("input") or query.get("query") or ""
+        place = self._maps_place(text)
+        key = "candidates" if endpoint == "findplacefromtext" else "results"
+        if place is None:
+            return self._send(200, {"status": "ZERO_RESULTS", key: []})
+        self._send(200, {"status": "OK", key: [place]})
+
+    def _maps_place(self, text):
+        recorded = self.fixture.get("maps")
+        if recorded is not None:
+            return recorded.get(text)
+        # Senza fixture: luogo sintetico deterministico per ogni query
+        seed = stable_seed(text)
+        return {
+            "name": text,
+            "formatted_address": f"{text} (indirizzo finto)",
+            "rating": round(3.5 + (seed % 15) / 10, 1),
+            "place_id": f"fake_{seed:08x}",
+            "geometry": {"location": {
+                "lat": round(41.9 + ((seed >> 4) % 600 - 300) / 10000, 6),
+                "lng": round(12.5 + ((seed >> 12) % 800 - 400) / 10000, 6),
+            }},
+        }
+
+    # --- SerpApi Google Flights ---
+
+    def _serpapi(self, query):
+        if query.get("engine") != "google_flights":
+            return self._send(400, {"error": "Unsupported engine."})
+        if not query.get("api_key"):
+            return self._send(401, {"error": "Invalid API key."})
+        dep, arr = query.get("departure_id", ""), query.get("arrival_id", "")
+        if not dep or not arr:
+            return self._send(400, {"error": "Missing departure_id or arrival_id."})
+        outcome = self._apply_policy("serpapi")
+        if outcome == "quota":
+            return self._send(429, {"error": "Your account has run out of searches."})
+        if outcome == "error":
+            return self._send(500, {"error": "Internal server error (fake service)."})
+
+        outbound_date = query.get("outbound_date", "")
+        recorded = self.fixture.get("flights")
+        if recorded is None:
+            return self._send(200, build_flights_payload(dep, arr, outbound_date, self.price_period_s))
+        payload = recorded.get(f"{dep}-{arr}-{outbound_date}")
+        self._send(200, payload or {"error": "Google Flights hasn't returned any results for this query."})
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def _per_provider(values, cast, default):
+    """["groq=lognormal:300,0.5", "0.1"] -> valore per provider (senza prefisso = tutti)."""
+    config = {provider: default for provider in PROVIDERS}
+    for value in values or []:
+        provider, sep, setting = value.partition("=")
+        if sep and provider in PROVIDERS:
+            config[provider] = cast(setting)
+        elif sep:
+            raise ValueError(f"Provider sconosciuto: '{provider}' (attesi: {', '.join(PROVIDERS)})")
+        else:
+            config = {name: cast(value) for name in PROVIDERS}
+    return config
+
+
+def load_fixture(path):
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def serve(host="127.0.0.1", port=8766, fixture=None, latency=None, error_rate=None, quota=None, quota_window_s=60.0, seed=0,
+          price_period_s=600):
+    """
+    Server pronto (non avviato): `latency`, `error_rate` e `quota` sono dict per provider.
+    Senza voli in fixture i prezzi oscillano con periodo `price_period_s` (prova del price watch).
+    """
+    latency, error_rate, quota = latency or {}, error_rate or {}, quota or {}
+    FakeServicesHandler.fixture = fixture or {}
+    FakeServicesHandler.price_period_s = price_period_s
+    FakeServicesHandler.policies = {
+        provider: FaultPolicy(
+            latency.get(provider, "fixed:0"), error_rate.get(provider, 0.0), quota.get(provider, 0),
+            quota_window_s, seed=seed + index,
+        )
+        for index, provider in enumerate(PROVIDERS)
+    }
+    server = ThreadingHTTPServer((host, port), FakeServicesHandler)
+    server.daemon_threads = True
+    print(f"Servizi finti (Groq, Maps, SerpApi) su http://{host}:{server.server_port}")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servizi finti Groq / Google Maps / SerpApi.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--fixture", default="", help="Fixture JSON (formato benchmarks/fixtures) per le risposte")
+    parser.add_argument("--latency", action="append", help="[provider=]distribuzione, es. maps=uniform:20,120")
+    parser.add_argument("--error-rate", action="append", help="[provider=]probabilità di errore, es. serpapi=0.1")
+    parser.add_argument("--quota", action="append", help="[provider=]richieste per finestra (0 = illimitata)")
+    parser.add_argument("--quota-window", type=float, default=60.0, help="Durata della finestra di quota (secondi)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--price-period", type=int, default=600, help="Periodo dell'oscillazione prezzi voli (secondi)")
+    args = parser.parse_args()
+    try:
+        serve(
+            args.host, args.port, load_fixture(args.fixture),
+            latency=_per_provider(args.latency, str, "fixed:0"),
+            error_rate=_per_provider(args.error_rate, float, 0.0),
+            quota=_per_provider(args.quota, int, 0),
+            quota_window_s=args.quota_window, seed=args.seed, price_period_s=args.price_period,
+        ).serve_forever()
+    except KeyboardInterrupt:
+        pass
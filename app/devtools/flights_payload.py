@@ -0,0 +1,37 @@
+"""
+Risposte Google Flights (SerpApi) sintetiche, condivise dal server finto e dai benchmark.
+Prezzi deterministici per rotta/data che oscillano nel tempo, per provare il price watch.
+"""
+import hashlib
+import math
+import time
+
+AIRLINES = ["ITA", "Ryanair", "easyJet", "Vueling", "Lufthansa", "Air France"]
+
+
+def stable_seed(*parts):
+    return int(hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def build_flights_payload(dep, arr, outbound_date, period_s=600, now=None):
+    """Risposta in formato Google Flights: 2 best_flights + 4 other_flights."""
+    base = stable_seed(dep, arr, outbound_date)
+    phase = ((now or time.time()) / period_s) % 1
+    options = []
+    for i in range(6):
+        wave = math.sin(2 * math.pi * (phase + i / 6))
+        price = 60 + base % 140 + i * 9 + round(25 * wave)
+        stops = (base >> i) % 3 if i > 1 else 0
+        hour = 6 + (base + i * 5) % 16
+        legs = [{
+            "departure_airport": {"id": dep, "time": f"{outbound_date} {hour:02d}:{(i * 10) % 60:02d}"},
+            "arrival_airport": {"id": arr, "time": f"{outbound_date} {min(hour + 2 + stops, 23):02d}:05"},
+            "airline": AIRLINES[(base + i) % len(AIRLINES)],
+        }]
+        legs.extend(dict(legs[0]) for _ in range(stops))
+        options.append({"flights": legs, "total_duration": 95 + stops * 80 + i * 7, "price": price})
+    return {
+        "search_metadata": {"status": "Success", "google_flights_url": f"https://www.google.com/travel/flights?q={dep}-{arr}"},
+        "best_flights": options[:2],
+        "other_flights": options[2:],
+    }
@@ -0,0 +1,53 @@
+UNVERIFIED_PREFIX = "Non verificato"
+
+
+def is_unverified(place) -> bool:
+    return (place.get("description") or "").startswith(UNVERIFIED_PREFIX)
+
+
+class ConfidenceTracker:
+    """
+    Confidenza incrementale = luoghi verificati / luoghi totali.
+    Usato dal Finder per fermarsi appena l'esito è già deciso:
+    se anche verificando tutti i luoghi rimanenti non si raggiunge la soglia,
+    continuare a chiamare Maps è solo spreco di tempo e quota.
+    """
+
+    def __init__(self, total: int, threshold: float):
+        self.total = total
+        self.threshold = threshold
+        self.verified = 0
+        self.failed = 0
+
+    @classmethod
+    def from_itinerary(cls, itinerary, threshold: float):
+        places = [place for day in itinerary or [] for place in day.get("places", [])]
+        tracker = cls(len(places), threshold)
+        for place in places:
+            tracker.record(not is_unverified(place))
+        return tracker
+
+    def skip(self):
+        """Luogo tolto dal conteggio (es. doppione rimosso): non conta né come verificato né come fallito."""
+        if self.total > self.verified + self.failed:
+            self.total -= 1
+
+    def record(self, verified: bool):
+        if verified:
+            self.verified += 1
+        else:
+            self.failed += 1
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.total - self.verified - self.failed)
+
+    @property
+    def ratio(self) -> float:
+        return self.verified / self.total if self.total else 0.0
+
+    def best_possible_ratio(self) -> float:
+        return (self.verified + self.remaining) / self.total if self.total else 0.0
+
+    def can_reach_threshold(self) -> bool:
+        return self.best_possible_ratio() >= self.threshold
@@ -1,71 +1,65 @@
 import os
-import json
 import re
-import unicodedata
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from colorama import Fore, Style, init
 from langchain_core.messages import HumanMessage
 from app.core.state import TravelAgentState
 from app.core.model import llm
-from app.tools.maps import find_places_on_maps
+from app.tools.maps import lookup_place, maps_available, MAPS_FATAL_STATUSES, STATUS_CIRCUIT_OPEN
+from app.tools.resilience import provider_status
+from app.tools.poi_index import lookup_poi
 from app.core.logger import logger
-from app.core.utils import safe_json_parse
+from app.core.utils import compact_itinerary, compact_name_list, norm_text
+from app.core.textindex import TrigramIndex, fuzzy_unique, place_key, unique_places
+from app.core.itinerary import diff_itinerary, apply_update
+from app.core.metrics import metrics
+from app.core.dates import parse_date, validate_trip_dates
+from app.core.plan_store import plan_params, plan_key, get_plan, save_plan
 from app.engine import prompts
+from app.engine.structured import invoke_structured, ROUTER_SCHEMA, PLANNER_SCHEMA, CRITIC_SCHEMA
+from app.engine.confidence import ConfidenceTracker
+from app.engine.routing import optimize_itinerary
+from app.engine.ranking import rank_flights, FLIGHT_TOP_N
 from app.core.utils import extract_budget_number
-from app.tools.search import search_flights_tool
+from app.tools.search import search_flights_tool, flights_available
 
 init(autoreset=True)
 
+# Numero massimo di luoghi vietati reinviati al planner ad ogni retry
+MAX_BANNED_IN_PROMPT = 25
 
-def _parse_flexible_date(raw_text: str):
-    text = (raw_text or "").strip()
-    if not text:
-        return None
+# Sotto questa soglia di confidenza si chiede conferma umana (HITL)
+CONFIDENCE_THRESHOLD = 0.7
 
-    try:
-        return datetime.strptime(text, "%Y-%m-%d").date()
-    except ValueError:
-        pass
-
-    month_map = {
-        "gennaio": 1, "january": 1,
-        "febbraio": 2, "february": 2,
-        "marzo": 3, "march": 3,
-        "aprile": 4, "april": 4,
-        "maggio": 5, "may": 5,
-        "giugno": 6, "june": 6,
-        "luglio": 7, "july": 7,
-        "agosto": 8, "august": 8,
-        "settembre": 9, "september": 9,
-        "ottobre": 10, "october": 10,
-        "novembre": 11, "november": 11,
-        "dicembre": 12, "december": 12,
-    }
-    m = re.match(r"^\s*(\d{1,2})\s+([A-Za-zÀ-ÿ]+)\s*$", text, flags=re.IGNORECASE)
-    if m:
-        day = int(m.group(1))
-        month_key = m.group(2).strip().lower()
-        month = month_map.get(month_key)
-        if month:
-            year = datetime.today().year
-            try:
-                parsed = datetime(year, month, day).date()
-                if parsed < datetime.today().date():
-                    parsed = datetime(year + 1, month, day).date()
-                return parsed
-            except ValueError:
-                return None
-    return None
+# Riassegnazione dei luoghi ai giorni solo se riduce i km totali almeno di questa quota
+ROUTE_REGROUP_MIN_GAIN = float(os.getenv("ROUTE_REGROUP_MIN_GAIN", "0.15"))
+
+# Modalità speculativa: K itinerari candidati generati e verificati in parallelo (1 = disattiva)
+SPECULATIVE_CANDIDATES = max(1, int(os.getenv("SPECULATIVE_CANDIDATES", "1") or 1))
 
+# DOCX: "eager" (sempre), "lazy" (solo se richiesto a fine sessione), "off"
+DOCX_MODE = os.getenv("REPORT_DOCX", "eager").strip().lower()
+
+
+def _invoke_llm(node_name: str, prompt: str):
+    """Chiamata LLM con token accounting per nodo (vedi app/core/metrics.py)."""
+    response = llm.invoke([HumanMessage(content=prompt)])
+    usage = metrics.record_llm_call(node_name, prompt, response)
+    logger.log_event(
+        node_name,
+        "INFO",
+        f"Token: prompt {usage['prompt_tokens']} | completion {usage['completion_tokens']} "
+        f"({usage['calls']} chiamate)"
+    )
+    return response
 
-def _norm_text(value: str) -> str:
-    text = (value or "").strip().lower()
-    text = unicodedata.normalize("NFKD", text)
-    return "".join(ch for ch in text if not unicodedata.combining(ch))
 
 # --- 1. INIT NODE ---
 def init_node(state: TravelAgentState):
     logger.log_event("INIT", "START", "Nuova sessione")
+    # Contatori e budget token sono per sessione: un processo long-running non eredita la spesa precedente
+    metrics.reset()
     
     print(Fore.CYAN + "\n::: TRAVEL AGENT AI 2.0 - ARCHITECT EDITION :::\n")
     
@@ -74,25 +68,24 @@ def init_node(state: TravelAgentState):
     budget_total = input(f"{Fore.GREEN}>> Budget totale indicativo (€)? {Style.RESET_ALL}").strip()
     companion = input(f"{Fore.GREEN}>> Con chi viaggi? (Solo/Coppia/Famiglia) {Style.RESET_ALL}").strip() or "Solo"
     origin = input(f"{Fore.GREEN}>> Partenza volo (citta, opzionale)? {Style.RESET_ALL}").strip()
-    depart_date = input(f"{Fore.GREEN}>> Data andata (YYYY-MM-DD, obbligatoria)? {Style.RESET_ALL}").strip()
-    while not depart_date:
-        logger.log_event("INIT", "WARNING", "Data andata mancante: richiesta obbligatoria.")
-        depart_date = input(f"{Fore.GREEN}>> Inserisci la data andata (YYYY-MM-DD): {Style.RESET_ALL}").strip()
-    return_date = input(f"{Fore.GREEN}>> Data ritorno (YYYY-MM-DD, opzionale)? {Style.RESET_ALL}").strip()
+    # Date validate qui, prima di qualsiasi chiamata di rete (formati: 2027-03-01, 1 marzo, 01/03, tra 10 giorni...)
+    raw_depart = input(f"{Fore.GREEN}>> Data andata (YYYY-MM-DD, obbligatoria)? {Style.RESET_ALL}").strip()
+    depart_date, _, error = validate_trip_dates(raw_depart)
+    while error:
+        logger.log_event("INIT", "WARNING", f"{error}: richiesta obbligatoria.")
+        raw_depart = input(f"{Fore.GREEN}>> Inserisci la data andata (YYYY-MM-DD): {Style.RESET_ALL}").strip()
+        depart_date, _, error = validate_trip_dates(raw_depart)
+    raw_return = input(f"{Fore.GREEN}>> Data ritorno (YYYY-MM-DD, opzionale)? {Style.RESET_ALL}").strip()
+    _, return_date, error = validate_trip_dates(depart_date, raw_return)
+    while error:
+        logger.log_event("INIT", "WARNING", f"{error}.")
+        raw_return = input(f"{Fore.GREEN}>> Data ritorno (YYYY-MM-DD, vuoto = solo andata): {Style.RESET_ALL}").strip()
+        _, return_date, error = validate_trip_dates(depart_date, raw_return)
 
     days = ""
-    d1 = _parse_flexible_date(depart_date)
     if return_date:
-        d2 = _parse_flexible_date(return_date)
-        if d1 and d2:
-            delta = (d2 - d1).days + 1
-            if delta > 0:
-                days = str(delta)
-                logger.log_event("INIT", "INFO", f"Giorni calcolati automaticamente dalle date: {days}")
-            else:
-                logger.log_event("INIT", "WARNING", "Data ritorno precedente alla partenza: giorni richiesti manualmente.")
-        else:
-            logger.log_event("INIT", "WARNING", "Date non valide per calcolare i giorni: giorni richiesti manualmente.")
+        days = str((parse_date(return_date) - parse_date(depart_date)).days + 1)
+        logger.log_event("INIT", "INFO", f"Giorni calcolati automaticamente dalle date: {days}")
 
     if not days:
         days = input(f"{Fore.GREEN}>> Quanti giorni di viaggio? (obbligatorio) {Style.RESET_ALL}").strip()
@@ -121,14 +114,118 @@ def init_node(state: TravelAgentState):
         "critic_feedback": None
     }
 
+# --- 1a. NORMALIZZAZIONE PARAMETRI ---
+def normalize_node(state: TravelAgentState):
+    """
+    Parametri del viaggio parsati una sola volta in campi tipizzati
+    (giorni, budget totale e giornaliero, date): i nodi a valle li leggono
+    da qui invece di ri-parsare le stringhe a ogni giro del retry loop.
+    """
+    days_text = str(state.get("days") or "").strip()
+    days_count = int(days_text) if days_text.isdigit() and int(days_text) > 0 else 1
+    budget_text = str(state.get("budget_total") or state.get("budget") or "").strip()
+    budget_value = extract_budget_number(budget_text) if budget_text else None
+    return {
+        "days_count": days_count,
+        "budget_value": budget_value,
+        "daily_budget": _daily_budget(budget_value, days_count),
+        "depart_on": parse_date(state.get("depart_date")),
+        "return_on": parse_date(state.get("return_date")),
+    }
+
+
+def _budget_label(state) -> str:
+    budget_value = state.get("budget_value")
+    return f"{budget_value:g}€ totale (indicativo)" if budget_value is not None else "Non specificato"
+
+
+def _daily_budget(budget_value, days_count):
+    return round(budget_value / days_count, 2) if budget_value is not None else None
+
+
+def _trip_dates(state, depart_on, return_on=None) -> dict:
+    """
+    Date del viaggio in forma tipizzata e ISO, aggiornate insieme. Se cambia la durata
+    (andata spostata, ritorno fisso) si riallineano giorni e budget giornaliero; un
+    piano salvato per l'altra durata non è più servibile e il piano finale va salvato
+    sotto la chiave della nuova durata.
+    """
+    update = {
+        "depart_on": depart_on,
+        "depart_date": depart_on.isoformat() if depart_on else None,
+        "return_on": return_on,
+        "return_date": return_on.isoformat() if return_on else None,
+    }
+    days_count = (return_on - depart_on).days + 1 if depart_on and return_on else None
+    if days_count and days_count != state.get("days_count"):
+        logger.log_event("FLIGHTS", "INFO", f"Durata aggiornata dalle nuove date: {days_count} giorni.")
+        update.update({
+            "days": str(days_count),
+            "days_count": days_count,
+            "daily_budget": _daily_budget(state.get("budget_value"), days_count),
+        })
+        plan_cache = state.get("plan_cache") or {}
+        if plan_cache.get("key"):
+            params = plan_params({**state, **update})
+            update["plan_cache"] = {**plan_cache, "key": plan_key(params), "params": params, "hit": False}
+    return update
+
+
+def _is_low_budget(state) -> bool:
+    daily_budget = state.get("daily_budget")
+    return daily_budget is not None and daily_budget < 60
+
+
+# --- 1b. PLAN STORE LOOKUP ---
+def plan_lookup_node(state: TravelAgentState):
+    """
+    Viaggio equivalente già pianificato, verificato e approvato: lo riusa
+    saltando Router/Planner/Finder/Critic. I luoghi con verifica scaduta
+    passano di nuovo dal Finder (gli altri restano "Verificato").
+    """
+    params = plan_params(state)
+    key = plan_key(params)
+    cached = get_plan(key)
+    if not cached:
+        return {"plan_cache": {"key": key, "params": params, "hit": False}}
+
+    stale = set(cached["stale_places"])
+    itinerary = [
+        dict(day, places=[
+            {**place, "description": "Da ri-verificare (piano salvato)"} if place.get("name") in stale else place
+            for place in day.get("places", [])
+        ])
+        for day in cached["itinerary"]
+    ]
+    logger.log_event(
+        "INIT",
+        "RESULT",
+        f"Piano già approvato trovato (età {cached['age_s'] // 3600}h, luoghi da ri-verificare: {len(stale)})."
+    )
+    return {
+        "plan_cache": {
+            "key": key,
+            "params": params,
+            "hit": True,
+            "stale_places": len(stale),
+            "age_s": cached["age_s"],
+            "verified_at": cached["verified_at"],
+        },
+        "travel_style": cached.get("travel_style") or "RELAX",
+        "itinerary": itinerary,
+        "route_metrics": cached.get("route_metrics"),
+        "confidence_score": cached.get("confidence_score") or 0.0,
+        "is_approved": True,
+        "critic_feedback": None,
+    }
+
 # --- 2. ROUTER NODE ---
 def travel_router_node(state: TravelAgentState):
     logger.log_event("ROUTER", "START", "Analisi Stile")
     formatted_prompt = prompts.ROUTER_PROMPT.format(user_input=state['user_input'])
-    response = llm.invoke([HumanMessage(content=formatted_prompt)])
-    data = safe_json_parse(response.content, default_value={"style": "RELAX"})
+    data = invoke_structured(_invoke_llm, "ROUTER", formatted_prompt, ROUTER_SCHEMA, default_value={"style": "RELAX"})
     logger.log_event("ROUTER", "THOUGHT", data.get("reasoning", "N/A"))
-    return {"travel_style": data.get("style", "RELAX")}
+    return {"travel_style": data.get("style", "RELAX").upper(), "token_usage": metrics.usage_snapshot()}
 
 
 # --- 2b. FLIGHT SEARCH NODE (minimal wiring) ---
@@ -174,15 +271,27 @@ def flight_search_node(state: TravelAgentState):
                 "depart_date": date_value or "n/d",
                 "depart_time": depart_time,
             })
-        return sorted(
-            enriched,
-            key=lambda r: r["price_value"] if r.get("price_value") is not None else float("inf")
-        )
+        # Top-N per punteggio multi-criterio (prezzo, durata, scali, orario)
+        return rank_flights(enriched, k=FLIGHT_TOP_N)
+
+    def _ask_depart_on():
+        # Nuova data validata subito: nessuna ricerca SerpApi su date non valide
+        new_date, _, error = validate_trip_dates(input("Nuova data andata (YYYY-MM-DD): ").strip(), return_date)
+        while error:
+            logger.log_event("FLIGHTS", "WARNING", f"{error}: richiesta obbligatoria.")
+            new_date, _, error = validate_trip_dates(input("Inserisci la nuova data andata (YYYY-MM-DD): ").strip(), return_date)
+        return parse_date(new_date)
+
+    def _print_alternatives(ranked):
+        for option in ranked[1:]:
+            price = f"{option['price_value']:.2f}" if option.get("price_value") is not None else "n/d"
+            print(f"  alternativa: {option.get('title', 'N/D')} | {option.get('depart_time', 'n/d')} | {price}")
 
     origin = (state.get("origin") or "").strip()
     destination = (state.get("destination") or "").strip()
-    depart_date = (state.get("depart_date") or "").strip()
-    return_date = (state.get("return_date") or "").strip()
+    # Date tipizzate da normalize_node; la stringa ISO serve solo per SerpApi e i report
+    return_on = state.get("return_on")
+    return_date = return_on.isoformat() if return_on else ""
 
     # Keep this step non-blocking: if key flight inputs are missing, continue normally.
     if not origin or not destination:
@@ -193,12 +302,13 @@ def flight_search_node(state: TravelAgentState):
             "flight_confidence_score": 0.0,
         }
 
-    current_depart_date = depart_date
+    depart_on = state.get("depart_on")
     max_attempts = 3
     attempts = 0
 
     while attempts < max_attempts:
         attempts += 1
+        current_depart_date = depart_on.isoformat() if depart_on else ""
         logger.log_event(
             "FLIGHTS",
             "START",
@@ -212,28 +322,36 @@ def flight_search_node(state: TravelAgentState):
             return_date=return_date,
         )
 
+        if not rows and not flights_available():
+            # Provider degradato: inutile proporre altre date, ogni ricerca fallirebbe
+            logger.log_event("FLIGHTS", "ERROR", "SerpApi non disponibile (circuito aperto): salto la ricerca voli.")
+            return {
+                "flight_options": [],
+                "flight_summary": "Flight provider unavailable (circuit open).",
+                "flight_confidence_score": 0.0,
+                **_trip_dates(state, depart_on, return_on),
+                "tool_status": provider_status(),
+            }
+
         if not rows:
             logger.log_event("FLIGHTS", "WARNING", "Nessuna opzione volo trovata.")
             change = input(
                 Fore.WHITE + "Nessun volo trovato. Vuoi cambiare data andata? (s/n): "
             ).strip().lower()
             if change == "s":
-                new_date = input("Nuova data andata (YYYY-MM-DD): ").strip()
-                while not new_date:
-                    logger.log_event("FLIGHTS", "WARNING", "Data andata mancante: richiesta obbligatoria.")
-                    new_date = input("Inserisci la nuova data andata (YYYY-MM-DD): ").strip()
-                current_depart_date = new_date
+                depart_on = _ask_depart_on()
                 continue
             return {
                 "flight_options": [],
                 "flight_summary": "No flight options found from configured sources.",
                 "flight_confidence_score": 0.0,
-                "depart_date": current_depart_date or None,
+                **_trip_dates(state, depart_on, return_on),
             }
 
         sorted_rows = _enrich_rows(rows, current_depart_date)
         best = sorted_rows[0]
         best_return = None
+        sorted_return_rows = []
 
         best_price = (
             f"{best.get('price_value'):.2f}" if best.get("price_value") is not None else "n/d"
@@ -243,12 +361,13 @@ def flight_search_node(state: TravelAgentState):
             "RESULT",
             f"Proposta volo: {best.get('title', 'N/D')} | prezzo stimato: {best_price}"
         )
-        print("\nProposta volo piu' economica trovata:")
+        print("\nMiglior proposta volo trovata:")
         print(f"- {best.get('title', 'N/D')}")
         print(f"- Data partenza: {best.get('depart_date', 'n/d')}")
         print(f"- Orario partenza: {best.get('depart_time', 'n/d')}")
         if best.get("url"):
             print(f"- Link: {best.get('url')}")
+        _print_alternatives(sorted_rows)
 
         if return_date:
             logger.log_event(
@@ -280,6 +399,7 @@ def flight_search_node(state: TravelAgentState):
                 print(f"- Orario ritorno: {best_return.get('depart_time', 'n/d')}")
                 if best_return.get("url"):
                     print(f"- Link: {best_return.get('url')}")
+                _print_alternatives(sorted_return_rows)
             else:
                 logger.log_event("FLIGHTS", "WARNING", "Nessuna opzione ritorno trovata.")
                 print("\nNessuna opzione ritorno trovata per la data indicata.")
@@ -295,6 +415,10 @@ def flight_search_node(state: TravelAgentState):
                 "price_value": best.get("price_value"),
                 "depart_date": best.get("depart_date", current_depart_date or "n/d"),
                 "depart_time": best.get("depart_time", "n/d"),
+                # Campi del ranking, esportati con il volo scelto
+                "duration": best.get("duration"),
+                "stops": best.get("stops"),
+                "score": best.get("score"),
                 "origin": origin,
                 "destination": destination,
                 "return_date": return_date or None,
@@ -303,6 +427,9 @@ def flight_search_node(state: TravelAgentState):
                 "return_price_value": best_return.get("price_value") if best_return else None,
                 "return_depart_date": best_return.get("depart_date", return_date or "n/d") if best_return else (return_date or "n/d"),
                 "return_depart_time": best_return.get("depart_time", "n/d") if best_return else "n/d",
+                "return_duration": best_return.get("duration") if best_return else None,
+                "return_stops": best_return.get("stops") if best_return else None,
+                "return_score": best_return.get("score") if best_return else None,
             }
             summary = (
                 f"Best option confirmed: {selected.get('title', 'N/D')} "
@@ -317,17 +444,15 @@ def flight_search_node(state: TravelAgentState):
                 )
             return {
                 "flight_options": [selected],
+                "flight_top_options": sorted_rows,
+                "return_top_options": sorted_return_rows,
                 "flight_summary": summary,
                 "flight_confidence_score": 0.8 if best.get("price_value") is not None else 0.5,
-                "depart_date": current_depart_date or None,
+                **_trip_dates(state, depart_on, return_on),
             }
 
         if choice == "n":
-            new_date = input("Nuova data andata (YYYY-MM-DD): ").strip()
-            while not new_date:
-                logger.log_event("FLIGHTS", "WARNING", "Data andata mancante: richiesta obbligatoria.")
-                new_date = input("Inserisci la nuova data andata (YYYY-MM-DD): ").strip()
-            current_depart_date = new_date
+            depart_on = _ask_depart_on()
             continue
 
         # skip o input non riconosciuto => prosegui senza bloccare il flusso
@@ -335,14 +460,14 @@ def flight_search_node(state: TravelAgentState):
             "flight_options": [],
             "flight_summary": "Flight suggestions collected but not confirmed by user.",
             "flight_confidence_score": 0.4,
-            "depart_date": current_depart_date or None,
+            **_trip_dates(state, depart_on, return_on),
         }
 
     return {
         "flight_options": [],
         "flight_summary": "Flight search stopped after max attempts.",
         "flight_confidence_score": 0.0,
-        "depart_date": current_depart_date or None,
+        **_trip_dates(state, depart_on, return_on),
     }
 
 # --- 3. PLANNER NODE (RIFATTO) ---
@@ -359,54 +484,107 @@ def trip_planner_node(state: TravelAgentState):
         logger.log_event("PLANNER", "WARNING", f"Feedback Critic: {feedback}")
         feedback_instr = f"CORREGGI L'ITINERARIO PRECEDENTE BASANDOTI SU QUESTO ERRORE: {feedback}"
 
+    # Ri-pianificazione parziale: il Critic ha bocciato solo alcuni giorni
+    previous_itinerary = state.get("itinerary") or []
+    rejected_days = set(state.get("rejected_days") or [])
+    previous_days = {day.get("day_number") for day in previous_itinerary}
+    partial = bool(
+        feedback and rejected_days and rejected_days <= previous_days and rejected_days != previous_days
+    )
+    if partial:
+        logger.log_event("PLANNER", "INFO", f"Rigenero solo i giorni: {', '.join(map(str, sorted(rejected_days)))}")
+
     # Blacklist luoghi già proposti se il piano è stato bocciato
+    # (cumulativa tra i retry, deduplicata per chiave canonica: "Il Colosseo" == "Colosseo")
     banned_places = []
-    if state.get("critic_feedback") and state.get("itinerary"):
-        for day in state.get("itinerary", []):
+    if state.get("critic_feedback") and previous_itinerary:
+        for day in previous_itinerary:
+            if partial and day.get("day_number") not in rejected_days:
+                continue
             for place in day.get("places", []):
                 name = place.get("name")
                 if name:
                     banned_places.append(name)
+        banned_places = unique_places(list(state.get("banned_places") or []) + banned_places)
         if banned_places:
-            banned_list = ", ".join(sorted(set(banned_places)))
+            # Nel prompt un solo nome per gruppo di varianti ("Colosseo" / "Colosseum")
+            banned_list = compact_name_list(fuzzy_unique(banned_places), limit=MAX_BANNED_IN_PROMPT)
             feedback_instr = f"{feedback_instr}\nNON USARE QUESTI LUOGHI: {banned_list}."
 
-    budget_total = state.get("budget_total")
-    total_budget = extract_budget_number(str(budget_total)) if budget_total else extract_budget_number(state.get("budget", ""))
-    num_days = int(state['days']) if state['days'].isdigit() else 1
-    daily_budget = total_budget / num_days
-    if daily_budget < 60:
+    if _is_low_budget(state):
         low_cost_instr = (
             "BUDGET BASSO: proponi solo street food, mercati, free tour e luoghi gratuiti. "
             "Evita ristoranti costosi o attività a pagamento."
         )
         feedback_instr = f"{feedback_instr}\n{low_cost_instr}" if feedback_instr else low_cost_instr
 
-    budget_total = state.get("budget_total")
-    budget_label = f"{budget_total}€ totale (indicativo)" if budget_total else state.get('budget', 'Non specificato')
+    # Variante di prompt (modalità speculativa): diversifica i candidati
+    variant = state.get("planner_variant")
+    if variant:
+        feedback_instr = f"{feedback_instr}\n{variant}" if feedback_instr else variant
 
-    formatted_prompt = prompts.PLANNER_PROMPT.format(
-        destination=state['destination'],
-        days=state['days'],
-        style=state['travel_style'],
-        budget=budget_label,
-        companion=state.get('companion', 'Solo'),
-        feedback_instruction=feedback_instr
-    )
-    
-    # Chiamata LLM
-    response = llm.invoke([HumanMessage(content=formatted_prompt)])
+    budget_label = _budget_label(state)
+
+    if partial:
+        kept_days = [day for day in previous_itinerary if day.get("day_number") not in rejected_days]
+        formatted_prompt = prompts.PLANNER_PARTIAL_PROMPT.format(
+            destination=state['destination'],
+            days=state.get("days_count") or state['days'],
+            style=state['travel_style'],
+            budget=budget_label,
+            companion=state.get('companion', 'Solo'),
+            kept_days=compact_itinerary(kept_days),
+            days_to_regenerate=", ".join(map(str, sorted(rejected_days))),
+            feedback_instruction=feedback_instr
+        )
+    else:
+        formatted_prompt = prompts.PLANNER_PROMPT.format(
+            destination=state['destination'],
+            days=state.get("days_count") or state['days'],
+            style=state['travel_style'],
+            budget=budget_label,
+            companion=state.get('companion', 'Solo'),
+            feedback_instruction=feedback_instr
+        )
     
-    # Parsing JSON planner output
-    data = safe_json_parse(response.content)
+    # Chiamata LLM + parsing/validazione JSON planner output
+    data = invoke_structured(_invoke_llm, "PLANNER", formatted_prompt, PLANNER_SCHEMA, default_value={})
     
     # Estrazione sicura dei dati
     itinerary_data = data.get("itinerary", [])
 
+    if partial:
+        # I giorni approvati (e la loro verifica Maps) restano intatti
+        new_days = {
+            day.get("day_number"): day for day in itinerary_data
+            if isinstance(day, dict) and day.get("day_number") in rejected_days
+        }
+        missing = sorted(rejected_days - set(new_days))
+        if missing:
+            logger.log_event("PLANNER", "WARNING", f"Giorni non rigenerati, mantengo la versione precedente: {missing}")
+        itinerary_data = [new_days.get(day.get("day_number"), day) for day in previous_itinerary]
+
+    # Il modello a volte ripropone luoghi vietati (anche con articoli/accenti/lingua diversi):
+    # li filtriamo per similarità. È solo un filtro: la verifica dei luoghi resta esatta (finder/Maps).
+    if banned_places and isinstance(itinerary_data, list):
+        banned_index = TrigramIndex(banned_places)
+        for day in itinerary_data:
+            if not isinstance(day, dict) or (partial and day.get("day_number") not in rejected_days):
+                continue
+            places = day.get("places", [])
+            allowed = [p for p in places if not banned_index.contains(p.get("name", ""))]
+            if allowed and len(allowed) < len(places):
+                for place in places:
+                    if place not in allowed:
+                        logger.log_event("PLANNER", "WARNING", f"Luogo già bocciato riproposto, rimosso: {place.get('name')}")
+                day["places"] = allowed
+
     # Stampa sintetica dell'itinerario proposto
     if itinerary_data and isinstance(itinerary_data, list):
         print("\nItinerario proposto:")
         for day in itinerary_data:
+            if partial and day.get("day_number") not in rejected_days:
+                continue
             day_number = day.get("day_number", "?")
             focus = day.get("focus", "N/A")
             places = day.get("places", [])
@@ -420,33 +598,31 @@ def trip_planner_node(state: TravelAgentState):
         logger.log_event("PLANNER", "ERROR", "JSON non valido, uso fallback.")
         itinerary_data = [{"day_number": 1, "focus": "Esplorazione", "places": [{"name": f"Centro {state['destination']}", "address": ""}]}]
 
+    plan_cache = state.get("plan_cache") or {}
     return {
-        "itinerary": itinerary_data, 
+        # Ri-pianificazione parziale: solo i giorni rigenerati viaggiano come delta
+        "itinerary": diff_itinerary(previous_itinerary, itinerary_data) if partial else itinerary_data,
         "is_approved": False,
         "critic_feedback": status_feedback,
+        "rejected_days": None,
         "retry_count": state.get("retry_count", 0) + 1,
-        "banned_places": sorted(set(banned_places)) if banned_places else state.get("banned_places")
+        "banned_places": banned_places or state.get("banned_places"),
+        # Piano salvato ri-pianificato: non è più servibile così com'è (serve il Critic)
+        "plan_cache": {**plan_cache, "hit": False} if plan_cache.get("hit") else state.get("plan_cache"),
+        "token_usage": metrics.usage_snapshot()
     }
 
 # --- 4. FINDER NODE ---
 def places_finder_node(state: TravelAgentState):
     logger.log_event("FINDER", "START", "Verifica Luoghi con Tool Maps")
     
-    budget_total = state.get("budget_total")
-    if budget_total:
-        total_budget = extract_budget_number(str(budget_total))
-    else:
-        total_budget = extract_budget_number(state['budget'])
-    num_days = int(state['days']) if state['days'].isdigit() else 1
-    daily_budget = total_budget / num_days
-
     # Tavily pricing removed: no external cost estimation in finder.
 
     def _address_matches_destination(address: str, destination: str) -> bool:
         if not address or not destination:
             return False
-        address_n = _norm_text(address)
-        dest_n = _norm_text(destination)
+        address_n = norm_text(address)
+        dest_n = norm_text(destination)
         if dest_n in address_n:
             return True
         aliases = {
@@ -467,36 +643,112 @@ def places_finder_node(state: TravelAgentState):
         alternatives = {dest_n}
         alt = aliases.get(dest_n)
         if alt:
-            alternatives.add(_norm_text(alt))
+            alternatives.add(norm_text(alt))
 
         # Support reverse alias (e.g. destination already in english)
         for k, v in aliases.items():
-            if _norm_text(v) == dest_n:
-                alternatives.add(_norm_text(k))
+            if norm_text(v) == dest_n:
+                alternatives.add(norm_text(k))
 
         return any(token in address_n for token in alternatives if token)
 
-    if daily_budget < 70:
+    daily_budget = state.get("daily_budget")
+    if daily_budget is not None and daily_budget < 70:
         logger.log_event("FINDER", "WARNING", f"Budget critico rilevato: {daily_budget}€/giorno.")
 
     updated_itinerary = []
+
+    # Confidenza incrementale: ci fermiamo appena l'esito è già deciso
+    total_places = sum(len(day.get('places', [])) for day in state.get('itinerary', []))
+    tracker = ConfidenceTracker(total_places, CONFIDENCE_THRESHOLD)
+    abort_reason = None
+    abort_labels = {
+        "maps_quota": "Non verificato (Quota Maps esaurita)",
+        "maps_unavailable": "Non verificato (Maps non disponibile)",
+        "low_confidence": "Non verificato (verifica interrotta)",
+    }
+    failed_days = set()
+    # Doppioni: stesso nome canonico prima del lookup, stesso luogo risolto (place_id o nome+indirizzo) dopo
+    seen_names = set()
+    seen_resolved = set()
+
+    def _is_duplicate(resolved, place_name):
+        keys = {f"{place_key(resolved.get('name') or '')}|{norm_text(str(resolved.get('address') or ''))}"}
+        if resolved.get("place_id"):
+            keys.add(resolved["place_id"])
+        if keys & seen_resolved:
+            logger.log_event("FINDER", "WARNING", f"Luogo duplicato rimosso: {place_name} (stesso luogo di un'altra tappa: {resolved.get('name')})")
+            metrics.incr("finder_duplicates_removed")
+            tracker.skip()
+            return True
+        seen_resolved.update(keys)
+        return False
     
     for day in state.get('itinerary', []):
         validated_places = []
         day_print_lines = []
         for place in day.get('places', []):
             place_name = place.get('name', 'Luogo sconosciuto')
+
+            # Stesso nome (a meno di articoli, accenti, punteggiatura) già in itinerario: niente doppioni né lookup
+            name_key = place_key(place_name)
+            if name_key in seen_names:
+                logger.log_event("FINDER", "WARNING", f"Luogo duplicato rimosso: {place_name}")
+                metrics.incr("finder_duplicates_removed")
+                tracker.skip()
+                continue
+            seen_names.add(name_key)
+
+            if abort_reason:
+                validated_places.append({
+                    "name": place_name,
+                    "address": place.get("address", "N/A"),
+                    "rating": "N/A",
+                    "description": abort_labels[abort_reason]
+                })
+                continue
+
+            # Già verificato in un passaggio precedente (giorno approvato dal Critic)
+            if (place.get("description") or "").startswith("Verificato"):
+                if _is_duplicate(place, place_name):
+                    continue
+                tracker.record(True)
+                validated_places.append(place)
+                day_print_lines.append(
+                    f"{place_name} | {place.get('address')} | rating: {place.get('rating', 'N/A')}"
+                )
+                continue
+
+            # Indice POI locale: i luoghi famosi si verificano senza chiamare Maps
+            local_place = lookup_poi(place_name, state["destination"])
+            if local_place:
+                if _is_duplicate(local_place, place_name):
+                    continue
+                tracker.record(True)
+                validated_places.append({
+                    "name": local_place["name"],
+                    "address": local_place["address"],
+                    "rating": local_place["rating"],
+                    "description": "Verificato con indice POI locale",
+                    "lat": local_place["lat"],
+                    "lng": local_place["lng"]
+                })
+                logger.log_event("FINDER", "RESULT", f"Trovato (indice locale): {local_place['name']}")
+                day_print_lines.append(
+                    f"{local_place['name']} | {local_place['address']} | rating: {local_place['rating']}"
+                )
+                continue
+
             query = f"{place_name} {state['destination']}"
             
             logger.log_event("FINDER", "ACTION", f"Richiesta Tool per: {query}")
             
-            # --- CHIAMATA TRAMITE DECORATORE TOOL ---
+            # Risultati e stato di questa query (non l'ultimo stato globale di Maps)
             try:
-                # Essendo un @tool, usiamo .invoke()
-                results = find_places_on_maps.invoke(query)
+                results, maps_status = lookup_place(query)
             except Exception as e:
-                logger.log_event("FINDER", "ERROR", f"Errore invoke tool: {e}")
-                results = []
+                logger.log_event("FINDER", "ERROR", f"Errore lookup Maps: {e}")
+                results, maps_status = [], None
 
             # Se il tool ha restituito la lista di dict correttamente
             if results and isinstance(results, list) and len(results) > 0:
@@ -507,13 +759,19 @@ def places_finder_node(state: TravelAgentState):
                 
             if results and isinstance(results, list) and len(results) > 0:
                 real_place = results[0]
+                if _is_duplicate(real_place, place_name):
+                    continue
                 validated_places.append({
                     "name": real_place.get("name"),
                     "address": real_place.get("address"),
                     "rating": real_place.get("rating", "N/A"),
-                    "description": "Verificato con Google Maps"
+                    "description": "Verificato con Google Maps",
+                    "place_id": real_place.get("place_id"),
+                    "lat": real_place.get("lat"),
+                    "lng": real_place.get("lng")
                 })
                 logger.log_event("FINDER", "RESULT", f"Trovato: {real_place.get('name')}")
+                tracker.record(True)
                 day_print_lines.append(
                     f"{real_place.get('name')} | {real_place.get('address')} | rating: {real_place.get('rating', 'N/A')}"
                 )
@@ -525,19 +783,67 @@ def places_finder_node(state: TravelAgentState):
                     "rating": "N/A",
                     "description": "Non verificato (Verifica quota API)"
                 })
+                tracker.record(False)
+                failed_days.add(day.get("day_number"))
                 day_print_lines.append(
                     f"{place_name} | {place.get('address', 'N/A')} | rating: N/A"
                 )
+
+            if maps_status in MAPS_FATAL_STATUSES:
+                abort_reason = "maps_quota"
+                logger.log_event("FINDER", "ERROR", f"Maps {maps_status}: interrompo le verifiche rimanenti ({tracker.remaining}).")
+            elif maps_status == STATUS_CIRCUIT_OPEN or not maps_available():
+                abort_reason = "maps_unavailable"
+                logger.log_event("FINDER", "ERROR", f"Circuito Maps aperto: interrompo le verifiche rimanenti ({tracker.remaining}).")
+            elif not tracker.can_reach_threshold():
+                abort_reason = "low_confidence"
+                logger.log_event(
+                    "FINDER",
+                    "WARNING",
+                    f"Soglia {CONFIDENCE_THRESHOLD} irraggiungibile ({tracker.failed}/{tracker.total} luoghi falliti): "
+                    f"salto {tracker.remaining} verifiche."
+                )
+            if abort_reason:
+                metrics.incr("finder_skipped_lookups", tracker.remaining)
         
-        day['places'] = validated_places
-        updated_itinerary.append(day)
+        # Nuovo dict: i giorni dello stato precedente non vengono mai mutati
+        updated_itinerary.append({**day, "places": validated_places})
 
         if day_print_lines:
             print(f"\nLuoghi selezionati (giorno {day.get('day_number', '?')}):")
             for line in day_print_lines:
                 print(f"- {line}")
         
-    return {"budget_context": "", "itinerary": updated_itinerary}
+    result = {
+        "budget_context": "",
+        "itinerary": diff_itinerary(state.get("itinerary"), updated_itinerary),
+        "verification_aborted": abort_reason,
+        "tool_status": provider_status(),
+    }
+    if abort_reason == "low_confidence":
+        # Ri-pianificazione diretta (senza Critic) dei soli giorni con luoghi non trovati
+        result["critic_feedback"] = (
+            f"Troppi luoghi non verificabili su Google Maps ({tracker.failed}/{tracker.total}). "
+            "Proponi luoghi reali, noti e con nome esatto."
+        )
+        result["rejected_days"] = sorted(failed_days) or None
+    return result
+
+# --- 4b. ROUTE NODE (clustering + ordinamento tappe) ---
+def route_optimizer_node(state: TravelAgentState):
+    logger.log_event("ROUTE", "START", "Ottimizzazione percorso (distanze reali da Maps)")
+    itinerary, route_metrics = optimize_itinerary(
+        state.get("itinerary", []),
+        min_regroup_gain=ROUTE_REGROUP_MIN_GAIN
+    )
+    summary = (
+        f"Percorso: {route_metrics['total_km']} km, di cui {route_metrics['transfer_km']} tra un giorno e l'altro "
+        f"(prima {route_metrics['original_km']} km)"
+    )
+    if route_metrics["regrouped"]:
+        summary += " | luoghi raggruppati per vicinanza"
+    logger.log_event("ROUTE", "RESULT", summary)
+    return {"itinerary": diff_itinerary(state.get("itinerary"), itinerary), "route_metrics": route_metrics}
 
 # --- 5. CONFIDENCE NODE (POST-FINDER) ---
 def confidence_evaluator_node(state: TravelAgentState):
@@ -549,36 +855,26 @@ def confidence_evaluator_node(state: TravelAgentState):
         confidence = 0.0
         reasons.append("Itinerario vuoto")
     else:
-        unverified = 0
-        total_places = 0
-
-        for day in itinerary:
-            for place in day.get("places", []):
-                total_places += 1
-                if place.get("description", "").startswith("Non verificato"):
-                    unverified += 1
+        tracker = ConfidenceTracker.from_itinerary(itinerary, CONFIDENCE_THRESHOLD)
+        total_places = tracker.total
+        unverified = tracker.failed
 
         if total_places > 0:
-            verified = total_places - unverified
-            verified_ratio = verified / total_places
-            confidence = verified_ratio
+            verified = tracker.verified
+            confidence = tracker.ratio
             reasons.append(f"Verificati {verified}/{total_places} luoghi")
             if unverified > 0:
                 reasons.append(f"Non verificati {unverified}/{total_places}")
         else:
             confidence = 0.0
 
-        budget_total = state.get("budget_total")
-        total_budget = extract_budget_number(str(budget_total)) if budget_total else extract_budget_number(state.get("budget", ""))
-        num_days = int(state['days']) if state['days'].isdigit() else 1
-        daily_budget = total_budget / num_days
-        if daily_budget < 60:
-            reasons.append(f"Budget giornaliero basso ({round(daily_budget, 2)}€)")
+        if _is_low_budget(state):
+            reasons.append(f"Budget giornaliero basso ({state['daily_budget']}€)")
 
     confidence = max(0.0, min(1.0, round(confidence, 2)))
     logger.log_event("CONFIDENCE", "INFO", f"Confidenza Agente: {confidence}")
 
-    if confidence < 0.7:
+    if confidence < CONFIDENCE_THRESHOLD:
         reason_text = "; ".join(reasons) if reasons else "Motivo non specificato"
         logger.log_event(
             "CONFIDENCE",
@@ -591,40 +887,146 @@ def confidence_evaluator_node(state: TravelAgentState):
 def logistics_critic_node(state: TravelAgentState):
     logger.log_event("CRITIC", "START", "Validazione Logistica")
     
-    budget_total = state.get("budget_total")
-    budget_label = f"{budget_total}€ totale (indicativo)" if budget_total else state.get('budget', 'Non specificato')
+    budget_label = _budget_label(state)
 
     formatted_prompt = prompts.CRITIC_PROMPT.format(
         destination=state['destination'],
-        itinerary=json.dumps(state['itinerary'], indent=2),
+        itinerary=compact_itinerary(state['itinerary'], (state.get('route_metrics') or {}).get('per_day_km')),
         budget=budget_label,                  
         budget_context=state.get('budget_context', 'Nessun dato extra')
     )
     
-    response = llm.invoke([HumanMessage(content=formatted_prompt)])
-    data = safe_json_parse(response.content, default_value={"approved": True})
+    data = invoke_structured(_invoke_llm, "CRITIC", formatted_prompt, CRITIC_SCHEMA, default_value={"approved": True})
     
     if data.get('approved'):
         # Usiamo 'RESULT' per il successo (+)
         logger.log_event("CRITIC", "RESULT", "[+] Approvato: L'itinerario rispetta i vincoli logistici e di budget.")
-        return {"is_approved": True, "critic_feedback": None}
+        return {"is_approved": True, "critic_feedback": None, "rejected_days": None, "token_usage": metrics.usage_snapshot()}
     else:
         # Usiamo 'ERROR' o 'WARNING' per la bocciatura [!]
         logger.log_event("CRITIC", "ERROR", f"[!] Bocciato: {data.get('critique')}")
-        return {"is_approved": False, "critic_feedback": data.get('critique')}
+        if metrics.token_budget_exhausted():
+            logger.log_event("CRITIC", "WARNING", f"Budget token esaurito ({metrics.total_tokens()}/{metrics.token_budget}): stop retry.")
+
+        # Verdetti per giorno: il Planner rigenererà solo i giorni bocciati
+        rejected_days = sorted({
+            v.get("day_number") for v in data.get("day_verdicts") or []
+            if not v.get("approved", True) and v.get("day_number") is not None
+        })
+        feedback = data.get('critique')
+        issues = [
+            f"Giorno {v.get('day_number')}: {v.get('issue')}"
+            for v in data.get("day_verdicts") or []
+            if not v.get("approved", True) and v.get("issue")
+        ]
+        if issues:
+            feedback = f"{feedback} | " + " | ".join(issues) if feedback else " | ".join(issues)
+        return {
+            "is_approved": False,
+            "critic_feedback": feedback,
+            "rejected_days": rejected_days or None,
+            "token_usage": metrics.usage_snapshot()
+        }
+
+# --- 5b. SPECULATIVE NODE (planner -> finder -> confidence -> critic in parallelo) ---
+def speculative_planner_node(state: TravelAgentState):
+    k = SPECULATIVE_CANDIDATES
+    logger.log_event("PLANNER", "START", f"Modalità speculativa: {k} candidati in parallelo")
+    cancel = threading.Event()
+
+    def _run_candidate(idx):
+        candidate = dict(state)
+        candidate["planner_variant"] = prompts.PLANNER_VARIANTS[idx % len(prompts.PLANNER_VARIANTS)]
+        for step in (trip_planner_node, places_finder_node, route_optimizer_node,
+                     confidence_evaluator_node, logistics_critic_node):
+            # Un altro candidato è già stato scelto: inutile spendere altre chiamate
+            if cancel.is_set():
+                return None
+            apply_update(candidate, step(candidate))
+            # Verifica interrotta dal Finder: candidato scartato prima di Route/Critic (niente token spesi)
+            if step is places_finder_node and candidate.get("verification_aborted"):
+                logger.log_event(
+                    "PLANNER", "WARNING",
+                    f"Candidato {idx + 1} scartato: verifica interrotta ({candidate['verification_aborted']})."
+                )
+                metrics.incr("speculative_aborted")
+                return None
+        return candidate
+
+    def _rank(candidate):
+        return (bool(candidate.get("is_approved")), candidate.get("confidence_score", 0.0))
+
+    best = None
+    pool = ThreadPoolExecutor(max_workers=k, thread_name_prefix="speculative")
+    try:
+        futures = {pool.submit(_run_candidate, idx): idx for idx in range(k)}
+        for future in as_completed(futures):
+            try:
+                candidate = future.result()
+            except Exception as e:
+                logger.log_event("PLANNER", "ERROR", f"Candidato {futures[future] + 1} fallito: {e}")
+                continue
+            if candidate is None:
+                continue
+            logger.log_event(
+                "PLANNER",
+                "RESULT",
+                f"Candidato {futures[future] + 1}: approvato={candidate.get('is_approved')} "
+                f"confidenza={candidate.get('confidence_score')}"
+            )
+            if best is None or _rank(candidate) > _rank(best):
+                best = candidate
+            # Primo candidato approvato e affidabile: annulliamo gli altri
+            if best.get("is_approved") and best.get("confidence_score", 0.0) >= CONFIDENCE_THRESHOLD:
+                cancel.set()
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    metrics.incr("speculative_rounds")
+    if best is None:
+        logger.log_event("PLANNER", "ERROR", "Nessun candidato valido: proseguo con il loop standard.")
+        return {"is_approved": False, "retry_count": state.get("retry_count", 0) + 1}
+
+    return {
+        "itinerary": best.get("itinerary", []),
+        "confidence_score": best.get("confidence_score", 0.0),
+        "is_approved": bool(best.get("is_approved")),
+        "critic_feedback": best.get("critic_feedback"),
+        "rejected_days": best.get("rejected_days"),
+        "banned_places": best.get("banned_places"),
+        "budget_context": best.get("budget_context", ""),
+        "planner_variant": None,
+        "retry_count": state.get("retry_count", 0) + 1,
+        "token_usage": metrics.usage_snapshot(),
+    }
 
 # --- 6. PUBLISHER NODE ---
 def publisher_node(state: TravelAgentState):
-    from app.tools.publisher import generate_html_report, print_terminal_report, generate_docx_report
+    from app.tools.publisher import publish_reports, parse_report_formats, DEFAULT_REPORT_FORMATS
+
+    formats = list(parse_report_formats(state.get("report_formats") or DEFAULT_REPORT_FORMATS))
+    ask_docx = DOCX_MODE == "lazy" and "docx" in formats
+    if DOCX_MODE != "eager" and "docx" in formats:
+        formats.remove("docx")
+    report_files = publish_reports(state, formats)
+    if ask_docx and input("Vuoi anche il documento Word (.docx)? (s/n): ").strip().lower() == "s":
+        report_files.update(publish_reports(state, ["docx"]))
 
-    print_terminal_report(state)
-    html_file = generate_html_report(state)
-    docx_file = generate_docx_report(state)
+    # Piano approvato e verificato: riusabile per richieste equivalenti
+    # (un hit servito senza ri-verifiche è già salvato così com'è)
+    plan_cache = state.get("plan_cache") or {}
+    served_as_is = plan_cache.get("hit") and not plan_cache.get("stale_places")
+    if plan_cache.get("key") and not served_as_is and state.get("is_approved") \
+            and state.get("confidence_score", 0.0) >= CONFIDENCE_THRESHOLD:
+        save_plan(plan_cache["key"], plan_cache["params"], state, plan_cache.get("verified_at"))
 
     print("\n" + "="*60)
-    print(f"\nReport salvati in 'outputs/': \n   - {os.path.basename(html_file)}\n   - {os.path.basename(docx_file)}")
+    if report_files:
+        saved = "".join(f"\n   - {os.path.basename(path)}" for path in report_files.values() if path)
+        print(f"\nReport salvati in 'outputs/': {saved}")
     print("="*60)
-    return state
+    return {"report_files": report_files}
 
 def ask_human_node(state: TravelAgentState):
     logger.log_event("SYSTEM", "WARNING", f"CONFIDENZA BASSA ({state.get('confidence_score')})")
@@ -638,6 +1040,7 @@ def ask_human_node(state: TravelAgentState):
         return {
             "is_approved": False,
             "critic_feedback": motivo,
+            "rejected_days": None,
             "retry_count": state.get("retry_count", 0) + 1
         }
     
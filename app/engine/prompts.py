@@ -41,6 +41,47 @@ Rispondi SOLO con un JSON valido (senza markdown) con questa struttura:
 }}
 """
 
+PLANNER_PARTIAL_PROMPT = """
+Sei un Travel Planner esperto. Stai correggendo un itinerario di {days} giorni per {destination}.
+
+PROFILO:
+- Stile: {style}
+- Budget: {budget}
+- Gruppo: {companion}
+
+GIORNI GIÀ APPROVATI (non modificarli, non ripetere questi luoghi):
+{kept_days}
+
+GIORNI DA RIGENERARE: {days_to_regenerate}
+
+{feedback_instruction}
+
+Vincoli:
+- Non inventare luoghi: proponi posti realistici e visitabili.
+- Mantieni coerenza logistica con i giorni approvati.
+
+Rispondi SOLO con un JSON valido (senza markdown) contenente SOLO i giorni da rigenerare:
+{{
+  "itinerary": [
+    {{
+      "day_number": 2,
+      "focus": "Tema del giorno",
+      "places": [
+        {{ "name": "Nome Luogo 1", "address": "Indirizzo" }}
+      ]
+    }}
+  ]
+}}
+"""
+
+# Varianti usate in modalità speculativa (un candidato per variante)
+PLANNER_VARIANTS = [
+    "",
+    "VARIANTE: privilegia i luoghi più iconici e centrali, raggruppati per quartiere.",
+    "VARIANTE: privilegia luoghi autentici e meno turistici, con spostamenti brevi a piedi.",
+    "VARIANTE: massimo 3 luoghi al giorno, vicini tra loro, alternando visite e pause.",
+]
+
 FINDER_QUERY_PROMPT = """
 Crea 3 query specifiche per Google Maps per: "{day_desc}" a {destination}.
 Strategia: 1 colazione/pranzo, 1 attività principale, 1 sera/cena.
@@ -61,7 +102,8 @@ Valuta il piano in modo prudente, senza inventare prezzi o somme non presenti ne
 
 DATI:
 - Budget Totale: {budget}
-- Itinerario: {itinerary}
+- Itinerario (una riga per giorno: giorno|tema|luogo (zona; rating; V=verificato su Maps, NV=non verificato)|km in linea d'aria tra le tappe, nell'ordine indicato):
+{itinerary}
 
 REGOLE:
 1. Non stimare numeri (es. "250€ pasti + 150€ attivita'") se non sono esplicitamente presenti nei dati.
@@ -71,11 +113,30 @@ REGOLE:
    - piano palesemente non compatibile col budget dichiarato per tipologia di attivita' (senza inventare cifre),
    - errori strutturali importanti.
 4. Se approvi con incertezza costi, spiega che serve conferma umana finale del budget.
+5. Dai un verdetto per OGNI giorno: se bocci, indica solo i giorni problematici (approved=false) con il motivo.
 
 Rispondi SOLO JSON:
 {{
   "approved": true,
   "critique": "...",
-  "thought_process": "..."
+  "thought_process": "...",
+  "day_verdicts": [
+    {{ "day_number": 1, "approved": true, "issue": "" }}
+  ]
 }}
 """
+
+JSON_FIX_PROMPT = """
+La tua risposta precedente non rispetta il formato richiesto.
+
+ERRORI:
+{errors}
+
+RISPOSTA PRECEDENTE:
+{previous}
+
+FORMATO ATTESO:
+{expected}
+
+Correggi SOLO i problemi indicati e restituisci SOLO il JSON valido (senza markdown, senza testo aggiuntivo).
+"""
@@ -0,0 +1,99 @@
+import os
+import re
+import heapq
+
+
+def _parse_weights(raw: str):
+    """'price=0.55,duration=0.2' -> {'price': 0.55, 'duration': 0.2} (voci non valide ignorate)."""
+    weights = {}
+    for chunk in (raw or "").split(","):
+        key, _, value = chunk.partition("=")
+        try:
+            weights[key.strip().lower()] = float(value)
+        except ValueError:
+            continue
+    return weights
+
+
+def _parse_hours(raw: str):
+    match = re.fullmatch(r"\s*(\d{1,2})\s*-\s*(\d{1,2})\s*", raw or "")
+    if not match:
+        return (7, 21)
+    return (int(match.group(1)), int(match.group(2)))
+
+
+# --- CONFIGURAZIONE ---
+DEFAULT_WEIGHTS = {"price": 0.55, "duration": 0.2, "stops": 0.15, "time": 0.1}
+RANK_WEIGHTS = {**DEFAULT_WEIGHTS, **_parse_weights(os.getenv("FLIGHT_RANK_WEIGHTS", ""))}
+PREFERRED_HOURS = _parse_hours(os.getenv("FLIGHT_PREFERRED_HOURS", "7-21"))
+FLIGHT_TOP_N = int(os.getenv("FLIGHT_TOP_N", "3"))
+
+
+def _to_float(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"\d+(?:[.,]\d+)?", str(value or ""))
+    return float(match.group(0).replace(",", ".")) if match else None
+
+
+def _departure_hour(row):
+    match = re.search(r"\b([01]?\d|2[0-3]):([0-5]\d)\b", str(row.get("depart_time") or ""))
+    if not match:
+        return None
+    return int(match.group(1)) + int(match.group(2)) / 60
+
+
+def _time_penalty(hour, window):
+    """0 dentro la fascia preferita, cresce di 1/6 per ogni ora fuori fascia (max 1)."""
+    if hour is None:
+        return 0.5
+    start, end = window
+    if start <= hour <= end:
+        return 0.0
+    gap = start - hour if hour < start else hour - end
+    return min(1.0, gap / 6)
+
+
+def _normalizer(values):
+    present = [v for v in values if v is not None]
+    if not present:
+        return lambda v: 0.5
+    low, high = min(present), max(present)
+    span = high - low
+    return lambda v: 1.0 if v is None else ((v - low) / span if span else 0.0)
+
+
+def rank_flights(rows, k: int = FLIGHT_TOP_N, weights=None, preferred_hours=None):
+    """
+    Ordina le opzioni volo per punteggio multi-criterio (più basso = migliore):
+    prezzo e durata normalizzati min-max sul set, scali (0, 1, 2+) e distanza
+    dell'orario di partenza dalla fascia preferita, pesati con `weights`.
+    Selezione top-k con heap: O(n log k), adatta a migliaia di righe unite
+    da più aeroporti/date. Ritorna copie delle righe con `score`.
+    """
+    rows = list(rows or [])
+    if not rows or k <= 0:
+        return []
+    weights = {**RANK_WEIGHTS, **(weights or {})}
+    window = preferred_hours or PREFERRED_HOURS
+
+    prices = [_to_float(row.get("price_value")) for row in rows]
+    durations = [_to_float(row.get("duration")) for row in rows]
+    stops = [_to_float(row.get("stops")) for row in rows]
+    price_norm = _normalizer(prices)
+    duration_norm = _normalizer(durations)
+
+    def _scored():
+        for idx, row in enumerate(rows):
+            stop_count = stops[idx]
+            score = (
+                weights.get("price", 0.0) * price_norm(prices[idx])
+                + weights.get("duration", 0.0) * duration_norm(durations[idx])
+                + weights.get("stops", 0.0) * (1.0 if stop_count is None else min(stop_count, 2) / 2)
+                + weights.get("time", 0.0) * _time_penalty(_departure_hour(row), window)
+            )
+            # idx come spareggio: a parità di punteggio vince l'ordine originale
+            yield score, idx
+
+    best = heapq.nsmallest(k, _scored())
+    return [{**rows[idx], "score": round(score, 4)} for score, idx in best]
@@ -0,0 +1,247 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_matrix(coords: np.ndarray) -> np.ndarray:
+    """Matrice (n, n) delle distanze in km tra coppie di punti (lat, lng) in gradi, vettorizzata."""
+    rad = np.radians(np.asarray(coords, dtype=float))
+    lat = rad[:, 0][:, None]
+    lng = rad[:, 1][:, None]
+    dlat = lat - lat.T
+    dlng = lng - lng.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _haversine_to(coords: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Distanze (n, k) tra punti e centroidi."""
+    p = np.radians(coords)[:, None, :]
+    c = np.radians(centers)[None, :, :]
+    dlat = p[..., 0] - c[..., 0]
+    dlng = p[..., 1] - c[..., 1]
+    a = np.sin(dlat / 2) ** 2 + np.cos(p[..., 0]) * np.cos(c[..., 0]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _assign(coords: np.ndarray, centers: np.ndarray, day_sizes) -> np.ndarray:
+    """Assegnazione greedy per distanza crescente, con capacità per giorno."""
+    k = len(centers)
+    d = _haversine_to(coords, centers)
+    capacity = np.array(day_sizes, dtype=int)
+    labels = np.full(len(coords), -1, dtype=int)
+    for flat in np.argsort(d, axis=None):
+        point, day = divmod(int(flat), k)
+        if labels[point] == -1 and capacity[day] > 0:
+            labels[point] = day
+            capacity[day] -= 1
+    return labels
+
+
+def _kmeans(coords: np.ndarray, centers: np.ndarray, day_sizes, iterations: int) -> np.ndarray:
+    labels = np.full(len(coords), -1, dtype=int)
+    for _ in range(iterations):
+        new_labels = _assign(coords, centers, day_sizes)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centers = np.array([
+            coords[labels == day].mean(axis=0) if np.any(labels == day) else centers[day]
+            for day in range(len(centers))
+        ])
+    return labels
+
+
+def _match_to_anchors(centers: np.ndarray, anchors: np.ndarray) -> np.ndarray:
+    """Permutazione dei centroidi: al giorno i va il cluster più vicino al suo baricentro originale (greedy)."""
+    k = len(centers)
+    d = _haversine_to(anchors, centers)
+    matched = np.full(k, -1, dtype=int)
+    used = np.zeros(k, dtype=bool)
+    for flat in np.argsort(d, axis=None):
+        day, cluster = divmod(int(flat), k)
+        if matched[day] == -1 and not used[cluster]:
+            matched[day] = cluster
+            used[cluster] = True
+    return centers[matched]
+
+
+def cluster_into_days(coords: np.ndarray, day_sizes, iterations: int = 10, anchors=None) -> np.ndarray:
+    """
+    K-means bilanciato: raggruppa i luoghi in len(day_sizes) giorni per vicinanza,
+    rispettando il numero di luoghi previsto per ogni giorno. Deterministico.
+    Con `anchors` (baricentro originale di ogni giorno) ogni cluster va al giorno
+    più vicino: l'ordine dei giorni segue quello del planner (niente zig-zag tra città).
+    Ritorna l'indice del giorno per ogni luogo.
+    """
+    coords = np.asarray(coords, dtype=float)
+    k = len(day_sizes)
+    n = len(coords)
+    if k <= 1 or n == 0:
+        return np.zeros(n, dtype=int)
+
+    # Seed farthest-point a partire dal luogo più vicino al baricentro
+    dist = haversine_matrix(coords)
+    first = int(np.argmin(_haversine_to(coords, coords.mean(axis=0, keepdims=True))[:, 0]))
+    seeds = [first]
+    while len(seeds) < k:
+        seeds.append(int(np.argmax(dist[:, seeds].min(axis=1))))
+    labels = _kmeans(coords, coords[seeds], day_sizes, iterations)
+    if anchors is None:
+        return labels
+
+    centers = np.array([
+        coords[labels == cluster].mean(axis=0) if np.any(labels == cluster) else coords[seeds[cluster]]
+        for cluster in range(k)
+    ])
+    return _kmeans(coords, _match_to_anchors(centers, np.asarray(anchors, dtype=float)), day_sizes, iterations)
+
+
+def path_length(dist: np.ndarray, order) -> float:
+    order = np.asarray(order, dtype=int)
+    if len(order) < 2:
+        return 0.0
+    return float(dist[order[:-1], order[1:]].sum())
+
+
+def order_route(dist: np.ndarray):
+    """
+    Percorso aperto breve (TSP euristico): nearest-neighbour da ogni punto di partenza,
+    poi miglioramento 2-opt sul migliore. Adatto alle poche tappe di un giorno.
+    """
+    n = len(dist)
+    if n < 3:
+        return list(range(n))
+
+    best_order, best_len = None, float("inf")
+    for start in range(n):
+        order = [start]
+        visited = np.zeros(n, dtype=bool)
+        visited[start] = True
+        for _ in range(n - 1):
+            row = np.where(visited, np.inf, dist[order[-1]])
+            nxt = int(np.argmin(row))
+            order.append(nxt)
+            visited[nxt] = True
+        length = path_length(dist, order)
+        if length < best_len:
+            best_order, best_len = order, length
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                candidate = best_order[:i] + best_order[i:j + 1][::-1] + best_order[j + 1:]
+                length = path_length(dist, candidate)
+                if length + 1e-9 < best_len:
+                    best_order, best_len, improved = candidate, length, True
+    return best_order
+
+
+def _has_coords(place) -> bool:
+    return place.get("lat") is not None and place.get("lng") is not None
+
+
+def _day_km(places) -> float:
+    located = [p for p in places if _has_coords(p)]
+    if len(located) < 2:
+        return 0.0
+    coords = np.array([[p["lat"], p["lng"]] for p in located])
+    return path_length(haversine_matrix(coords), range(len(located)))
+
+
+def _transfer_km(days) -> float:
+    """Km degli spostamenti tra giorni: ultima tappa geolocalizzata di un giorno -> prima del successivo."""
+    ends = []
+    for day in days:
+        located = [p for p in day["places"] if _has_coords(p)]
+        if located:
+            ends.append((located[0], located[-1]))
+    total = 0.0
+    for (_, last), (first, _) in zip(ends, ends[1:]):
+        coords = np.array([[last["lat"], last["lng"]], [first["lat"], first["lng"]]])
+        total += float(haversine_matrix(coords)[0, 1])
+    return total
+
+
+def _trip_km(days) -> float:
+    return sum(_day_km(day["places"]) for day in days) + _transfer_km(days)
+
+
+def _order_day(places):
+    """Riordina le tappe geolocalizzate del giorno; quelle senza coordinate restano in coda."""
+    located = [p for p in places if _has_coords(p)]
+    others = [p for p in places if not _has_coords(p)]
+    if len(located) < 3:
+        return located + others
+    coords = np.array([[p["lat"], p["lng"]] for p in located])
+    order = order_route(haversine_matrix(coords))
+    return [located[i] for i in order] + others
+
+
+def _place_names(places):
+    return sorted(p.get("name") or "" for p in places)
+
+
+def _regrouped_focus(places, limit: int = 3) -> str:
+    """Tema di un giorno ricomposto dal clustering: il tema del planner non vale più, si elencano le tappe."""
+    names = [p.get("name") for p in places if p.get("name")]
+    if not names:
+        return "Giornata libera"
+    suffix = f" e altre {len(names) - limit}" if len(names) > limit else ""
+    return "Tappe vicine: " + ", ".join(names[:limit]) + suffix
+
+
+def optimize_itinerary(itinerary, min_regroup_gain: float = 0.15):
+    """
+    Ottimizzazione locale del percorso:
+    1. clustering dei luoghi nei giorni per vicinanza, nell'ordine dei giorni del planner
+       (applicato solo se il risparmio sui km complessivi, spostamenti tra giorni inclusi,
+       vale almeno `min_regroup_gain` dei km interni ai giorni: i trasferimenti tra città
+       sono inevitabili e non devono diluire il guadagno, ma un zig-zag tra città lo annulla);
+    2. ordinamento TSP delle tappe di ogni giorno.
+    I giorni che cambiano luoghi col clustering perdono il `focus` del planner
+    (ricalcolato dalle tappe). Ritorna (itinerario, metriche).
+    """
+    days = [dict(day, places=list(day.get("places", []))) for day in itinerary or []]
+    original_km = _trip_km(days)
+
+    ordered = [dict(day, places=_order_day(day["places"])) for day in days]
+    ordered_km = _trip_km(ordered)
+    ordered_day_km = sum(_day_km(day["places"]) for day in ordered)
+
+    regrouped = False
+    located = [(d, p) for d, day in enumerate(days) for p in day["places"] if _has_coords(p)]
+    if len(days) > 1 and len(located) > len(days):
+        sizes = [sum(1 for d, _ in located if d == idx) for idx in range(len(days))]
+        coords = np.array([[p["lat"], p["lng"]] for _, p in located])
+        origin = np.array([d for d, _ in located])
+        anchors = np.array([
+            coords[origin == idx].mean(axis=0) if sizes[idx] else coords.mean(axis=0)
+            for idx in range(len(days))
+        ])
+        labels = cluster_into_days(coords, sizes, anchors=anchors)
+        clustered = []
+        for idx, day in enumerate(days):
+            members = [located[i][1] for i in np.flatnonzero(labels == idx)]
+            others = [p for p in day["places"] if not _has_coords(p)]
+            places = _order_day(members + others)
+            if _place_names(places) != _place_names(day["places"]):
+                clustered.append(dict(day, places=places, focus=_regrouped_focus(places)))
+            else:
+                clustered.append(dict(day, places=places))
+        clustered_km = _trip_km(clustered)
+        if ordered_day_km > 0 and ordered_km - clustered_km >= ordered_day_km * min_regroup_gain:
+            ordered, ordered_km, regrouped = clustered, clustered_km, True
+
+    per_day_km = {day.get("day_number"): round(_day_km(day["places"]), 2) for day in ordered}
+    route_metrics = {
+        "total_km": round(ordered_km, 2),
+        "original_km": round(original_km, 2),
+        "saved_km": round(max(0.0, original_km - ordered_km), 2),
+        "per_day_km": per_day_km,
+        "transfer_km": round(_transfer_km(ordered), 2),
+        "regrouped": regrouped,
+    }
+    return ordered, route_metrics
@@ -0,0 +1,126 @@
+import json
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.schema import validate
+from app.core.utils import extract_json, repair_json
+from app.engine import prompts
+
+# --- SCHEMI OUTPUT LLM ---
+TRAVEL_STYLES = ["RELAX", "AVVENTURA", "CULTURALE", "GASTRONOMICO", "LUSSO", "LOW COST"]
+
+ROUTER_SCHEMA = {
+    "type": "object",
+    "required": ["style"],
+    "properties": {
+        "reasoning": {"type": "string"},
+        "style": {"type": "string", "enum": TRAVEL_STYLES},
+    },
+    "description": '{"reasoning": "...", "style": "' + "|".join(TRAVEL_STYLES) + '"}',
+}
+
+PLACE_SCHEMA = {
+    "type": "object",
+    "required": ["name"],
+    "properties": {
+        "name": {"type": "string"},
+        "address": {"type": "string"},
+    },
+}
+
+PLANNER_SCHEMA = {
+    "type": "object",
+    "required": ["itinerary"],
+    "properties": {
+        "itinerary": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "required": ["day_number", "places"],
+                "properties": {
+                    "day_number": {"type": "integer"},
+                    "focus": {"type": "string"},
+                    "places": {"type": "array", "items": PLACE_SCHEMA},  # lista vuota ammessa (giorno di riposo)
+                },
+            },
+        },
+    },
+    "description": '{"itinerary": [{"day_number": 1, "focus": "...", "places": [{"name": "...", "address": "..."}]}]}',
+}
+
+CRITIC_SCHEMA = {
+    "type": "object",
+    "required": ["approved"],
+    "properties": {
+        "approved": {"type": "boolean"},
+        "critique": {"type": "string"},
+        "thought_process": {"type": "string"},
+        "day_verdicts": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["day_number", "approved"],
+                "properties": {
+                    "day_number": {"type": "integer"},
+                    "approved": {"type": "boolean"},
+                    "issue": {"type": "string"},
+                },
+            },
+        },
+    },
+    "description": (
+        '{"approved": true, "critique": "...", "thought_process": "...", '
+        '"day_verdicts": [{"day_number": 1, "approved": true, "issue": ""}]}'
+    ),
+}
+
+
+def parse_structured(text: str, schema: dict):
+    """
+    Parsing + validazione. Prova prima il JSON così com'è, poi la riparazione locale.
+    Ritorna (dati, errori): dati è None se nessuna delle due strade produce un oggetto valido.
+    """
+    errors = []
+    for attempt, candidate in enumerate((extract_json(text or ""), None)):
+        if candidate is None:
+            candidate = repair_json(text or "")
+        try:
+            data = json.loads(candidate, strict=False)
+        except ValueError as e:
+            errors = [f"JSON non valido: {e}"]
+            continue
+        errors = validate(data, schema)
+        if not errors:
+            if attempt > 0:
+                metrics.incr("structured_repaired")
+            return data, []
+    return None, errors
+
+
+def invoke_structured(call_llm, node_name: str, prompt: str, schema: dict, default_value, max_reasks: int = 1):
+    """
+    Chiama l'LLM e garantisce un output conforme allo schema.
+    Se la riparazione locale non basta, chiede una correzione mirata
+    (solo risposta precedente + errori, non l'intero prompt); poi usa default_value.
+    """
+    response = call_llm(node_name, prompt)
+    data, errors = parse_structured(response.content, schema)
+
+    reasks = 0
+    while data is None and reasks < max_reasks:
+        reasks += 1
+        metrics.incr("structured_reasks")
+        logger.log_event(node_name, "WARNING", f"Output non conforme ({'; '.join(errors[:3])}): richiesta correzione mirata.")
+        fix_prompt = prompts.JSON_FIX_PROMPT.format(
+            errors="\n".join(f"- {e}" for e in errors[:10]),
+            previous=(response.content or "")[:4000],
+            expected=schema.get("description", ""),
+        )
+        response = call_llm(node_name, fix_prompt)
+        data, errors = parse_structured(response.content, schema)
+
+    if data is None:
+        metrics.incr("structured_failures")
+        logger.log_event(node_name, "ERROR", f"Output LLM non valido dopo {reasks} correzioni: uso default.")
+        return default_value
+    return data
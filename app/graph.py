@@ -1,16 +1,46 @@
 from langgraph.graph import StateGraph, END
 from app.core.state import TravelAgentState
+from app.core.metrics import metrics
 from app.engine.nodes import (
-    init_node, travel_router_node, flight_search_node, trip_planner_node,
-    places_finder_node, confidence_evaluator_node, logistics_critic_node, publisher_node, ask_human_node, failure_handler_node
+    init_node, normalize_node, travel_router_node, flight_search_node, trip_planner_node,
+    places_finder_node, confidence_evaluator_node, logistics_critic_node, publisher_node, ask_human_node, failure_handler_node,
+    speculative_planner_node, route_optimizer_node, plan_lookup_node, CONFIDENCE_THRESHOLD, SPECULATIVE_CANDIDATES
 )
 
+def _plan_cache_hit(state: TravelAgentState):
+    return bool((state.get("plan_cache") or {}).get("hit"))
+
+def route_after_lookup(state: TravelAgentState):
+    return "hit" if _plan_cache_hit(state) else "miss"
+
+def route_after_flights(state: TravelAgentState):
+    # Piano salvato: direttamente al Publisher, o al Finder per i soli luoghi scaduti
+    if _plan_cache_hit(state):
+        return "reverify" if state["plan_cache"].get("stale_places") else "cached"
+    # Modalità speculativa: K candidati in parallelo al primo giro
+    if SPECULATIVE_CANDIDATES > 1:
+        return "speculative"
+    return "planner"
+
 def route_after_planner(state: TravelAgentState):
     return "continue"
 
+def route_after_finder(state: TravelAgentState):
+    # Soglia di confidenza già irraggiungibile: ri-pianifica senza passare da Critic/HITL
+    # (non oltre il tetto di spesa token: si prosegue e decide il gate di confidenza)
+    if (
+        state.get("verification_aborted") == "low_confidence"
+        and state.get("retry_count", 0) < 3
+        and not metrics.token_budget_exhausted()
+    ):
+        return "replan"
+    return "continue"
+
 def route_after_confidence(state: TravelAgentState):
-    if state["confidence_score"] < 0.7:
+    if state["confidence_score"] < CONFIDENCE_THRESHOLD:
         return "ask_human"
+    if _plan_cache_hit(state):
+        return "cached"
     return "continue"
 
 def route_after_critic(state: TravelAgentState):
@@ -20,16 +50,32 @@ def route_after_critic(state: TravelAgentState):
     # Se il Critic boccia e abbiamo esaurito i tentativi (e.g. 3)
     if state.get("retry_count", 0) >= 3:
         return "fail"
+
+    # Tetto di spesa token raggiunto: niente altri giri planner/finder/critic
+    if metrics.token_budget_exhausted():
+        return "fail"
         
     return "retry"
 
+def route_after_speculative(state: TravelAgentState):
+    if state.get("is_approved", False):
+        # Candidato approvato ma poco verificato: serve comunque il gate umano
+        if state.get("confidence_score", 0.0) < CONFIDENCE_THRESHOLD:
+            return "ask_human"
+        return "approved"
+    return route_after_critic(state)
+
 workflow = StateGraph(TravelAgentState)
 
 workflow.add_node("init", init_node)
+workflow.add_node("normalize", normalize_node)
+workflow.add_node("plan_lookup", plan_lookup_node)
 workflow.add_node("router", travel_router_node)
 workflow.add_node("flight_search", flight_search_node)
 workflow.add_node("planner", trip_planner_node)
+workflow.add_node("speculative", speculative_planner_node)
 workflow.add_node("finder", places_finder_node)
+workflow.add_node("route", route_optimizer_node)
 workflow.add_node("confidence", confidence_evaluator_node)
 workflow.add_node("critic", logistics_critic_node)
 workflow.add_node("publisher", publisher_node)
@@ -37,9 +83,38 @@ workflow.add_node("ask_human", ask_human_node)
 workflow.add_node("failure_handler", failure_handler_node)
 
 workflow.set_entry_point("init")
-workflow.add_edge("init", "router")
+workflow.add_edge("init", "normalize")
+workflow.add_edge("normalize", "plan_lookup")
+workflow.add_conditional_edges(
+    "plan_lookup",
+    route_after_lookup,
+    {
+        "hit": "flight_search",
+        "miss": "router"
+    }
+)
 workflow.add_edge("router", "flight_search")
-workflow.add_edge("flight_search", "planner")
+workflow.add_conditional_edges(
+    "flight_search",
+    route_after_flights,
+    {
+        "planner": "planner",
+        "speculative": "speculative",
+        "reverify": "finder",
+        "cached": "publisher"
+    }
+)
+
+workflow.add_conditional_edges(
+    "speculative",
+    route_after_speculative,
+    {
+        "approved": "publisher",
+        "ask_human": "ask_human",
+        "retry": "planner",
+        "fail": "failure_handler"
+    }
+)
 
 workflow.add_conditional_edges(
     "planner",
@@ -49,14 +124,24 @@ workflow.add_conditional_edges(
     }
 )
 
-workflow.add_edge("finder", "confidence")
+workflow.add_conditional_edges(
+    "finder",
+    route_after_finder,
+    {
+        "replan": "planner",
+        "continue": "route"
+    }
+)
+
+workflow.add_edge("route", "confidence")
 
 workflow.add_conditional_edges(
     "confidence",
     route_after_confidence,
     {
         "ask_human": "ask_human",
-        "continue": "critic"
+        "continue": "critic",
+        "cached": "publisher"
     }
 )
 
@@ -0,0 +1,129 @@
+import io
+import re
+import zipfile
+from functools import lru_cache
+from docx import Document
+from app.tools.templating import Template
+
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS_PART = "word/_rels/document.xml.rels"
+HYPERLINK_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink"
+# Timestamp fisso delle voci zip: stesso contenuto -> stessi byte (hash stabile tra esecuzioni)
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# --- PARAGRAFI WordprocessingML (stessa struttura prodotta da python-docx) ---
+_P_TITLE = Template(
+    '<w:p><w:pPr><w:pStyle w:val="Title"/><w:jc w:val="center"/></w:pPr>'
+    '<w:r><w:t xml:space="preserve">{{text}}</w:t></w:r></w:p>'
+)
+_P_HEADING = Template(
+    '<w:p><w:pPr><w:pStyle w:val="Heading{{level}}"/></w:pPr>'
+    '<w:r><w:t xml:space="preserve">{{text}}</w:t></w:r></w:p>'
+)
+_P_TEXT = Template('<w:p><w:r><w:t xml:space="preserve">{{text}}</w:t></w:r></w:p>')
+_P_STRONG = Template(
+    '<w:p><w:r><w:rPr><w:b/><w:color w:val="{{color}}"/><w:sz w:val="{{half_points}}"/></w:rPr>'
+    '<w:t xml:space="preserve">{{text}}</w:t></w:r></w:p>'
+)
+_P_LINK = Template(
+    '<w:p><w:pPr><w:pStyle w:val="ListBullet"/></w:pPr><w:hyperlink r:id="{{rid}}">'
+    '<w:r><w:rPr><w:color w:val="0000FF"/><w:u w:val="single"/></w:rPr>'
+    '<w:t xml:space="preserve">{{text}}</w:t></w:r></w:hyperlink></w:p>'
+)
+_REL_LINK = Template('<Relationship Id="{{rid}}" Type="{{type}}" Target="{{url}}" TargetMode="External"/>')
+
+# Caratteri non ammessi in XML 1.0 (python-docx solleverebbe un errore)
+_XML_INVALID = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+@lru_cache(maxsize=1)
+def _template_package():
+    """
+    Pacchetto DOCX di base, costruito una volta per processo dal template python-docx:
+    - zip con tutte le parti statiche (stili, numerazione, tema...) già compresse;
+    - document.xml e relativo .rels spezzati attorno al punto di inserimento.
+    """
+    source = io.BytesIO()
+    Document().save(source)
+
+    static = io.BytesIO()
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(static, "w", zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            if item.filename not in (DOCUMENT_PART, DOCUMENT_RELS_PART):
+                dst.writestr(_zip_info(item.filename), src.read(item.filename))
+        document_xml = src.read(DOCUMENT_PART).decode("utf-8")
+        rels_xml = src.read(DOCUMENT_RELS_PART).decode("utf-8")
+
+    body_start = document_xml.index("<w:body>") + len("<w:body>")
+    sect_start = document_xml.index("<w:sectPr", body_start)
+    rels_end = rels_xml.rindex("</Relationships>")
+    used_ids = [int(n) for n in re.findall(r'Id="rId(\d+)"', rels_xml)]
+    return {
+        "static_zip": static.getvalue(),
+        "document_head": document_xml[:body_start],
+        "document_tail": document_xml[sect_start:],
+        "rels_head": rels_xml[:rels_end],
+        "rels_tail": rels_xml[rels_end:],
+        "first_rid": max(used_ids, default=0) + 1,
+    }
+
+
+def _zip_info(name):
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _clean(text) -> str:
+    return _XML_INVALID.sub("", "" if text is None else str(text))
+
+
+class DocxBuilder:
+    """
+    Costruzione DOCX "bulk": i paragrafi sono frammenti XML accumulati in lista,
+    il pacchetto finale è lo zip statico in cache + document.xml e .rels generati.
+    Nessun passaggio dal modello a oggetti di python-docx per paragrafo.
+    """
+
+    def __init__(self):
+        self._package = _template_package()
+        self._body = []
+        self._rels = []
+        self._next_rid = self._package["first_rid"]
+
+    def title(self, text):
+        self._body.append(_P_TITLE.render(text=_clean(text)))
+
+    def heading(self, text, level=1):
+        self._body.append(_P_HEADING.render(text=_clean(text), level=int(level)))
+
+    def paragraph(self, text):
+        self._body.append(_P_TEXT.render(text=_clean(text)))
+
+    def strong(self, text, size_pt=12, color="003366"):
+        self._body.append(_P_STRONG.render(text=_clean(text), half_points=int(size_pt * 2), color=color))
+
+    def link(self, text, url):
+        rid = f"rId{self._next_rid}"
+        self._next_rid += 1
+        self._rels.append(_REL_LINK.render(rid=rid, type=HYPERLINK_REL, url=_clean(url)))
+        self._body.append(_P_LINK.render(rid=rid, text=_clean(text)))
+
+    def to_bytes(self) -> bytes:
+        package = self._package
+        document_xml = package["document_head"] + "".join(self._body) + package["document_tail"]
+        rels_xml = package["rels_head"] + "".join(self._rels) + package["rels_tail"]
+
+        out = io.BytesIO(package["static_zip"])
+        out.seek(0, io.SEEK_END)
+        # Modalità append: le parti statiche restano compresse così come sono in cache
+        with zipfile.ZipFile(out, "a", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(_zip_info(DOCUMENT_PART), document_xml)
+            archive.writestr(_zip_info(DOCUMENT_RELS_PART), rels_xml)
+        return out.getvalue()
+
+    def save(self, filepath):
+        data = self.to_bytes()
+        with open(filepath, "wb") as f:
+            f.write(data)
+        return filepath
@@ -0,0 +1,147 @@
+"""
+Export machine-readable del piano finale (schema versionato).
+
+    {"schema": "travel-agent/plan", "version": 1, "trace_id": ..., "destination": ..., "itinerary": [...], ...}
+
+Un documento JSON per piano; per i batch, `NdjsonWriter` accoda un piano per riga
+sullo stesso file e `iter_ndjson` lo rilegge in streaming.
+"""
+import os
+import json
+import time
+import threading
+
+EXPORT_SCHEMA = "travel-agent/plan"
+EXPORT_SCHEMA_VERSION = 1
+
+# Serializzazione compatta: niente spazi superflui, UTF-8 diretto
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _compact(mapping):
+    return {key: value for key, value in mapping.items() if value not in (None, "", [], {})}
+
+
+def _place(place):
+    return _compact({
+        "name": place.get("name"),
+        "address": place.get("address"),
+        "rating": place.get("rating"),
+        "lat": place.get("lat"),
+        "lng": place.get("lng"),
+        "description": place.get("description"),
+    })
+
+
+def _flight(option):
+    return _compact({
+        "title": option.get("title"),
+        "price": option.get("price_value"),
+        "depart_date": option.get("depart_date"),
+        "depart_time": option.get("depart_time"),
+        "duration": option.get("duration"),
+        "stops": option.get("stops"),
+        "score": option.get("score"),
+        "url": option.get("url"),
+        "return": _compact({
+            "title": option.get("return_title"),
+            "price": option.get("return_price_value"),
+            "depart_date": option.get("return_depart_date"),
+            "depart_time": option.get("return_depart_time"),
+            "duration": option.get("return_duration"),
+            "stops": option.get("return_stops"),
+            "score": option.get("return_score"),
+            "url": option.get("return_url"),
+        }),
+    })
+
+
+def export_plan(state, trace_id=None, generated_at=None) -> dict:
+    """
+    Documento versionato (solo campi valorizzati) dallo stato finale del grafo.
+    Senza `generated_at` il documento dipende solo dal piano: stesso piano, stessi byte.
+    """
+    return _compact({
+        "schema": EXPORT_SCHEMA,
+        "version": EXPORT_SCHEMA_VERSION,
+        "trace_id": trace_id or state.get("trace_id"),
+        "generated_at": generated_at,
+        "destination": state.get("destination"),
+        "origin": state.get("origin"),
+        "days": state.get("days"),
+        "depart_date": state.get("depart_date"),
+        "return_date": state.get("return_date"),
+        "travel_style": state.get("travel_style"),
+        "approved": bool(state.get("is_approved")),
+        "confidence": _compact({
+            "plan": state.get("confidence_score"),
+            "flight": state.get("flight_confidence_score"),
+        }),
+        "critic_feedback": state.get("critic_feedback"),
+        "flight_summary": state.get("flight_summary"),
+        "flights": [_flight(option) for option in state.get("flight_options") or []],
+        # Alternative del ranking (la prima è il volo scelto)
+        "flight_alternatives": [_flight(option) for option in (state.get("flight_top_options") or [])[1:]],
+        "itinerary": [
+            _compact({
+                "day": day.get("day_number"),
+                "focus": day.get("focus"),
+                "places": [_place(place) for place in day.get("places", [])],
+            })
+            for day in state.get("itinerary") or []
+        ],
+        "route": state.get("route_metrics"),
+    })
+
+
+def dumps_plan(state, trace_id=None, generated_at=None) -> str:
+    return _encoder.encode(export_plan(state, trace_id, generated_at))
+
+
+# Un lock per file (percorso assoluto), condiviso da tutti i writer del processo
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def _lock_for(path):
+    key = os.path.abspath(path)
+    with _path_locks_guard:
+        return _path_locks.setdefault(key, threading.Lock())
+
+
+class NdjsonWriter:
+    """
+    Writer NDJSON in append: un piano per riga, scritto con una sola write.
+    Tra thread le righe sono serializzate dal lock del file (anche con writer diversi);
+    tra processi basta O_APPEND, che accoda ogni write per intero.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = _lock_for(path)
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+
+    def write(self, state, trace_id=None):
+        line = (dumps_plan(state, trace_id, int(time.time())) + "\n").encode("utf-8")
+        with self._lock:
+            # O_APPEND: ogni write singola viene accodata atomicamente
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        return self.path
+
+
+def iter_ndjson(path):
+    """Piani da un file NDJSON, uno alla volta (righe vuote o troncate saltate)."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
@@ -1,49 +1,182 @@
 import os
+import time
+import threading
+from urllib.parse import urlparse
 import googlemaps
 from langchain_core.tools import tool
 from dotenv import load_dotenv
 from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.textindex import place_key
+from app.tools.resilience import call_with_resilience, get_breaker, SingleFlight, ProviderError, CircuitOpenError
 
 load_dotenv()
 
+MAPS_PROVIDER = "google_maps"
+MAPS_TIMEOUT_S = float(os.getenv("GOOGLE_MAPS_TIMEOUT", "10"))
+# Tempo massimo dei retry interni del client su 5xx/timeout (default della libreria: 60s);
+# oltre, l'errore arriva al circuit breaker e all'hedging di resilience.py
+MAPS_RETRY_TIMEOUT_S = float(os.getenv("GOOGLE_MAPS_RETRY_TIMEOUT", str(MAPS_TIMEOUT_S)))
+MAPS_CACHE_TTL_S = float(os.getenv("MAPS_CACHE_TTL", "86400"))
+# Endpoint alternativo con le stesse route (es. app/devtools/fake_services.py)
+MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+
+# Campi richiesti a Find Place: solo quelli usati dal Finder (payload e SKU minimi)
+FIND_PLACE_FIELDS = ["name", "formatted_address", "rating", "place_id", "geometry/location"]
+
+
+def _record_payload(response, *args, **kwargs):
+    """Hook HTTP: byte ricevuti per endpoint Maps (findplacefromtext / textsearch)."""
+    endpoint = urlparse(response.url).path.rstrip("/").split("/")[-2] if response.url else "unknown"
+    metrics.incr(f"maps_{endpoint}_requests")
+    metrics.incr(f"maps_{endpoint}_bytes", len(response.content or b""))
+
+
 api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-gmaps = googlemaps.Client(key=api_key) if api_key else None
+# retry_over_query_limit=False: sulla quota esaurita falliamo subito (ci pensa il circuit breaker)
+gmaps = googlemaps.Client(
+    key=api_key,
+    timeout=MAPS_TIMEOUT_S,
+    retry_timeout=MAPS_RETRY_TIMEOUT_S,
+    retry_over_query_limit=False,
+    base_url=MAPS_BASE_URL,
+    requests_kwargs={"hooks": {"response": _record_payload}},
+) if api_key else None
 
-@tool
-def find_places_on_maps(query: str):
+# Stati Maps dopo i quali ogni ulteriore chiamata è destinata a fallire
+MAPS_FATAL_STATUSES = {"OVER_QUERY_LIMIT", "REQUEST_DENIED"}
+# Richiesta non valida o luogo inesistente: errore della query, non del provider
+MAPS_CLIENT_STATUSES = {"INVALID_REQUEST", "NOT_FOUND"}
+# Stati locali (nessuna risposta di Maps per questa query)
+STATUS_CACHED = "CACHED"
+STATUS_CIRCUIT_OPEN = "CIRCUIT_OPEN"
+STATUS_ERROR = "ERROR"
+STATUS_DISABLED = "DISABLED"
+
+# Richieste identiche concorrenti (più sessioni sulla stessa città) condividono una chiamata
+_maps_singleflight = SingleFlight(MAPS_PROVIDER)
+
+# Cache risultati per chiave canonica esatta (place_key): "Il Colosseo Roma" e "Colosseo Roma"
+# condividono la voce, un nome solo simile no (il risultato vale come verifica del luogo)
+_cache = {}
+_cache_lock = threading.Lock()
+
+def maps_available():
+    """False se il circuito Maps è aperto: il Finder degrada senza chiamare."""
+    return not get_breaker(MAPS_PROVIDER).is_open
+
+
+def _cache_get(query: str):
+    key = place_key(query)
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is None or entry[0] < time.time():
+        return None
+    return [dict(place) for place in entry[1]]
+
+
+def _cache_put(query: str, results):
+    key = place_key(query)
+    with _cache_lock:
+        _cache[key] = (time.time() + MAPS_CACHE_TTL_S, [dict(place) for place in results])
+
+
+def _status_error(status):
+    return ProviderError(
+        f"Maps Status: {status}",
+        quota=status in MAPS_FATAL_STATUSES,
+        client_error=status in MAPS_CLIENT_STATUSES,
+        status=status,
+    )
+
+
+def _checked(call, *args, **kwargs):
+    """Chiamata grezza a Maps: solleva ProviderError sugli stati di errore."""
+    try:
+        response = call(*args, **kwargs)
+    except googlemaps.exceptions.ApiError as e:
+        raise _status_error(e.status)
+
+    status = response.get('status')
+    if status not in ('OK', 'ZERO_RESULTS'):
+        raise _status_error(status)
+    return response
+
+
+def _maps_lookup(query: str):
     """
-    Cerca luoghi reali su Google Maps. 
-    Ritorna una lista di risultati strutturati per il Finder.
+    Find Place con field mask (pochi campi, geometria inclusa);
+    la Text Search completa resta come ripiego solo se Find Place non trova nulla.
+    Ritorna una risposta nel formato Text Search ({'status', 'results'}).
+    """
+    response = _checked(gmaps.find_place, query, "textquery", fields=FIND_PLACE_FIELDS)
+    candidates = response.get('candidates') or []
+    if candidates:
+        return {"status": "OK", "results": candidates}
+
+    metrics.incr("maps_text_search_fallbacks")
+    return _checked(gmaps.places, query=query)
+
+def lookup_place(query: str):
+    """
+    Verifica di un luogo su Google Maps: (risultati strutturati per il Finder, stato).
+    Lo stato è quello di questa query: OK / ZERO_RESULTS, lo stato d'errore di Maps
+    (es. OVER_QUERY_LIMIT), oppure CACHED / CIRCUIT_OPEN / ERROR / DISABLED.
     """
     logger.log_tool("GOOGLE_MAPS", f"Verifica posizione e rating per: {query}")
     if not gmaps:
-        return []
+        return [], STATUS_DISABLED
+
+    cached = _cache_get(query)
+    if cached is not None:
+        metrics.incr("maps_cache_hits")
+        return cached, STATUS_CACHED
 
     try:
-        # Esegue la ricerca
-        response = gmaps.places(query=query)
+        # Esegue la ricerca (single-flight + circuit breaker + hedging)
+        coalesce_key = place_key(query)
+        response = _maps_singleflight.do(coalesce_key, call_with_resilience, MAPS_PROVIDER, _maps_lookup, query)
         
-        # Gestione errori di quota o permessi (se abbiamo esaurito le chiamate)
-        if response.get('status') != 'OK':
-            logger.log_event("TOOL", "ERROR", f"Maps Status: {response.get('status')}")
-            return []
+        status = response.get('status')
+        if status != 'OK':
+            logger.log_event("TOOL", "WARNING", f"Maps Status: {status}")
+            return [], status
 
         results = response.get('results', [])
         if not results:
-            return []
+            return [], "ZERO_RESULTS"
 
         # Estraiamo solo i dati necessari in formato lista di dict
         structured_data = []
         for place in results[:1]:  # Prendiamo il top result
+            location = (place.get('geometry') or {}).get('location') or {}
             structured_data.append({
                 "name": place.get('name'),
                 "address": place.get('formatted_address'),
                 "rating": place.get('rating', 'N/A'),
-                "place_id": place.get('place_id')
+                "place_id": place.get('place_id'),
+                "lat": location.get('lat'),
+                "lng": location.get('lng')
             })
         
-        return structured_data
+        _cache_put(query, structured_data)
+        return structured_data, status
 
+    except CircuitOpenError as e:
+        logger.log_event("TOOL", "WARNING", str(e))
+        return [], STATUS_CIRCUIT_OPEN
+    except ProviderError as e:
+        logger.log_event("TOOL", "ERROR", str(e))
+        return [], e.status or STATUS_ERROR
     except Exception as e:
         logger.log_event("TOOL", "ERROR", f"Eccezione Maps: {str(e)}")
-        return []
\ No newline at end of file
+        return [], STATUS_ERROR
+
+
+@tool
+def find_places_on_maps(query: str):
+    """
+    Cerca luoghi reali su Google Maps. 
+    Ritorna una lista di risultati strutturati per il Finder.
+    """
+    return lookup_place(query)[0]
@@ -0,0 +1,126 @@
+import csv
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.utils import norm_text
+from app.core.textindex import place_key
+
+# Seed CSV (city,name,aliases,address,rating,lat,lng) e indice SQLite derivato
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+POI_SEED_PATH = DATA_DIR / "poi_seed.csv"
+POI_DB_PATH = DATA_DIR / "poi_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE poi (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT,
+    rating REAL,
+    lat REAL,
+    lng REAL
+);
+CREATE TABLE poi_key (
+    city TEXT NOT NULL,
+    key TEXT NOT NULL,
+    poi_id INTEGER NOT NULL REFERENCES poi(id)
+);
+CREATE INDEX idx_poi_key_city ON poi_key(city);
+"""
+
+_conn = None
+_conn_lock = threading.Lock()
+
+
+def _build_index(conn):
+    """Popola l'indice dal CSV: una riga per nome/alias normalizzato e per città/alias città."""
+    conn.executescript(_SCHEMA)
+    with POI_SEED_PATH.open("r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                rating = float(row.get("rating") or 0) or None
+                lat, lng = float(row["lat"]), float(row["lng"])
+            except (KeyError, ValueError):
+                continue
+            cur = conn.execute(
+                "INSERT INTO poi (name, address, rating, lat, lng) VALUES (?, ?, ?, ?, ?)",
+                (row["name"].strip(), (row.get("address") or "").strip(), rating, lat, lng),
+            )
+            names = [row["name"]] + [a for a in (row.get("aliases") or "").split("|") if a.strip()]
+            cities = [c for c in (row.get("city") or "").split("|") if c.strip()]
+            conn.executemany(
+                "INSERT INTO poi_key (city, key, poi_id) VALUES (?, ?, ?)",
+                [(norm_text(city), norm_text(name), cur.lastrowid) for city in cities for name in names],
+            )
+    conn.commit()
+
+
+def _get_conn():
+    """Apre (e se serve ricostruisce) l'indice SQLite; ripiega su un DB in memoria se la cartella è read-only."""
+    global _conn
+    with _conn_lock:
+        if _conn is not None:
+            return _conn
+        if not POI_SEED_PATH.exists():
+            logger.log_event("TOOL", "WARNING", f"POI seed CSV not found: {POI_SEED_PATH}")
+            return None
+
+        stale = not POI_DB_PATH.exists() or POI_DB_PATH.stat().st_mtime < POI_SEED_PATH.stat().st_mtime
+        try:
+            if stale and POI_DB_PATH.exists():
+                POI_DB_PATH.unlink()
+            conn = sqlite3.connect(str(POI_DB_PATH), check_same_thread=False)
+            if stale:
+                _build_index(conn)
+        except (sqlite3.Error, OSError):
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            _build_index(conn)
+        _conn = conn
+        return _conn
+
+
+@lru_cache(maxsize=256)
+def _city_index(city_key: str):
+    """Luoghi noti di una città per chiave canonica (place_key) di nome e alias, costruito una volta per processo."""
+    index = {}
+    conn = _get_conn()
+    if conn is None:
+        return index
+    with _conn_lock:
+        rows = conn.execute(
+            "SELECT k.key, p.name, p.address, p.rating, p.lat, p.lng "
+            "FROM poi_key k JOIN poi p ON p.id = k.poi_id WHERE k.city = ?",
+            (city_key,),
+        ).fetchall()
+    for row in rows:
+        index.setdefault(place_key(row[0]), row[1:])
+    return index
+
+
+def lookup_poi(name: str, city: str):
+    """
+    Cerca un luogo noto nell'indice locale. Solo match esatto sul nome o su un alias
+    (a meno di articoli, accenti e punteggiatura): un hit salta Maps e vale come verificato,
+    quindi un nome solo simile ("Galleria Borghese" / "Villa Borghese") non basta.
+    Ritorna un dict nel formato di lookup_place, oppure None.
+    """
+    index = _city_index(norm_text(city))
+    if not index:
+        return None
+
+    best = index.get(place_key(name))
+    if best is None:
+        metrics.incr("poi_index_misses")
+        return None
+
+    metrics.incr("poi_index_hits")
+    poi_name, address, rating, lat, lng = best
+    return {
+        "name": poi_name,
+        "address": address,
+        "rating": rating if rating is not None else "N/A",
+        "lat": lat,
+        "lng": lng,
+    }
@@ -0,0 +1,259 @@
+"""
+Price watch: rotte/date salvate ricontrollate periodicamente su SerpApi.
+
+    python -m app.tools.price_watch add Milano Londra 2027-03-01 --return-date 2027-03-05
+    python -m app.tools.price_watch list
+    python -m app.tools.price_watch run [--once]
+
+Storico prezzi compatto: una riga CSV (epoch,prezzo,volo) per watch solo quando il prezzo cambia.
+Le watch con data di partenza passata vengono marcate come scadute e non più controllate.
+"""
+import os
+import re
+import csv
+import json
+import time
+import heapq
+import random
+import argparse
+import threading
+from datetime import date
+from pathlib import Path
+from dotenv import load_dotenv
+from app.core.logger import logger
+from app.core.utils import norm_text
+from app.core.dates import validate_trip_dates
+from app.tools.search import search_flights_tool
+
+load_dotenv()
+
+# --- CONFIGURAZIONE ---
+PRICE_WATCH_DIR = Path(os.getenv("PRICE_WATCH_DIR", "price_watch"))
+DEFAULT_INTERVAL_S = int(os.getenv("PRICE_WATCH_INTERVAL", "3600"))
+JITTER = float(os.getenv("PRICE_WATCH_JITTER", "0.2"))  # +/- 20% sull'intervallo
+MIN_CHANGE = float(os.getenv("PRICE_WATCH_MIN_CHANGE", "1.0"))  # variazione minima (EUR) da notificare
+
+_store_lock = threading.Lock()
+
+
+def _watches_path():
+    return PRICE_WATCH_DIR / "watches.json"
+
+
+def _history_path(watch_id):
+    return PRICE_WATCH_DIR / "history" / f"{watch_id}.csv"
+
+
+def _watch_id(origin, destination, depart_date, return_date=""):
+    parts = [origin, destination, depart_date, return_date or "ow"]
+    return "_".join(re.sub(r"[^a-z0-9]+", "-", norm_text(p)).strip("-") for p in parts)
+
+
+def load_watches():
+    path = _watches_path()
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f).get("watches", [])
+
+
+def save_watches(watches):
+    """Scrittura atomica (file temporaneo + replace): un crash non corrompe le watch."""
+    path = _watches_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"watches": watches}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def add_watch(origin, destination, depart_date, return_date="", interval_s=DEFAULT_INTERVAL_S):
+    watch_id = _watch_id(origin, destination, depart_date, return_date)
+    with _store_lock:
+        watches = [w for w in load_watches() if w["id"] != watch_id]
+        watch = {
+            "id": watch_id,
+            "origin": origin,
+            "destination": destination,
+            "depart_date": depart_date,
+            "return_date": return_date or "",
+            "interval_s": int(interval_s),
+            "last_best": None,
+            "last_checked": None,
+            "expired": False,
+        }
+        watches.append(watch)
+        save_watches(watches)
+    return watch
+
+
+def remove_watch(watch_id):
+    with _store_lock:
+        watches = load_watches()
+        kept = [w for w in watches if w["id"] != watch_id]
+        save_watches(kept)
+    return len(kept) != len(watches)
+
+
+def load_history(watch_id):
+    """[(epoch, prezzo, volo)] in ordine cronologico."""
+    path = _history_path(watch_id)
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return [(int(ts), float(price), title) for ts, price, title in csv.reader(f)]
+
+
+def _append_history(watch_id, price, title):
+    path = _history_path(watch_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerow([int(time.time()), f"{price:.2f}", title])
+
+
+def is_expired(watch, today: date = None):
+    """True se la data di partenza (ISO) è già passata."""
+    try:
+        return date.fromisoformat(watch["depart_date"]) < (today or date.today())
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def check_watch(watch):
+    """
+    Ricerca voli per la watch e confronto con l'ultimo miglior prezzo osservato.
+    Aggiorna la watch in place; ritorna l'evento (change = differenza, None alla prima osservazione).
+    La ricerca salta la cache voli: la watch deve vedere il prezzo corrente, non quello di 15 minuti fa.
+    """
+    if watch.get("expired") or is_expired(watch):
+        watch["expired"] = True
+        logger.log_event("PRICE_WATCH", "WARNING", f"{watch['id']}: partenza {watch['depart_date']} passata, watch scaduta.")
+        return {"id": watch["id"], "best_price": None, "previous": watch.get("last_best"), "change": None, "expired": True}
+
+    rows = search_flights_tool(
+        origin=watch["origin"],
+        destination=watch["destination"],
+        depart_date=watch["depart_date"],
+        return_date=watch.get("return_date", ""),
+        use_cache=False,
+    )
+    priced = [r for r in rows if r.get("price_value") is not None]
+    watch["last_checked"] = int(time.time())
+    if not priced:
+        logger.log_event("PRICE_WATCH", "WARNING", f"{watch['id']}: nessun prezzo disponibile.")
+        return {"id": watch["id"], "best_price": None, "previous": watch.get("last_best"), "change": None}
+
+    best = min(priced, key=lambda r: r["price_value"])
+    price = round(best["price_value"], 2)
+    previous = watch.get("last_best")
+    change = None if previous is None else round(price - previous, 2)
+
+    if previous is None or abs(change) >= MIN_CHANGE:
+        _append_history(watch["id"], price, best.get("title", ""))
+        watch["last_best"] = price
+    if change is not None and change <= -MIN_CHANGE:
+        logger.log_event("PRICE_WATCH", "RESULT", f"{watch['id']}: prezzo sceso {previous:.2f} -> {price:.2f} ({best.get('title')})")
+    elif change is not None and change >= MIN_CHANGE:
+        logger.log_event("PRICE_WATCH", "INFO", f"{watch['id']}: prezzo salito {previous:.2f} -> {price:.2f}")
+    else:
+        logger.log_event("PRICE_WATCH", "INFO", f"{watch['id']}: miglior prezzo {price:.2f}")
+    return {"id": watch["id"], "best_price": price, "previous": previous, "change": change, "title": best.get("title")}
+
+
+def _next_delay(interval_s):
+    """Intervallo con jitter: le watch non partono tutte nello stesso istante."""
+    return max(1.0, interval_s * random.uniform(1 - JITTER, 1 + JITTER))
+
+
+def _persist(watch):
+    with _store_lock:
+        watches = load_watches()
+        for idx, current in enumerate(watches):
+            if current["id"] == watch["id"]:
+                watches[idx] = {
+                    **current,
+                    "last_best": watch["last_best"],
+                    "last_checked": watch["last_checked"],
+                    "expired": bool(watch.get("expired")),
+                }
+        save_watches(watches)
+
+
+def run_scheduler(once=False, on_change=None, stop_event=None):
+    """
+    Ciclo di controllo: coda a priorità (prossima esecuzione, id).
+    Il rate limit per provider è applicato dal layer di resilienza (SERPAPI_RATE_PER_MIN);
+    la cache voli è esclusa (ogni controllo interroga SerpApi), il single-flight unisce
+    solo le ricerche identiche contemporanee. Le watch scadute (partenza passata) escono dalla coda.
+    `on_change(evento)` viene chiamata per ogni variazione di prezzo.
+    """
+    stop_event = stop_event or threading.Event()
+    saved = load_watches()
+    watches = {w["id"]: w for w in saved if not w.get("expired")}
+    if not watches:
+        logger.log_event("PRICE_WATCH", "WARNING", "Nessuna watch attiva." if saved else "Nessuna watch salvata.")
+        return []
+
+    events = []
+    now = time.time()
+    # Prima esecuzione sparsa sulla quota di jitter dell'intervallo
+    queue = [(now if once else now + random.uniform(0, JITTER) * w["interval_s"], watch_id) for watch_id, w in watches.items()]
+    heapq.heapify(queue)
+
+    while queue and not stop_event.is_set():
+        run_at, watch_id = heapq.heappop(queue)
+        if stop_event.wait(max(0.0, run_at - time.time())):
+            break
+        watch = watches[watch_id]
+        event = check_watch(watch)
+        _persist(watch)
+        events.append(event)
+        if on_change and event.get("change"):
+            on_change(event)
+        if not once and not event.get("expired"):
+            heapq.heappush(queue, (time.time() + _next_delay(watch["interval_s"]), watch_id))
+    return events
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price watch voli (SerpApi Google Flights).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="Salva una rotta da monitorare")
+    add.add_argument("origin")
+    add.add_argument("destination")
+    add.add_argument("depart_date", help="YYYY-MM-DD (o '1 marzo', '01/03', 'tra 30 giorni')")
+    add.add_argument("--return-date", default="")
+    add.add_argument("--interval", type=int, default=DEFAULT_INTERVAL_S, help="Secondi tra due controlli")
+
+    remove = sub.add_parser("remove", help="Rimuove una watch")
+    remove.add_argument("watch_id")
+
+    sub.add_parser("list", help="Elenca le watch salvate")
+
+    run = sub.add_parser("run", help="Avvia il monitoraggio")
+    run.add_argument("--once", action="store_true", help="Un solo controllo per watch, poi esce")
+
+    args = parser.parse_args(argv)
+    if args.command == "add":
+        depart_date, return_date, error = validate_trip_dates(args.depart_date, args.return_date)
+        if error:
+            parser.error(error)
+        watch = add_watch(args.origin, args.destination, depart_date, return_date, args.interval)
+        print(f"Watch salvata: {watch['id']} (ogni {watch['interval_s']}s)")
+    elif args.command == "remove":
+        print("Rimossa." if remove_watch(args.watch_id) else "Watch non trovata.")
+    elif args.command == "list":
+        for watch in load_watches():
+            last = f"{watch['last_best']:.2f}" if watch.get("last_best") is not None else "n/d"
+            status = "  [scaduta]" if watch.get("expired") or is_expired(watch) else ""
+            print(f"{watch['id']}  ogni {watch['interval_s']}s  ultimo prezzo: {last}  storico: {len(load_history(watch['id']))} punti{status}")
+    elif args.command == "run":
+        try:
+            run_scheduler(once=args.once)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
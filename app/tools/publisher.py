@@ -1,13 +1,22 @@
 import os
-import urllib.parse
-from docx import Document
-from docx.shared import Pt, RGBColor
-from docx.opc.constants import RELATIONSHIP_TYPE as RELATIONSHIP_TYPE
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.artifacts import write_artifact, enforce_retention, OUTPUT_RETENTION
+from app.tools.templating import Template
+from app.tools.docx_writer import DocxBuilder
+from app.tools.export import dumps_plan, NdjsonWriter
 
 # --- CONFIGURAZIONE ---
 OUTPUT_DIR = "outputs"
+REPORT_FORMATS = ("terminal", "html", "docx", "json", "ndjson")
+DEFAULT_REPORT_FORMATS = os.getenv("REPORT_FORMATS", "terminal,html,docx")
+NDJSON_PATH = os.getenv("REPORT_NDJSON_PATH", "")  # default: outputs/plans.ndjson
+# Sopra questa soglia di luoghi il DOCX va in un processo separato (sotto, l'avvio del processo costa più del lavoro)
+DOCX_PROCESS_MIN_PLACES = int(os.getenv("REPORT_DOCX_PROCESS_MIN_PLACES", "200"))
 
 def _ensure_output_dir():
     """
@@ -21,14 +30,31 @@ def _ensure_output_dir():
         os.makedirs(full_output_path)
     return full_output_path
 
+
+ARTIFACT_PREFIX = "viaggio_"
+
+
+def _artifact_stem(state):
+    destination = state.get('destination', 'Viaggio')
+    return f"{ARTIFACT_PREFIX}{destination.replace(' ', '_').lower()}"
+
+
+def _session_id(state):
+    # Il trace id viaggia nello snapshot: in un processo separato il logger ne avrebbe uno nuovo
+    return state.get("trace_id") or logger.trace_id
+
+# Byte -> carattere percent-encoded (stessi caratteri sicuri di urllib.parse.quote, "/" incluso)
+_QUOTE_SAFE = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~/")
+_QUOTE_TABLE = [chr(b) if b in _QUOTE_SAFE else "%%%02X" % b for b in range(256)]
+
 def generate_gmaps_search_link(name, address):
     """Genera un link di ricerca universale (evita errori 404)."""
     if not name and not address:
         return None
     
     query = f"{name} {address}".strip()
-    # Codifica URL sicura
-    safe_query = urllib.parse.quote(query)
+    # Codifica URL sicura (equivalente a urllib.parse.quote, con tabella precalcolata)
+    safe_query = "".join(map(_QUOTE_TABLE.__getitem__, query.encode("utf-8")))
     # Usa l'API di ricerca universale ufficiale
     return f"https://www.google.com/maps/search/?api=1&query={safe_query}"
 
@@ -38,37 +64,6 @@ def _format_terminal_link(label, url):
     # Plain URL for maximum compatibility across terminals
     return f"{url}"
 
-def _add_docx_hyperlink(paragraph, text, url):
-    """
-    Add a clickable hyperlink to a docx paragraph.
-    """
-    part = paragraph.part
-    r_id = part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
-
-    hyperlink = OxmlElement("w:hyperlink")
-    hyperlink.set(qn("r:id"), r_id)
-
-    run = OxmlElement("w:r")
-    rpr = OxmlElement("w:rPr")
-
-    color = OxmlElement("w:color")
-    color.set(qn("w:val"), "0000FF")
-    rpr.append(color)
-
-    underline = OxmlElement("w:u")
-    underline.set(qn("w:val"), "single")
-    rpr.append(underline)
-
-    run.append(rpr)
-    text_elem = OxmlElement("w:t")
-    text_elem.text = text
-    run.append(text_elem)
-
-    hyperlink.append(run)
-    paragraph._p.append(hyperlink)
-    return hyperlink
-
-
 def _top_flight_options(state, max_items=3):
     options = state.get("flight_options") or []
     if not isinstance(options, list):
@@ -92,6 +87,27 @@ def _format_flight_price(option):
     except (TypeError, ValueError):
         return "n/d"
 
+
+def _flight_legs(selected):
+    """Andata (ed eventuale ritorno) del volo scelto, già formattati per i report."""
+    legs = [{
+        "title": selected.get("title", "N/D"),
+        "price": _format_flight_price(selected),
+        "date": selected.get("depart_date", "n/d"),
+        "time": selected.get("depart_time", "n/d"),
+        "url": selected.get("url", ""),
+    }]
+    ret_title = selected.get("return_title")
+    if ret_title and ret_title != "n/d":
+        legs.append({
+            "title": ret_title,
+            "price": _format_flight_price({"price_value": selected.get("return_price_value")}),
+            "date": selected.get("return_depart_date", "n/d"),
+            "time": selected.get("return_depart_time", "n/d"),
+            "url": selected.get("return_url", ""),
+        })
+    return legs
+
 def print_terminal_report(state):
     if not state.get('itinerary') and not state.get('is_approved'):
         print("\n" + "!"*60)
@@ -111,29 +127,11 @@ def print_terminal_report(state):
         if flight_summary:
             print(f"   {flight_summary}")
         if selected:
-            title = selected.get("title", "N/D")
-            url = selected.get("url", "")
-            price = _format_flight_price(selected)
-            dep_date = selected.get("depart_date", "n/d")
-            dep_time = selected.get("depart_time", "n/d")
-            print(f"   1. {title} | prezzo stimato: {price}")
-            print(f"      data: {dep_date} | orario: {dep_time}")
-            if url:
-                print(f"      {url}")
-            ret_title = selected.get("return_title")
-            if ret_title and ret_title != "n/d":
-                ret_price = selected.get("return_price_value")
-                try:
-                    ret_price_text = f"{float(ret_price):.2f}" if ret_price is not None else "n/d"
-                except (TypeError, ValueError):
-                    ret_price_text = "n/d"
-                ret_date = selected.get("return_depart_date", "n/d")
-                ret_time = selected.get("return_depart_time", "n/d")
-                ret_url = selected.get("return_url", "")
-                print(f"   2. {ret_title} | prezzo stimato: {ret_price_text}")
-                print(f"      data: {ret_date} | orario: {ret_time}")
-                if ret_url:
-                    print(f"      {ret_url}")
+            for idx, leg in enumerate(_flight_legs(selected), start=1):
+                print(f"   {idx}. {leg['title']} | prezzo stimato: {leg['price']}")
+                print(f"      data: {leg['date']} | orario: {leg['time']}")
+                if leg["url"]:
+                    print(f"      {leg['url']}")
     
     itinerary = state.get('itinerary', [])
     for day in itinerary:
@@ -154,186 +152,267 @@ def print_terminal_report(state):
                 print(f"       {_format_terminal_link('Apri su Maps', link)}")
             print("       " + "." * 20)
 
-def generate_html_report(state):
-    """Genera un report HTML visivamente ricco."""
-    output_dir = _ensure_output_dir()
-    
-    dest = state.get('destination', 'Viaggio')
-    filename = f"viaggio_{dest.replace(' ', '_').lower()}.html"
-    filepath = os.path.join(output_dir, filename)
-    
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Viaggio a {dest}</title>
-        <meta charset="utf-8">
-        <style>
-            body {{ font-family: 'Segoe UI', sans-serif; padding: 20px; background: #f0f2f5; color: #333; }}
-            h1 {{ color: #2c3e50; text-align: center; border-bottom: 2px solid #3498db; padding-bottom: 10px; }}
-            .day-card {{ background: white; padding: 20px; margin-bottom: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
-            .flight-card {{ background: #eef6ff; padding: 16px; margin-bottom: 20px; border-radius: 10px; border-left: 6px solid #3498db; }}
-            h2 {{ color: #e67e22; }}
-            .place {{ margin-top: 15px; padding: 10px; background: #f9f9f9; border-left: 5px solid #3498db; border-radius: 4px; }}
-            .place-name {{ font-size: 1.1em; font-weight: bold; }}
-            .rating {{ color: #f1c40f; font-weight: bold; }}
-            .address {{ font-style: italic; color: #555; margin: 5px 0; }}
-            a.btn {{ display: inline-block; margin-top: 5px; background: #3498db; color: white; padding: 5px 10px; text-decoration: none; border-radius: 4px; font-size: 0.9em; }}
-            a.btn:hover {{ background: #2980b9; }}
-        </style>
-    </head>
-    <body>
-        <h1>✈️ Itinerario: {dest.upper()}</h1>
+# --- TEMPLATE HTML (compilati una volta all'import) ---
+_HTML_HEAD = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <title>Viaggio a {{dest}}</title>
+    <meta charset="utf-8">
+    <style>
+        body { font-family: 'Segoe UI', sans-serif; padding: 20px; background: #f0f2f5; color: #333; }
+        h1 { color: #2c3e50; text-align: center; border-bottom: 2px solid #3498db; padding-bottom: 10px; }
+        .day-card { background: white; padding: 20px; margin-bottom: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }
+        .flight-card { background: #eef6ff; padding: 16px; margin-bottom: 20px; border-radius: 10px; border-left: 6px solid #3498db; }
+        h2 { color: #e67e22; }
+        .place { margin-top: 15px; padding: 10px; background: #f9f9f9; border-left: 5px solid #3498db; border-radius: 4px; }
+        .place-name { font-size: 1.1em; font-weight: bold; }
+        .rating { color: #f1c40f; font-weight: bold; }
+        .address { font-style: italic; color: #555; margin: 5px 0; }
+        a.btn { display: inline-block; margin-top: 5px; background: #3498db; color: white; padding: 5px 10px; text-decoration: none; border-radius: 4px; font-size: 0.9em; }
+        a.btn:hover { background: #2980b9; }
+    </style>
+</head>
+<body>
+    <h1>✈️ Itinerario: {{dest_upper}}</h1>
+""")
+_HTML_FLIGHT_SUMMARY = Template("<p>{{summary}}</p>")
+_HTML_FLIGHT_LEG = Template("<li>{{title}} | prezzo stimato: {{price}} | data: {{date}} | orario: {{time}}{{link|raw}}</li>")
+_HTML_LINK = Template(" - <a href='{{url}}' target='_blank'>Link</a>")
+_HTML_DAY = Template("<div class='day-card'><h2>Giorno {{day_number}}: {{focus}}</h2>")
+_HTML_PLACE = Template("""
+    <div class='place'>
+        <div class='place-name'>{{name}} <span class='rating'>★ {{rating}}</span></div>
+        <div class='address'>{{address}}</div>
+        <a href='{{url}}' class='btn' target='_blank'>Vedi su Maps</a></div>""")
+_HTML_PLACE_NO_LINK = Template("""
+    <div class='place'>
+        <div class='place-name'>{{name}} <span class='rating'>★ {{rating}}</span></div>
+        <div class='address'>{{address}}</div>
+        </div>""")
+
+
+def iter_html_report(state):
+    """
+    Report HTML in streaming: un chunk per blocco (testata, volo, singolo giorno).
+    Utilizzabile per scrivere su file o su uno stream di risposta senza tenere
+    in memoria l'intero documento.
     """
+    dest = state.get('destination', 'Viaggio')
+    yield _HTML_HEAD.render(dest=dest, dest_upper=dest.upper())
 
     flight_summary = state.get("flight_summary")
     selected = _selected_flight(state)
     if flight_summary or selected:
-        html += "<div class='flight-card'><h2>Volo suggerito</h2>"
+        yield "<div class='flight-card'><h2>Volo suggerito</h2>"
         if flight_summary:
-            html += f"<p>{flight_summary}</p>"
+            yield _HTML_FLIGHT_SUMMARY.render(summary=flight_summary)
         if selected:
-            html += "<ul>"
-            title = selected.get("title", "N/D")
-            url = selected.get("url", "")
-            price = _format_flight_price(selected)
-            dep_date = selected.get("depart_date", "n/d")
-            dep_time = selected.get("depart_time", "n/d")
-            if url:
-                html += (
-                    f"<li>{title} | prezzo stimato: {price} | data: {dep_date} | orario: {dep_time} "
-                    f"- <a href='{url}' target='_blank'>Link</a></li>"
+            yield "<ul>"
+            for leg in _flight_legs(selected):
+                link = _HTML_LINK.render(url=leg["url"]) if leg["url"] else ""
+                yield _HTML_FLIGHT_LEG.render(
+                    title=leg["title"], price=leg["price"], date=leg["date"], time=leg["time"], link=link
                 )
-            else:
-                html += f"<li>{title} | prezzo stimato: {price} | data: {dep_date} | orario: {dep_time}</li>"
-
-            ret_title = selected.get("return_title")
-            if ret_title and ret_title != "n/d":
-                ret_price = selected.get("return_price_value")
-                try:
-                    ret_price_text = f"{float(ret_price):.2f}" if ret_price is not None else "n/d"
-                except (TypeError, ValueError):
-                    ret_price_text = "n/d"
-                ret_date = selected.get("return_depart_date", "n/d")
-                ret_time = selected.get("return_depart_time", "n/d")
-                ret_url = selected.get("return_url", "")
-                if ret_url:
-                    html += (
-                        f"<li>{ret_title} | prezzo stimato: {ret_price_text} | data: {ret_date} | orario: {ret_time} "
-                        f"- <a href='{ret_url}' target='_blank'>Link</a></li>"
-                    )
-                else:
-                    html += (
-                        f"<li>{ret_title} | prezzo stimato: {ret_price_text} | data: {ret_date} | orario: {ret_time}</li>"
-                    )
-            html += "</ul>"
-        html += "</div>"
-    
+            yield "</ul>"
+        yield "</div>"
+
     for day in state.get('itinerary', []):
-        html += f"<div class='day-card'><h2>Giorno {day['day_number']}: {day['focus']}</h2>"
+        chunks = [_HTML_DAY.render(day_number=day.get('day_number'), focus=day.get('focus'))]
         for p in day.get('places', []):
             name = p.get('name', 'Senza nome')
             address = p.get('address', '')
-            rating = p.get('rating', 'N/A')
             link = generate_gmaps_search_link(name, address)
-            
-            html += f"""
-            <div class='place'>
-                <div class='place-name'>{name} <span class='rating'>★ {rating}</span></div>
-                <div class='address'>{address}</div>
-            """
-            if link:
-                html += f"<a href='{link}' class='btn' target='_blank'>Vedi su Maps</a>"
-            html += "</div>"
-        html += "</div>"
-        
-    html += "</body></html>"
-    
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(html)
-        
-    return filepath
+            template = _HTML_PLACE if link else _HTML_PLACE_NO_LINK
+            chunks.append(template.render(name=name, rating=p.get('rating', 'N/A'), address=address, url=link))
+        chunks.append("</div>")
+        yield "".join(chunks)
+
+    yield "</body></html>"
+
+
+def generate_html_report(state):
+    """Genera un report HTML visivamente ricco (scritto in streaming sul file)."""
+    output_dir = _ensure_output_dir()
+    return write_artifact(output_dir, _artifact_stem(state), ".html", iter_html_report(state), _session_id(state))
 
 def generate_docx_report(state):
-    """Genera un file Word ben formattato."""
+    """Genera un file Word ben formattato (template in cache + XML costruito in blocco)."""
     output_dir = _ensure_output_dir()
-    
     destination = state.get('destination', 'Viaggio')
-    filename = f"viaggio_{destination.replace(' ', '_').lower()}.docx"
-    filepath = os.path.join(output_dir, filename)
     
-    doc = Document()
+    doc = DocxBuilder()
     
     # Titolo Principale
-    title = doc.add_heading(f'Itinerario: {destination.upper()}', 0)
-    title.alignment = 1 # Center
+    doc.title(f'Itinerario: {destination.upper()}')
 
-    doc.add_paragraph(f"Ecco il tuo piano di viaggio generato dall'AI per {destination}.")
+    doc.paragraph(f"Ecco il tuo piano di viaggio generato dall'AI per {destination}.")
 
     flight_summary = state.get("flight_summary")
     selected = _selected_flight(state)
     if flight_summary or selected:
-        doc.add_heading("Volo suggerito", level=1)
+        doc.heading("Volo suggerito", level=1)
         if flight_summary:
-            doc.add_paragraph(flight_summary)
+            doc.paragraph(flight_summary)
         if selected:
-            title_text = selected.get("title", "N/D")
-            price = _format_flight_price(selected)
-            url = selected.get("url", "")
-            dep_date = selected.get("depart_date", "n/d")
-            dep_time = selected.get("depart_time", "n/d")
-            doc.add_paragraph(
-                f"1. {title_text} | prezzo stimato: {price} | data: {dep_date} | orario: {dep_time}"
-            )
-            if url:
-                p_link = doc.add_paragraph(style='List Bullet')
-                _add_docx_hyperlink(p_link, "Apri offerta volo", url)
-
-            ret_title = selected.get("return_title")
-            if ret_title and ret_title != "n/d":
-                ret_price = selected.get("return_price_value")
-                try:
-                    ret_price_text = f"{float(ret_price):.2f}" if ret_price is not None else "n/d"
-                except (TypeError, ValueError):
-                    ret_price_text = "n/d"
-                ret_date = selected.get("return_depart_date", "n/d")
-                ret_time = selected.get("return_depart_time", "n/d")
-                ret_url = selected.get("return_url", "")
-                doc.add_paragraph(
-                    f"2. {ret_title} | prezzo stimato: {ret_price_text} | data: {ret_date} | orario: {ret_time}"
+            link_labels = ["Apri offerta volo", "Apri offerta volo ritorno"]
+            for idx, leg in enumerate(_flight_legs(selected), start=1):
+                doc.paragraph(
+                    f"{idx}. {leg['title']} | prezzo stimato: {leg['price']} | data: {leg['date']} | orario: {leg['time']}"
                 )
-                if ret_url:
-                    p_link = doc.add_paragraph(style='List Bullet')
-                    _add_docx_hyperlink(p_link, "Apri offerta volo ritorno", ret_url)
+                if leg["url"]:
+                    doc.link(link_labels[idx - 1], leg["url"])
 
     for day in state.get('itinerary', []):
         # Intestazione Giorno
-        doc.add_heading(f"Giorno {day['day_number']}: {day['focus']}", level=1)
+        doc.heading(f"Giorno {day['day_number']}: {day['focus']}", level=1)
         
         for p in day.get('places', []):
             name = p.get('name', 'Senza nome')
             rating = p.get('rating', 'N/A')
             address = p.get('address', '')
             
-            # Nome Luogo 
-            p_para = doc.add_paragraph()
-            runner = p_para.add_run(f"{name}")
-            runner.bold = True
-            runner.font.size = Pt(12)
-            runner.font.color.rgb = RGBColor(0, 51, 102) # Blu scuro
+            # Nome Luogo (grassetto, 12pt, blu scuro)
+            doc.strong(f"{name}", size_pt=12, color="003366")
             
             # Dettagli
-            doc.add_paragraph(f"   ⭐ Rating: {rating}")
-            doc.add_paragraph(f"   Indirizzo: {address}")
+            doc.paragraph(f"   ⭐ Rating: {rating}")
+            doc.paragraph(f"   Indirizzo: {address}")
             
             # Link Maps
             link = generate_gmaps_search_link(name, address)
             if link:
-                
-                p_link = doc.add_paragraph(style='List Bullet')
-                _add_docx_hyperlink(p_link, "Apri su Maps", link)
+                doc.link("Apri su Maps", link)
             
-            doc.add_paragraph("_" * 40) # Separatore
+            doc.paragraph("_" * 40) # Separatore
+
+    return write_artifact(output_dir, _artifact_stem(state), ".docx", [doc.to_bytes()], _session_id(state))
+
+def generate_json_report(state):
+    """Export JSON versionato (schema in app/tools/export.py), la via di pubblicazione più rapida."""
+    output_dir = _ensure_output_dir()
+    data = dumps_plan(state, _session_id(state))
+    return write_artifact(output_dir, _artifact_stem(state), ".json", [data], _session_id(state))
+
+
+def append_ndjson_report(state):
+    """Accoda il piano a un file NDJSON condiviso (batch: un piano per riga)."""
+    return NdjsonWriter(NDJSON_PATH or os.path.join(_ensure_output_dir(), "plans.ndjson")).write(state, _session_id(state))
+
+
+# --- GENERAZIONE MULTI-FORMATO ---
+_GENERATORS = {
+    "html": generate_html_report,
+    "docx": generate_docx_report,
+    "json": generate_json_report,
+    "ndjson": append_ndjson_report,
+}
+_REPORT_STATE_KEYS = (
+    "destination", "days", "travel_style", "confidence_score", "itinerary",
+    "flight_options", "flight_top_options", "return_top_options", "flight_summary",
+    "route_metrics", "is_approved", "critic_feedback", "origin", "depart_date", "return_date", "flight_confidence_score",
+)
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool():
+    """
+    Pool creato on demand, quando i thread di report/log sono già attivi:
+    con "spawn" il figlio parte da un interprete pulito invece di ereditare
+    (con fork) lock tenuti da altri thread.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_report_worker,
+            )
+        return _process_pool
+
+
+def _init_report_worker():
+    """Figlio del process pool: niente file di log/retention propri, metriche da zero."""
+    logger.disable_file()
+    metrics.reset()
+
+
+def _docx_worker(state):
+    """Eseguito nel figlio: ritorna il percorso e le metriche raccolte, da sommare a quelle del padre."""
+    metrics.reset()
+    path = generate_docx_report(state)
+    return path, metrics.snapshot()
+
+
+def parse_report_formats(raw):
+    """'html, docx' / ['html','docx'] -> ('html','docx'): formati noti, senza duplicati, in ordine."""
+    items = raw.split(",") if isinstance(raw, str) else (raw or [])
+    formats = []
+    for item in items:
+        fmt = str(item).strip().lower()
+        if fmt in REPORT_FORMATS and fmt not in formats:
+            formats.append(fmt)
+        elif fmt and fmt not in REPORT_FORMATS:
+            logger.log_event("PUBLISHER", "WARNING", f"Formato report sconosciuto ignorato: {fmt}")
+    return tuple(formats)
+
+
+def _timed(fmt, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        metrics.record_time(f"report_{fmt}", time.perf_counter() - start)
+
+
+def _place_count(state):
+    return sum(len(day.get("places", [])) for day in state.get("itinerary") or [])
+
+
+def _docx_in_process(state):
+    """DOCX (CPU-bound) nel process pool; il thread chiamante ne misura la durata end-to-end."""
+    path, child_metrics = _get_process_pool().submit(_docx_worker, state).result()
+    metrics.merge(child_metrics)
+    return path
+
+
+def publish_reports(state, formats=None):
+    """
+    Genera i report richiesti (default REPORT_FORMATS) e ritorna {formato: percorso}.
+    Il terminale resta sul thread principale (output ordinato); i file sono prodotti
+    in parallelo su una copia ridotta dello stato, il DOCX in un processo separato
+    quando l'itinerario è molto grande. Un formato che fallisce non blocca gli altri.
+    """
+    formats = parse_report_formats(DEFAULT_REPORT_FORMATS if formats is None else formats)
+    snapshot = {key: state.get(key) for key in _REPORT_STATE_KEYS}
+    snapshot["trace_id"] = logger.trace_id
+    files = {}
+
+    file_formats = [fmt for fmt in formats if fmt != "terminal"]
+    with ThreadPoolExecutor(max_workers=max(1, len(file_formats))) as executor:
+        futures = {}
+        for fmt in file_formats:
+            generator = _GENERATORS[fmt]
+            if fmt == "docx" and _place_count(snapshot) >= DOCX_PROCESS_MIN_PLACES:
+                generator = _docx_in_process
+            futures[fmt] = executor.submit(_timed, fmt, generator, snapshot)
+
+        if "terminal" in formats:
+            _timed("terminal", print_terminal_report, state)
+
+        for fmt, future in futures.items():
+            try:
+                files[fmt] = future.result()
+            except Exception as exc:
+                logger.log_event("PUBLISHER", "ERROR", f"Report {fmt} non generato: {exc}")
+
+    # Solo i report della sessione: plans.ndjson è condiviso e cresce per append
+    enforce_retention(_ensure_output_dir(), keep=files.values(), prefix=ARTIFACT_PREFIX, **OUTPUT_RETENTION)
 
-    doc.save(filepath)
-    return filepath
+    timings = metrics.snapshot()["timings"]
+    summary = " | ".join(f"{fmt} {timings[f'report_{fmt}']['last_ms']:.1f}ms" for fmt in formats if f"report_{fmt}" in timings)
+    if summary:
+        logger.log_event("PUBLISHER", "INFO", f"Tempi report: {summary}")
+    return files
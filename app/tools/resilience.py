@@ -0,0 +1,316 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+# --- CONFIGURAZIONE ---
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+RESET_TIMEOUT_S = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+HEDGING_ENABLED = os.getenv("TOOL_HEDGING", "1") != "0"
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_PRIMARY_WORKERS = int(os.getenv("HEDGE_PRIMARY_WORKERS", "32"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "8"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderError(Exception):
+    """
+    Errore di un provider esterno. `quota=True` apre subito il circuito;
+    `client_error=True` (richiesta non valida, luogo inesistente...) non conta come guasto:
+    il provider ha risposto. `status` è lo stato riportato dal provider, se presente.
+    """
+
+    def __init__(self, message, quota=False, client_error=False, status=None):
+        super().__init__(message)
+        self.quota = quota
+        self.client_error = client_error and not quota
+        self.status = status
+
+
+class CircuitOpenError(ProviderError):
+    """Il circuito del provider è aperto: la chiamata non viene nemmeno tentata."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per provider (closed -> open -> half_open -> closed).
+    Si apre dopo N fallimenti consecutivi o subito su errori di quota;
+    dopo `reset_timeout` lascia passare una sola chiamata di prova.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT_S):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.log_event("TOOL", "INFO", f"Circuito {self.name} richiuso.")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error, quota=False):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self._probe_in_flight = False
+            if quota or self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    metrics.incr(f"{self.name}_circuit_opened")
+                    logger.log_event("TOOL", "ERROR", f"Circuito {self.name} aperto: {error}")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+
+class LatencyTracker:
+    """Finestra mobile delle latenze di un provider, per calcolare il ritardo di hedging (p95)."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def hedge_delay(self):
+        with self._lock:
+            enough = len(self._samples) >= HEDGE_MIN_SAMPLES
+        return self.percentile(HEDGE_PERCENTILE) if enough else None
+
+
+class RateLimiter:
+    """
+    Token bucket per provider: al massimo `rate_per_min` chiamate al minuto,
+    con burst fino a `burst`. `acquire` attende (bloccando) il primo token libero.
+    """
+
+    def __init__(self, rate_per_min, burst=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(burst or max(1, int(rate_per_min // 6) or 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_s = (1 - self.tokens) / self.rate
+            time.sleep(wait_s)
+
+    def try_acquire(self):
+        """Come `acquire`, ma senza attendere: False se non c'è un token libero."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class _InFlightCall:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescing delle chiamate identiche in volo: se più sessioni chiedono la stessa
+    chiave nello stesso momento, parte una sola chiamata e il risultato viene condiviso.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+
+        if not leader:
+            metrics.incr(f"{self.name}_coalesced")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr(f"{self.name}_calls")
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+_BREAKERS = {}
+_LATENCIES = {}
+_RATE_LIMITERS = {}
+_REGISTRY_LOCK = threading.Lock()
+# Pool separati: una chiamata primaria non resta in coda dietro agli hedge (e viceversa)
+_PRIMARY_POOL = ThreadPoolExecutor(max_workers=HEDGE_PRIMARY_WORKERS, thread_name_prefix="primary")
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+
+def get_breaker(provider):
+    with _REGISTRY_LOCK:
+        if provider not in _BREAKERS:
+            _BREAKERS[provider] = CircuitBreaker(provider)
+            _LATENCIES[provider] = LatencyTracker()
+        return _BREAKERS[provider]
+
+
+def get_rate_limiter(provider):
+    """
+    Rate limiter del provider da env `<PROVIDER>_RATE_PER_MIN` (es. SERPAPI_RATE_PER_MIN=30).
+    None se non configurato (nessun limite).
+    """
+    with _REGISTRY_LOCK:
+        if provider not in _RATE_LIMITERS:
+            rate = float(os.getenv(f"{provider.upper()}_RATE_PER_MIN", "0") or 0)
+            _RATE_LIMITERS[provider] = RateLimiter(rate) if rate > 0 else None
+        return _RATE_LIMITERS[provider]
+
+
+def provider_status():
+    """Stato dei circuiti, da propagare nello stato del grafo (`tool_status`)."""
+    with _REGISTRY_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {b.name: OPEN if b.is_open else b.state for b in breakers}
+
+
+def _timed(provider, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    _LATENCIES[provider].observe(time.perf_counter() - start)
+    return result
+
+
+def _hedged(provider, fn, *args, **kwargs):
+    """
+    Richiesta "hedged": se la prima chiamata supera il p95 storico del provider,
+    ne parte una seconda identica e vince la prima che risponde.
+    Anche la seconda consuma un token del rate limiter: senza token libero niente hedge.
+    Il ritardo di hedge parte quando la primaria è in esecuzione: l'attesa in coda
+    nel pool non conta né nel ritardo né nella latenza misurata.
+    """
+    delay = _LATENCIES[provider].hedge_delay() if HEDGING_ENABLED else None
+    if delay is None:
+        return _timed(provider, fn, *args, **kwargs)
+
+    started = threading.Event()
+
+    def _primary():
+        started.set()
+        return _timed(provider, fn, *args, **kwargs)
+
+    futures = [_PRIMARY_POOL.submit(_primary)]
+    started.wait()
+    done, _ = wait(futures, timeout=delay)
+    if not done:
+        limiter = get_rate_limiter(provider)
+        if limiter is None or limiter.try_acquire():
+            metrics.incr(f"{provider}_hedged")
+            futures.append(_HEDGE_POOL.submit(_timed, provider, fn, *args, **kwargs))
+        else:
+            metrics.incr(f"{provider}_hedge_rate_limited")
+
+    last_error = None
+    for future in as_completed(futures):
+        try:
+            return future.result()
+        except Exception as e:
+            last_error = e
+    raise last_error
+
+
+def call_with_resilience(provider, fn, *args, **kwargs):
+    """
+    Esegue `fn` protetta dal circuit breaker del provider (con hedging).
+    `fn` deve sollevare ProviderError (o qualunque eccezione) in caso di errore.
+    Contano come guasti solo errori di trasporto, 5xx e quota: un errore "client"
+    (ProviderError con client_error=True) dimostra che il provider risponde.
+    """
+    breaker = get_breaker(provider)
+    if not breaker.allow():
+        metrics.incr(f"{provider}_short_circuited")
+        raise CircuitOpenError(f"Circuito {provider} aperto ({breaker.last_error})")
+
+    limiter = get_rate_limiter(provider)
+    if limiter is not None:
+        limiter.acquire()
+
+    try:
+        result = _hedged(provider, fn, *args, **kwargs)
+    except ProviderError as e:
+        if e.client_error:
+            breaker.record_success()
+        else:
+            breaker.record_failure(e, quota=e.quota)
+        raise
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    breaker.record_success()
+    return result
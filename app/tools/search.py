@@ -2,14 +2,19 @@ import os
 import re
 import json
 import csv
-import unicodedata
 import urllib.parse
 import urllib.request
 import urllib.error
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import date, timedelta
 from tavily import TavilyClient
 from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.utils import norm_text
+from app.core.dates import validate_trip_dates
+from app.tools.resilience import call_with_resilience, get_breaker, SingleFlight, ProviderError, CircuitOpenError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +22,23 @@ load_dotenv()
 tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
 serpapi_key = os.getenv("SERPAPI_API_KEY")
 
+SERPAPI_PROVIDER = "serpapi"
+SERPAPI_TIMEOUT_S = float(os.getenv("SERPAPI_TIMEOUT", "20"))
+# Base URL configurabile (es. server finto locale: python -m app.devtools.fake_services)
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com").rstrip("/")
+# Fan-out multi-aeroporto: aeroporti per città, ricerche parallele e cache per coppia
+MAX_AIRPORTS_PER_CITY = int(os.getenv("FLIGHT_MAX_AIRPORTS_PER_CITY", "4"))
+FLIGHT_SEARCH_WORKERS = int(os.getenv("FLIGHT_SEARCH_WORKERS", "4"))
+FLIGHT_CACHE_TTL_S = float(os.getenv("FLIGHT_CACHE_TTL", "900"))
+MAX_OPTIONS_PER_PAIR = 6
+
+# Ricerche identiche (stessa rotta e date) in volo contemporaneamente condividono una chiamata
+_serpapi_singleflight = SingleFlight(SERPAPI_PROVIDER)
+
+# Cache risultati per coppia di aeroporti e date: chiave -> (scadenza, righe)
+_flight_cache = {}
+_flight_cache_lock = threading.Lock()
+
 
 def _load_airport_seed():
     """
@@ -47,13 +69,6 @@ def _load_airport_seed():
 _AIRPORT_SEED = _load_airport_seed()
 
 
-def _norm_text(value: str) -> str:
-    text = (value or "").strip().lower()
-    text = unicodedata.normalize("NFKD", text)
-    text = "".join(ch for ch in text if not unicodedata.combining(ch))
-    return text
-
-
 def _normalize_airport_id(raw_value: str) -> str:
     """
     Converte input utente in IATA usando SOLO il CSV seed locale.
@@ -72,12 +87,12 @@ def _normalize_airport_id(raw_value: str) -> str:
     if m:
         return m.group(1).upper()
 
-    lower = _norm_text(value)
+    lower = norm_text(value)
     best_code = ""
     best_score = -1
     for row in _AIRPORT_SEED:
-        city = _norm_text(row.get("city", ""))
-        airport_name = _norm_text(row.get("airport_name", ""))
+        city = norm_text(row.get("city", ""))
+        airport_name = norm_text(row.get("airport_name", ""))
         iata = row.get("iata", "")
 
         score = -1
@@ -96,54 +111,38 @@ def _normalize_airport_id(raw_value: str) -> str:
 
     return best_code
 
-def _normalize_outbound_date(depart_date: str) -> str:
+
+def _resolve_airport_ids(raw_value: str, limit: int = MAX_AIRPORTS_PER_CITY):
     """
-    SerpApi Google Flights richiede outbound_date in formato YYYY-MM-DD.
-    Se input non valido, usa una data di fallback (oggi + 30 giorni).
+    Come _normalize_airport_id ma ritorna gli aeroporti della città in ordine di rilevanza
+    (ordine del seed: per traffico passeggeri, aeroporto principale per primo), es. "Milano" -> [MXP, LIN, BGY].
+    Oltre `limit` (FLIGHT_MAX_AIRPORTS_PER_CITY) si tengono i più rilevanti e gli esclusi vengono loggati.
+    Un codice IATA esplicito resta un solo aeroporto.
     """
-    text = (depart_date or "").strip()
-    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
-        return text
-
-    # Supporta input naturali tipo "1 marzo", "01 MARZO", "1 March".
-    month_map = {
-        "gennaio": 1, "january": 1,
-        "febbraio": 2, "february": 2,
-        "marzo": 3, "march": 3,
-        "aprile": 4, "april": 4,
-        "maggio": 5, "may": 5,
-        "giugno": 6, "june": 6,
-        "luglio": 7, "july": 7,
-        "agosto": 8, "august": 8,
-        "settembre": 9, "september": 9,
-        "ottobre": 10, "october": 10,
-        "novembre": 11, "november": 11,
-        "dicembre": 12, "december": 12,
-    }
-    m = re.match(r"^\s*(\d{1,2})\s+([A-Za-zÀ-ÿ]+)\s*$", text, flags=re.IGNORECASE)
-    if m:
-        day = int(m.group(1))
-        month_key = m.group(2).strip().lower()
-        month = month_map.get(month_key)
-        if month:
-            year = date.today().year
-            try:
-                parsed = date(year, month, day)
-                # Se già passata, sposta all'anno prossimo.
-                if parsed < date.today():
-                    parsed = date(year + 1, month, day)
-                return parsed.isoformat()
-            except ValueError:
-                pass
-    return (date.today() + timedelta(days=30)).isoformat()
-
-
-def _normalize_return_date(return_date: str) -> str:
-    text = (return_date or "").strip()
-    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
-        return text
-    return ""
+    value = (raw_value or "").strip()
+    explicit = re.fullmatch(r"[A-Za-z]{3}", value) or re.search(r"\(([A-Za-z]{3})\)", value)
+    if not value or explicit:
+        code = _normalize_airport_id(value)
+        return [code] if code else []
 
+    city = norm_text(value)
+    codes = []
+    for row in _AIRPORT_SEED:
+        if norm_text(row.get("city", "")) == city and row["iata"] not in codes:
+            codes.append(row["iata"])
+    if not codes:
+        code = _normalize_airport_id(value)
+        codes = [code] if code else []
+    limit = max(1, limit)
+    if len(codes) > limit:
+        metrics.incr("flight_airports_dropped", len(codes) - limit)
+        logger.log_event(
+            "TOOL",
+            "WARNING",
+            f"{value}: {len(codes)} aeroporti, cerco i {limit} più rilevanti ({', '.join(codes[:limit])}); "
+            f"esclusi {', '.join(codes[limit:])} (FLIGHT_MAX_AIRPORTS_PER_CITY={limit})."
+        )
+    return codes[:limit]
 
 def _price_to_float(price_value):
     if isinstance(price_value, (int, float)):
@@ -157,6 +156,38 @@ def _price_to_float(price_value):
                 return None
     return None
 
+def flights_available():
+    """False se il circuito SerpApi è aperto: il nodo voli degrada senza chiamare."""
+    return not get_breaker(SERPAPI_PROVIDER).is_open
+
+
+def _fetch_serpapi(params: dict):
+    """Chiamata HTTP grezza a SerpApi: solleva ProviderError su errori/quota."""
+    endpoint = f"{SERPAPI_BASE_URL}/search.json?{urllib.parse.urlencode(params)}"
+    try:
+        with urllib.request.urlopen(endpoint, timeout=SERPAPI_TIMEOUT_S) as resp:
+            payload = json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        try:
+            body = e.read().decode("utf-8", errors="ignore")
+        except Exception:
+            body = ""
+        # 401/403/429: chiave o quota; altri 4xx: richiesta non valida (non è un guasto del provider)
+        raise ProviderError(
+            f"SerpApi HTTP {e.code}: {body[:400] or str(e)}",
+            quota=e.code in (401, 403, 429),
+            client_error=400 <= e.code < 500,
+            status=e.code,
+        )
+
+    error = payload.get("error")
+    if error and "hasn't returned any results" not in error:
+        # Es. "Your account has run out of searches." (quota) o parametri non validi (client)
+        quota = "run out" in error.lower() or "limit" in error.lower()
+        raise ProviderError(f"SerpApi error: {error}", quota=quota, client_error=not quota)
+    return payload
+
+
 def search_prices_tool(query: str):
     """
     Cerca su internet i prezzi attuali e consigli per risparmiare.
@@ -188,106 +219,155 @@ def search_prices_tool(query: str):
         return "Informazioni sui prezzi non disponibili."
 
 
-def search_flights_tool(origin: str, destination: str, depart_date: str = "", return_date: str = ""):
+def _parse_flight_rows(payload: dict, origin_id: str, destination_id: str):
+    """Estrae le prime opzioni (best_flights, poi other_flights) in righe strutturate."""
+    flight_rows = []
+    url = payload.get("search_metadata", {}).get("google_flights_url", "")
+    for block_name in ("best_flights", "other_flights"):
+        for option in payload.get(block_name, []):
+            if len(flight_rows) >= MAX_OPTIONS_PER_PAIR:
+                return flight_rows
+            flights = option.get("flights", [])
+            first_leg = flights[0] if flights else {}
+            last_leg = flights[-1] if flights else {}
+
+            dep_air = first_leg.get("departure_airport", {}) or {}
+            arr_air = last_leg.get("arrival_airport", {}) or {}
+            airline = first_leg.get("airline", "N/D")
+
+            dep_code = dep_air.get("id", origin_id)
+            arr_code = arr_air.get("id", destination_id)
+            dep_time = dep_air.get("time", "n/d")
+            arr_time = arr_air.get("time", "n/d")
+
+            stops = max(len(flights) - 1, 0)
+            duration = option.get("total_duration", "n/d")
+            price_raw = option.get("price")
+            price_value = _price_to_float(price_raw)
+            price_text = f"{price_value:.2f}" if price_value is not None else str(price_raw or "n/d")
+
+            title = f"{airline} {dep_code}->{arr_code}"
+            content = (
+                f"Departure {dep_time} | Arrival {arr_time} | "
+                f"Stops {stops} | Duration {duration} | Price {price_text}"
+            )
+
+            flight_rows.append({
+                "title": title,
+                "content": content,
+                "raw_content": json.dumps(option, ensure_ascii=False),
+                "url": url,
+                "source": "serpapi",
+                "price_value": price_value,
+                "depart_time": dep_time,
+                "arrival_time": arr_time,
+                "stops": str(stops),
+                "duration": str(duration),
+                "departure_id": dep_code,
+                "arrival_id": arr_code,
+            })
+    return flight_rows
+
+
+def _search_airport_pair(origin_id: str, destination_id: str, outbound_date: str, inbound_date: str, use_cache: bool = True):
+    """
+    Ricerca su una singola coppia di aeroporti (cache TTL + single-flight + circuit breaker).
+    Con use_cache=False la cache non viene letta ma il risultato fresco la aggiorna.
+    """
+    params = {
+        "engine": "google_flights",
+        "departure_id": origin_id,
+        "arrival_id": destination_id,
+        "outbound_date": outbound_date,
+        "currency": "EUR",
+        "hl": "it",
+        "gl": "it",
+        "api_key": serpapi_key,
+    }
+    if inbound_date:
+        params["type"] = 1  # round trip
+        params["return_date"] = inbound_date
+    else:
+        params["type"] = 2  # one way
+
+    coalesce_key = tuple(sorted((k, str(v)) for k, v in params.items() if k != "api_key"))
+    with _flight_cache_lock:
+        cached = _flight_cache.get(coalesce_key) if use_cache else None
+    if cached and cached[0] > time.time():
+        metrics.incr("flight_cache_hits")
+        return [dict(row) for row in cached[1]]
+
+    try:
+        payload = _serpapi_singleflight.do(coalesce_key, call_with_resilience, SERPAPI_PROVIDER, _fetch_serpapi, params)
+    except CircuitOpenError as e:
+        logger.log_event("TOOL", "WARNING", str(e))
+        return []
+    except ProviderError as e:
+        logger.log_event("TOOL", "ERROR", f"{origin_id}->{destination_id}: {e}")
+        return []
+    except Exception as e:
+        logger.log_event("TOOL", "ERROR", f"SerpApi flights error ({origin_id}->{destination_id}): {e}")
+        return []
+
+    rows = _parse_flight_rows(payload, origin_id, destination_id)
+    with _flight_cache_lock:
+        _flight_cache[coalesce_key] = (time.time() + FLIGHT_CACHE_TTL_S, [dict(row) for row in rows])
+    return rows
+
+
+def search_flights_tool(origin: str, destination: str, depart_date: str = "", return_date: str = "", use_cache: bool = True):
     """
     Cerca opzioni voli tramite SerpApi (Google Flights) e ritorna risultati strutturati.
+    Per le città con più aeroporti interroga in parallelo tutte le coppie origine x destinazione
+    e unisce i risultati ordinati per prezzo. use_cache=False forza prezzi freschi (price watch).
     """
     try:
         if not serpapi_key:
             logger.log_event("TOOL", "ERROR", "SERPAPI_API_KEY missing.")
             return []
 
-        origin_id = _normalize_airport_id(origin)
-        destination_id = _normalize_airport_id(destination)
-        if not origin_id or not destination_id:
+        outbound_date, inbound_date, date_error = validate_trip_dates(depart_date, return_date)
+        if date_error:
+            # Niente fallback su date inventate: una ricerca su date sbagliate è solo quota sprecata
+            logger.log_event("TOOL", "ERROR", f"{date_error}: ricerca voli annullata.")
+            metrics.incr("flight_invalid_dates")
+            return []
+
+        origin_ids = _resolve_airport_ids(origin)
+        destination_ids = _resolve_airport_ids(destination)
+        if not origin_ids or not destination_ids:
             logger.log_event(
                 "TOOL",
                 "WARNING",
-                f"Airport resolution failed from CSV (origin='{origin}' -> '{origin_id}', destination='{destination}' -> '{destination_id}')"
+                f"Airport resolution failed from CSV (origin='{origin}' -> {origin_ids}, destination='{destination}' -> {destination_ids})"
             )
             return []
-        logger.log_event("SERPAPI_FLIGHTS", "INFO", f"Resolved route: {origin} -> {origin_id} | {destination} -> {destination_id}")
-        outbound_date = _normalize_outbound_date(depart_date)
-        inbound_date = _normalize_return_date(return_date)
-
-        params = {
-            "engine": "google_flights",
-            "departure_id": origin_id,
-            "arrival_id": destination_id,
-            "outbound_date": outbound_date,
-            "currency": "EUR",
-            "hl": "it",
-            "gl": "it",
-            "api_key": serpapi_key,
-        }
-        if inbound_date:
-            params["type"] = 1  # round trip
-            params["return_date"] = inbound_date
-        else:
-            params["type"] = 2  # one way
-
-        endpoint = f"https://serpapi.com/search.json?{urllib.parse.urlencode(params)}"
-        with urllib.request.urlopen(endpoint, timeout=20) as resp:
-            payload = json.loads(resp.read().decode("utf-8"))
-
-        flight_rows = []
-        max_options = 6
-        for block_name in ("best_flights", "other_flights"):
-            for option in payload.get(block_name, []):
-                if len(flight_rows) >= max_options:
-                    break
-                flights = option.get("flights", [])
-                first_leg = flights[0] if flights else {}
-                last_leg = flights[-1] if flights else {}
-
-                dep_air = first_leg.get("departure_airport", {}) or {}
-                arr_air = last_leg.get("arrival_airport", {}) or {}
-                airline = first_leg.get("airline", "N/D")
-
-                dep_code = dep_air.get("id", origin_id)
-                arr_code = arr_air.get("id", destination_id)
-                dep_time = dep_air.get("time", "n/d")
-                arr_time = arr_air.get("time", "n/d")
-
-                stops = max(len(flights) - 1, 0)
-                duration = option.get("total_duration", "n/d")
-                price_raw = option.get("price")
-                price_value = _price_to_float(price_raw)
-                price_text = f"{price_value:.2f}" if price_value is not None else str(price_raw or "n/d")
-
-                title = f"{airline} {dep_code}->{arr_code}"
-                content = (
-                    f"Departure {dep_time} | Arrival {arr_time} | "
-                    f"Stops {stops} | Duration {duration} | Price {price_text}"
-                )
-                url = payload.get("search_metadata", {}).get("google_flights_url", "")
-
-                logger.log_event("SERPAPI_FLIGHTS", "RESULT", title)
-                logger.log_event("SERPAPI_FLIGHTS", "INFO", content)
-
-                flight_rows.append({
-                    "title": title,
-                    "content": content,
-                    "raw_content": json.dumps(option, ensure_ascii=False),
-                    "url": url,
-                    "source": "serpapi",
-                    "price_value": price_value,
-                    "depart_time": dep_time,
-                    "arrival_time": arr_time,
-                    "stops": str(stops),
-                    "duration": str(duration),
-                })
-            if len(flight_rows) >= max_options:
-                break
+        logger.log_event(
+            "SERPAPI_FLIGHTS",
+            "INFO",
+            f"Resolved route: {origin} -> {'/'.join(origin_ids)} | {destination} -> {'/'.join(destination_ids)}"
+        )
+
+        pairs = [(o, d) for o in origin_ids for d in destination_ids if o != d]
+        metrics.incr("flight_airport_pairs", len(pairs))
+        workers = max(1, min(FLIGHT_SEARCH_WORKERS, len(pairs)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flights") as pool:
+            results = list(pool.map(lambda pair: _search_airport_pair(*pair, outbound_date, inbound_date, use_cache), pairs))
+
+        flight_rows = [row for rows in results for row in rows]
+        flight_rows.sort(key=lambda r: r["price_value"] if r.get("price_value") is not None else float("inf"))
+
+        for row in flight_rows[:MAX_OPTIONS_PER_PAIR]:
+            logger.log_event("SERPAPI_FLIGHTS", "RESULT", row["title"])
+            logger.log_event("SERPAPI_FLIGHTS", "INFO", row["content"])
+        if len(flight_rows) > MAX_OPTIONS_PER_PAIR:
+            logger.log_event(
+                "SERPAPI_FLIGHTS",
+                "INFO",
+                f"{len(flight_rows)} opzioni totali su {len(pairs)} coppie di aeroporti."
+            )
 
         return flight_rows
-    except urllib.error.HTTPError as e:
-        try:
-            body = e.read().decode("utf-8", errors="ignore")
-        except Exception:
-            body = ""
-        logger.log_event("TOOL", "ERROR", f"SerpApi HTTP {e.code}: {body[:400] or str(e)}")
-        return []
     except Exception as e:
         logger.log_event("TOOL", "ERROR", f"SerpApi flights error: {e}")
         return []
@@ -0,0 +1,35 @@
+import re
+from html import escape
+
+# Segnaposto: {{campo}} (escapato) oppure {{campo|raw}} (già HTML)
+_FIELD = re.compile(r"\{\{\s*(\w+)(\|raw)?\s*\}\}")
+
+
+class Template:
+    """
+    Template HTML compilato una sola volta in una format string posizionale nativa:
+    il render è un solo str.format (in C), con i valori escapati qui, una volta sola.
+    """
+
+    __slots__ = ("_format", "_fields")
+
+    def __init__(self, source: str):
+        chunks = []
+        fields = []
+        pos = 0
+        for match in _FIELD.finditer(source):
+            chunks.append(source[pos:match.start()].replace("{", "{{").replace("}", "}}"))
+            chunks.append("{%d}" % len(fields))
+            fields.append((match.group(1), bool(match.group(2))))
+            pos = match.end()
+        chunks.append(source[pos:].replace("{", "{{").replace("}", "}}"))
+        self._format = "".join(chunks).format
+        self._fields = tuple(fields)
+
+    def render(self, **values) -> str:
+        args = []
+        for name, raw in self._fields:
+            value = values.get(name)
+            value = "" if value is None else str(value)
+            args.append(value if raw else escape(value, quote=True))
+        return self._format(*args)
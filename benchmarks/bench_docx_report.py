@@ -0,0 +1,159 @@
+"""
+Benchmark report DOCX: template in cache + XML in blocco vs vecchio percorso python-docx
+(un oggetto per paragrafo e relazione). Verifica anche che il contenuto testuale coincida.
+
+    python -m benchmarks.bench_docx_report [--days 60] [--places 500] [--runs 10]
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+from docx import Document
+from docx.shared import Pt, RGBColor
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from app.tools import publisher
+from app.tools.publisher import generate_gmaps_search_link, _selected_flight, _flight_legs
+from benchmarks.bench_html_report import build_state
+
+
+# --- Implementazione precedente (riferimento) ---
+def _add_docx_hyperlink(paragraph, text, url):
+    """
+    Add a clickable hyperlink to a docx paragraph.
+    """
+    part = paragraph.part
+    r_id = part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), r_id)
+
+    run = OxmlElement("w:r")
+    rpr = OxmlElement("w:rPr")
+
+    color = OxmlElement("w:color")
+    color.set(qn("w:val"), "0000FF")
+    rpr.append(color)
+
+    underline = OxmlElement("w:u")
+    underline.set(qn("w:val"), "single")
+    rpr.append(underline)
+
+    run.append(rpr)
+    text_elem = OxmlElement("w:t")
+    text_elem.text = text
+    run.append(text_elem)
+
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+    return hyperlink
+
+
+def legacy_docx(state, filepath):
+    """Genera un file Word ben formattato."""
+    
+    destination = state.get('destination', 'Viaggio')
+    
+    doc = Document()
+    
+    # Titolo Principale
+    title = doc.add_heading(f'Itinerario: {destination.upper()}', 0)
+    title.alignment = 1 # Center
+
+    doc.add_paragraph(f"Ecco il tuo piano di viaggio generato dall'AI per {destination}.")
+
+    flight_summary = state.get("flight_summary")
+    selected = _selected_flight(state)
+    if flight_summary or selected:
+        doc.add_heading("Volo suggerito", level=1)
+        if flight_summary:
+            doc.add_paragraph(flight_summary)
+        if selected:
+            link_labels = ["Apri offerta volo", "Apri offerta volo ritorno"]
+            for idx, leg in enumerate(_flight_legs(selected), start=1):
+                doc.add_paragraph(
+                    f"{idx}. {leg['title']} | prezzo stimato: {leg['price']} | data: {leg['date']} | orario: {leg['time']}"
+                )
+                if leg["url"]:
+                    p_link = doc.add_paragraph(style='List Bullet')
+                    _add_docx_hyperlink(p_link, link_labels[idx - 1], leg["url"])
+
+    for day in state.get('itinerary', []):
+        # Intestazione Giorno
+        doc.add_heading(f"Giorno {day['day_number']}: {day['focus']}", level=1)
+        
+        for p in day.get('places', []):
+            name = p.get('name', 'Senza nome')
+            rating = p.get('rating', 'N/A')
+            address = p.get('address', '')
+            
+            # Nome Luogo 
+            p_para = doc.add_paragraph()
+            runner = p_para.add_run(f"{name}")
+            runner.bold = True
+            runner.font.size = Pt(12)
+            runner.font.color.rgb = RGBColor(0, 51, 102) # Blu scuro
+            
+            # Dettagli
+            doc.add_paragraph(f"   ⭐ Rating: {rating}")
+            doc.add_paragraph(f"   Indirizzo: {address}")
+            
+            # Link Maps
+            link = generate_gmaps_search_link(name, address)
+            if link:
+                
+                p_link = doc.add_paragraph(style='List Bullet')
+                _add_docx_hyperlink(p_link, "Apri su Maps", link)
+            
+            doc.add_paragraph("_" * 40) # Separatore
+
+    doc.save(filepath)
+    return filepath
+
+
+def new_docx(state, filepath):
+    built = publisher.generate_docx_report(state)
+    os.replace(built, filepath)
+
+
+def _text_content(path):
+    doc = Document(path)
+    paragraphs = [(p.style.name, p.text) for p in doc.paragraphs]
+    links = sorted(rel.target_ref for rel in doc.part.rels.values() if rel.reltype == RELATIONSHIP_TYPE.HYPERLINK)
+    return paragraphs, links
+
+
+def _measure(fn, state, path, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(state, path)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), min(timings), os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--places", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    state = build_state(args.days, args.places)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # i report vengono scritti in ./outputs
+        legacy_path, new_path = os.path.join(tmp, "legacy.docx"), os.path.join(tmp, "new.docx")
+        new_docx(state, new_path)  # warm-up: costruzione del template in cache
+        print(f"Itinerario: {args.days} giorni, {args.places} luoghi, {args.runs} esecuzioni")
+        print(f"{'renderer':<12}{'mediana ms':>12}{'min ms':>10}{'byte':>10}")
+        for label, fn, path in (("python-docx", legacy_docx, legacy_path), ("bulk", new_docx, new_path)):
+            median, best, size = _measure(fn, state, path, args.runs)
+            print(f"{label:<12}{median:>12.2f}{best:>10.2f}{size:>10}")
+        same = _text_content(legacy_path) == _text_content(new_path)
+        print(f"Contenuto equivalente (stili, testo, link): {'si' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Benchmark end-to-end del grafo (app/graph.py) su risposte registrate di LLM, Maps e SerpApi.
+Per scenario: tempo totale, tempo per nodo, chiamate ai provider, token e picco di memoria.
+
+    python -m benchmarks.bench_graph [--scenarios city_break_2d,multi_city_30d] [--runs 3]
+                                     [--output bench_results/graph.json] [--compare bench_results/prev.json]
+    python -m benchmarks.bench_graph --write-fixtures   # rigenera benchmarks/fixtures/*.json
+
+Ogni esecuzione parte a freddo (cache Maps/voli, circuit breaker e metriche azzerati);
+il picco di memoria è misurato in un'esecuzione aggiuntiva con tracemalloc attivo.
+Uno scenario fallisce (exit code 1) se il report pubblica meno luoghi di quelli pianificati:
+tempi misurati su un itinerario ridotto non sono confrontabili.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import builtins
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Configurazione prima di importare l'app: niente chiavi reali, niente effetti "typing", niente plan store
+os.environ.setdefault("GROQ_API_KEY", "replay")
+os.environ.setdefault("SERPAPI_API_KEY", "replay")
+os.environ["LOG_TYPING"] = "0"
+os.environ["PLAN_STORE"] = "0"
+os.environ.setdefault("SPECULATIVE_CANDIDATES", "1")
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MAX_PROMPTS = 50
+# Logger e report scrivono in ./logs e ./outputs: li teniamo fuori dal repository
+_WORKDIR = tempfile.mkdtemp(prefix="bench_graph_")
+os.chdir(_WORKDIR)
+
+from app.core.metrics import metrics  # noqa: E402
+from app.core.itinerary import apply_update  # noqa: E402
+from app.tools import maps, search, resilience  # noqa: E402
+from app.engine import nodes  # noqa: E402
+from app.graph import app as graph  # noqa: E402
+from benchmarks.replay import (  # noqa: E402
+    SCENARIOS, CallCounter, ReplayLLM, ReplayMaps, ReplaySerpApi, load_fixture, write_fixtures
+)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _reset_runtime():
+    """Stato di processo azzerato tra un'esecuzione e l'altra (run a freddo)."""
+    metrics.reset()
+    with maps._cache_lock:
+        maps._cache.clear()
+    with search._flight_cache_lock:
+        search._flight_cache.clear()
+    with resilience._REGISTRY_LOCK:
+        resilience._BREAKERS.clear()
+        resilience._LATENCIES.clear()
+
+
+class ScenarioError(RuntimeError):
+    pass
+
+
+def _place_count(itinerary):
+    return sum(len(day.get("places", [])) for day in itinerary) if isinstance(itinerary, list) else 0
+
+
+def _planned_places(fixture):
+    return _place_count(json.loads(fixture["llm"]["PLANNER"])["itinerary"])
+
+
+def _install(fixture, counter):
+    nodes.llm = ReplayLLM(fixture["llm"], counter)
+    maps.gmaps = ReplayMaps(fixture["maps"], counter)
+    search.serpapi_key = os.environ["SERPAPI_API_KEY"]
+    search.urllib.request.urlopen = ReplaySerpApi(fixture["flights"], counter)
+
+
+def run_once(fixture, counter):
+    """Un'esecuzione del grafo: (wall ms, ms per nodo, stato finale)."""
+    _reset_runtime()
+    counter.reset()
+    answers = iter(fixture["answers"])
+    prompts = {"count": 0}
+
+    def _scripted_input(prompt=""):
+        # Oltre le risposte registrate: conferma ("s"); un loop di domande interrompe lo scenario
+        prompts["count"] += 1
+        if prompts["count"] > MAX_PROMPTS:
+            raise ScenarioError(f"Più di {MAX_PROMPTS} domande interattive: risposte della fixture incomplete.")
+        return next(answers, "s")
+
+    builtins.input = _scripted_input
+
+    node_ms = {}
+    final = {}
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = last = time.perf_counter()
+        for update in graph.stream({"retry_count": 0, "is_approved": False}, stream_mode="updates"):
+            now = time.perf_counter()
+            for node, values in update.items():
+                node_ms[node] = node_ms.get(node, 0.0) + (now - last) * 1000
+                if isinstance(values, dict):
+                    apply_update(final, values)
+            last = now
+        wall_ms = (time.perf_counter() - start) * 1000
+    return wall_ms, node_ms, final
+
+
+def bench_scenario(name, runs):
+    fixture = load_fixture(name)
+    counter = CallCounter()
+    _install(fixture, counter)
+
+    planned = _planned_places(fixture)
+    walls, per_node = [], {}
+    for _ in range(runs):
+        wall_ms, node_ms, final = run_once(fixture, counter)
+        published = _place_count(final.get("itinerary"))
+        if published != planned:
+            raise ScenarioError(f"{name}: pubblicati {published} luoghi su {planned} pianificati")
+        walls.append(wall_ms)
+        for node, ms in node_ms.items():
+            per_node.setdefault(node, []).append(ms)
+    calls = dict(counter.counts)
+    snapshot = metrics.snapshot()
+
+    # Esecuzione aggiuntiva per la memoria: tracemalloc rallenta, non entra nei tempi
+    tracemalloc.start()
+    run_once(fixture, counter)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "days": fixture.get("days"),
+        "places": planned,
+        "runs": runs,
+        "wall_ms": {
+            "median": round(statistics.median(walls), 2),
+            "min": round(min(walls), 2),
+            "max": round(max(walls), 2),
+        },
+        "nodes_ms": {node: round(statistics.median(values), 2) for node, values in per_node.items()},
+        "calls": calls,
+        "tokens": sum(entry["prompt_tokens"] + entry["completion_tokens"] for entry in snapshot["llm_usage"].values()),
+        "peak_memory_kib": round(peak / 1024, 1),
+        "counters": snapshot["counters"],
+        "timings": snapshot["timings"],
+        "approved": bool(final.get("is_approved")),
+        "confidence": final.get("confidence_score"),
+    }
+
+
+def _print_summary(results, baseline=None):
+    base = (baseline or {}).get("scenarios", {})
+    print(f"{'scenario':<18}{'giorni':>7}{'mediana ms':>12}{'min ms':>10}{'picco KiB':>11}{'LLM':>5}{'Maps':>6}{'SerpApi':>9}  delta")
+    for name, res in results["scenarios"].items():
+        calls = res["calls"]
+        llm_calls = sum(v for k, v in calls.items() if k.startswith("llm_"))
+        maps_calls = sum(v for k, v in calls.items() if k.startswith("maps_"))
+        delta = ""
+        if name in base:
+            before = base[name]["wall_ms"]["median"]
+            delta = f"{(res['wall_ms']['median'] - before) / before * 100:+.1f}% tempo, " \
+                    f"{(res['peak_memory_kib'] - base[name]['peak_memory_kib']) / base[name]['peak_memory_kib'] * 100:+.1f}% mem"
+        print(
+            f"{name:<18}{res['days']:>7}{res['wall_ms']['median']:>12.1f}{res['wall_ms']['min']:>10.1f}"
+            f"{res['peak_memory_kib']:>11.0f}{llm_calls:>5}{maps_calls:>6}{calls.get('serpapi', 0):>9}  {delta}"
+        )
+        slowest = sorted(res["nodes_ms"].items(), key=lambda item: item[1], reverse=True)[:4]
+        print("    nodi: " + ", ".join(f"{node} {ms:.1f}ms" for node, ms in slowest))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default="", help="File JSON dei risultati (default bench_results/graph_<commit>.json)")
+    parser.add_argument("--compare", default="", help="Risultati precedenti con cui confrontare")
+    parser.add_argument("--write-fixtures", action="store_true", help="Rigenera le fixture degli scenari ed esce")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    if args.write_fixtures:
+        for path in write_fixtures(names):
+            print(f"Fixture scritta: {path.relative_to(REPO_ROOT)}")
+        return
+
+    commit = _git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "scenarios": {},
+    }
+    failed = []
+    for name in names:
+        try:
+            results["scenarios"][name] = bench_scenario(name, args.runs)
+        except ScenarioError as e:
+            print(f"SCENARIO FALLITO: {e}", file=sys.stderr)
+            failed.append(name)
+
+    output = Path(args.output) if args.output else REPO_ROOT / "bench_results" / f"graph_{commit}.json"
+    if not output.is_absolute():
+        output = REPO_ROOT / output
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        compare = Path(args.compare) if Path(args.compare).is_absolute() else REPO_ROOT / args.compare
+        with compare.open("r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_summary(results, baseline)
+    print(f"Risultati salvati in {output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
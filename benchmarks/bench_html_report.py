@@ -0,0 +1,193 @@
+"""
+Benchmark report HTML: renderer a template compilati (streaming) vs vecchia concatenazione `html +=`.
+
+    python -m benchmarks.bench_html_report [--days 60] [--places 500] [--runs 20]
+"""
+import os
+import time
+import urllib.parse
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from app.tools.publisher import iter_html_report, _selected_flight, _format_flight_price
+
+
+def build_state(days=60, places=500):
+    """Itinerario sintetico con testo "ostile" (tag, apici, &) per verificare anche l'escaping."""
+    itinerary = []
+    for d in range(days):
+        count = places // days + (1 if d < places % days else 0)
+        itinerary.append({
+            "day_number": d + 1,
+            "focus": f"Quartiere <{d}> & dintorni",
+            "places": [
+                {
+                    "name": f"Luogo '{d}-{i}' <b>storico</b>",
+                    "address": f"Via dei Fori {i}, 00100 Roma RM & Italia",
+                    "rating": 4.5,
+                    "description": "Verificato con Google Maps",
+                }
+                for i in range(count)
+            ],
+        })
+    return {
+        "destination": "Roma",
+        "flight_summary": "Best option confirmed: ITA MXP->FCO <diretto>",
+        "flight_options": [{
+            "title": "ITA MXP->FCO",
+            "url": "https://www.google.com/travel/flights?q=MXP-FCO&x=1",
+            "price_value": 102.0,
+            "depart_date": "2027-03-01",
+            "depart_time": "09:30",
+            "return_title": "ITA FCO->MXP",
+            "return_url": "https://www.google.com/travel/flights?q=FCO-MXP",
+            "return_price_value": 99.0,
+            "return_depart_date": "2027-03-05",
+            "return_depart_time": "18:10",
+        }],
+        "itinerary": itinerary,
+    }
+
+
+# --- Implementazione precedente (riferimento, senza escaping) ---
+def generate_gmaps_search_link(name, address):
+    if not name and not address:
+        return None
+    query = f"{name} {address}".strip()
+    return f"https://www.google.com/maps/search/?api=1&query={urllib.parse.quote(query)}"
+
+
+def legacy_html(state):
+    dest = state.get('destination', 'Viaggio')
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Viaggio a {dest}</title>
+        <meta charset="utf-8">
+        <style>
+            body {{ font-family: 'Segoe UI', sans-serif; padding: 20px; background: #f0f2f5; color: #333; }}
+            h1 {{ color: #2c3e50; text-align: center; border-bottom: 2px solid #3498db; padding-bottom: 10px; }}
+            .day-card {{ background: white; padding: 20px; margin-bottom: 20px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+            .flight-card {{ background: #eef6ff; padding: 16px; margin-bottom: 20px; border-radius: 10px; border-left: 6px solid #3498db; }}
+            h2 {{ color: #e67e22; }}
+            .place {{ margin-top: 15px; padding: 10px; background: #f9f9f9; border-left: 5px solid #3498db; border-radius: 4px; }}
+            .place-name {{ font-size: 1.1em; font-weight: bold; }}
+            .rating {{ color: #f1c40f; font-weight: bold; }}
+            .address {{ font-style: italic; color: #555; margin: 5px 0; }}
+            a.btn {{ display: inline-block; margin-top: 5px; background: #3498db; color: white; padding: 5px 10px; text-decoration: none; border-radius: 4px; font-size: 0.9em; }}
+            a.btn:hover {{ background: #2980b9; }}
+        </style>
+    </head>
+    <body>
+        <h1>✈️ Itinerario: {dest.upper()}</h1>
+    """
+
+    flight_summary = state.get("flight_summary")
+    selected = _selected_flight(state)
+    if flight_summary or selected:
+        html += "<div class='flight-card'><h2>Volo suggerito</h2>"
+        if flight_summary:
+            html += f"<p>{flight_summary}</p>"
+        if selected:
+            html += "<ul>"
+            title = selected.get("title", "N/D")
+            url = selected.get("url", "")
+            price = _format_flight_price(selected)
+            dep_date = selected.get("depart_date", "n/d")
+            dep_time = selected.get("depart_time", "n/d")
+            if url:
+                html += (
+                    f"<li>{title} | prezzo stimato: {price} | data: {dep_date} | orario: {dep_time} "
+                    f"- <a href='{url}' target='_blank'>Link</a></li>"
+                )
+            else:
+                html += f"<li>{title} | prezzo stimato: {price} | data: {dep_date} | orario: {dep_time}</li>"
+
+            ret_title = selected.get("return_title")
+            if ret_title and ret_title != "n/d":
+                ret_price = selected.get("return_price_value")
+                try:
+                    ret_price_text = f"{float(ret_price):.2f}" if ret_price is not None else "n/d"
+                except (TypeError, ValueError):
+                    ret_price_text = "n/d"
+                ret_date = selected.get("return_depart_date", "n/d")
+                ret_time = selected.get("return_depart_time", "n/d")
+                ret_url = selected.get("return_url", "")
+                if ret_url:
+                    html += (
+                        f"<li>{ret_title} | prezzo stimato: {ret_price_text} | data: {ret_date} | orario: {ret_time} "
+                        f"- <a href='{ret_url}' target='_blank'>Link</a></li>"
+                    )
+                else:
+                    html += (
+                        f"<li>{ret_title} | prezzo stimato: {ret_price_text} | data: {ret_date} | orario: {ret_time}</li>"
+                    )
+            html += "</ul>"
+        html += "</div>"
+    
+    for day in state.get('itinerary', []):
+        html += f"<div class='day-card'><h2>Giorno {day['day_number']}: {day['focus']}</h2>"
+        for p in day.get('places', []):
+            name = p.get('name', 'Senza nome')
+            address = p.get('address', '')
+            rating = p.get('rating', 'N/A')
+            link = generate_gmaps_search_link(name, address)
+            
+            html += f"""
+            <div class='place'>
+                <div class='place-name'>{name} <span class='rating'>★ {rating}</span></div>
+                <div class='address'>{address}</div>
+            """
+            if link:
+                html += f"<a href='{link}' class='btn' target='_blank'>Vedi su Maps</a>"
+            html += "</div>"
+        html += "</div>"
+        
+    html += "</body></html>"
+    return html
+
+
+def _write_legacy(state, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(legacy_html(state))
+
+
+def _write_streaming(state, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(iter_html_report(state))
+
+
+def _measure(fn, state, path, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(state, path)
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn(state, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), min(timings), peak / 1024, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--places", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    state = build_state(args.days, args.places)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.html")
+        print(f"Itinerario: {args.days} giorni, {args.places} luoghi, {args.runs} esecuzioni")
+        print(f"{'renderer':<12}{'mediana ms':>12}{'min ms':>10}{'picco KiB':>12}{'byte':>10}")
+        for label, fn in (("legacy", _write_legacy), ("streaming", _write_streaming)):
+            median, best, peak, size = _measure(fn, state, path, args.runs)
+            print(f"{label:<12}{median:>12.2f}{best:>10.2f}{peak:>12.1f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Stand-in in replay per LLM, Google Maps e SerpApi, alimentati da fixture JSON registrate
+(benchmarks/fixtures/<scenario>.json). Formato di una fixture:
+
+    {
+      "scenario": "...", "answers": [... risposte a input() ...],
+      "llm": {"ROUTER": "<contenuto>", "PLANNER": "<contenuto>", "CRITIC": "<contenuto>"},
+      "maps": {"<query Finder>": {<candidate Find Place>}},
+      "flights": {"<DEP>-<ARR>-<YYYY-MM-DD>": {<payload Google Flights>}}
+    }
+
+Le fixture sono generate in modo deterministico da `build_fixture` (stessa forma delle
+risposte reali dei provider) e possono essere sostituite da registrazioni vere.
+Le date sono registrate rispetto a RECORDED_ON: `load_fixture` le sposta di (oggi - RECORDED_ON),
+così le date di viaggio restano sempre future e i prezzi registrati non cambiano.
+"""
+import io
+import re
+import json
+import random
+import threading
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from langchain_core.messages import AIMessage
+from app.devtools.flights_payload import build_flights_payload
+from app.devtools.fake_services import llm_node_for
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# Istante fisso per i prezzi registrati (payload identici tra generazioni) e giorno di registrazione
+RECORDED_AT = 1_800_000_000
+RECORDED_ON = datetime.fromtimestamp(RECORDED_AT, timezone.utc).date()
+
+_ISO_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+
+# name, destinazione, origine, partenza tra N giorni, durata, città con (lat, lng) e luoghi per giorno
+SCENARIOS = {
+    "city_break_2d": {
+        "destination": "Roma", "origin": "Milano", "depart_in": 45, "days": 2,
+        "cities": {"Roma": (41.8986, 12.4769)}, "places_per_day": 4,
+    },
+    "week_7d": {
+        "destination": "Parigi", "origin": "Londra", "depart_in": 108, "days": 7,
+        "cities": {"Parigi": (48.8566, 2.3522)}, "places_per_day": 5,
+    },
+    "multi_city_30d": {
+        "destination": "Italia", "origin": "Londra", "depart_in": 76, "days": 30,
+        "cities": {
+            "Milano": (45.4642, 9.1900), "Venezia": (45.4408, 12.3155), "Firenze": (43.7696, 11.2558),
+            "Roma": (41.8986, 12.4769), "Napoli": (40.8518, 14.2681),
+        },
+        "places_per_day": 5,
+        # Nessun aeroporto per "Italia": alla domanda "cambiare data andata?" si risponde no
+        "extra_answers": ["n"],
+    },
+}
+
+PLACE_KINDS = ["Museo", "Basilica", "Piazza", "Mercato", "Giardino", "Galleria", "Trattoria", "Belvedere", "Palazzo", "Teatro"]
+# Nomi dei luoghi tutti diversi anche a parole (tipo x dedica): nessun doppione per il Finder
+PLACE_DEDICATIONS = [
+    "Garibaldi", "Verdi", "Dante", "Leopardi", "Manzoni", "Volta", "Galilei", "Colombo", "Mazzini", "Cavour",
+    "Petrarca", "Boccaccio", "Ariosto", "Tasso", "Vivaldi", "Rossini", "Puccini", "Canova", "Bernini", "Giotto",
+]
+
+
+def _days_between(depart, ret):
+    return (date.fromisoformat(ret) - date.fromisoformat(depart)).days + 1
+
+
+def scenario_dates(spec, today):
+    """(andata, ritorno) ISO di uno scenario, relative a `today`."""
+    depart = today + timedelta(days=spec["depart_in"])
+    return depart.isoformat(), (depart + timedelta(days=spec["days"] - 1)).isoformat()
+
+
+def _shift_dates(value, delta):
+    """Sposta di `delta` ogni data ISO in un valore JSON (chiavi comprese)."""
+    text = json.dumps(value, ensure_ascii=False)
+    text = _ISO_DATE.sub(lambda m: (date.fromisoformat(m.group(0)) + delta).isoformat(), text)
+    return json.loads(text)
+
+
+def build_fixture(name, destination, origin, depart, ret, cities, places_per_day, extra_answers=()):
+    """Fixture deterministica per uno scenario (seed = nome scenario)."""
+    from app.tools.search import _resolve_airport_ids
+
+    rng = random.Random(name)
+    days = _days_between(depart, ret)
+    if days * places_per_day > len(PLACE_KINDS) * len(PLACE_DEDICATIONS):
+        raise ValueError(f"{name}: troppi luoghi per nomi tutti distinti")
+    city_names = list(cities)
+    itinerary, maps = [], {}
+    for day_number in range(1, days + 1):
+        city = city_names[(day_number - 1) * len(city_names) // days]
+        lat0, lng0 = cities[city]
+        places = []
+        for i in range(places_per_day):
+            index = (day_number - 1) * places_per_day + i
+            kind = PLACE_KINDS[index % len(PLACE_KINDS)]
+            place = f"{kind} {PLACE_DEDICATIONS[index // len(PLACE_KINDS)]} di {city}"
+            places.append({"name": place, "address": city})
+            maps[f"{place} {destination}"] = {
+                "name": place,
+                "formatted_address": f"Via {place}, {city}, Italia" if destination == "Italia" else f"Rue {place}, {destination}",
+                "rating": round(rng.uniform(3.8, 4.9), 1),
+                "place_id": f"fixture_{name}_{day_number}_{i}",
+                "geometry": {"location": {"lat": round(lat0 + rng.uniform(-0.03, 0.03), 6), "lng": round(lng0 + rng.uniform(-0.04, 0.04), 6)}},
+            }
+        itinerary.append({"day_number": day_number, "focus": f"{city}: giorno {day_number}", "places": places})
+
+    flights = {}
+    for dep_city, arr_city, when in ((origin, destination, depart), (destination, origin, ret)):
+        for dep in _resolve_airport_ids(dep_city):
+            for arr in _resolve_airport_ids(arr_city):
+                if dep != arr:
+                    flights[f"{dep}-{arr}-{when}"] = build_flights_payload(dep, arr, when, now=RECORDED_AT)
+
+    return {
+        "scenario": name,
+        "days": days,
+        "answers": [destination, "arte, cucina", "2500", "Coppia", origin, depart, ret, *extra_answers],
+        "llm": {
+            "ROUTER": json.dumps({"reasoning": "Interessi culturali e gastronomici.", "style": "CULTURALE"}),
+            "PLANNER": json.dumps({"itinerary": itinerary}, ensure_ascii=False),
+            "CRITIC": json.dumps({"approved": True, "critique": "Itinerario coerente.", "thought_process": "ok"}),
+        },
+        "maps": maps,
+        "flights": flights,
+    }
+
+
+def write_fixtures(names=None):
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name in names or SCENARIOS:
+        spec = SCENARIOS[name]
+        depart, ret = scenario_dates(spec, RECORDED_ON)
+        fixture = build_fixture(
+            name, spec["destination"], spec["origin"], depart, ret, spec["cities"],
+            spec["places_per_day"], spec.get("extra_answers", ()),
+        )
+        path = FIXTURES_DIR / f"{name}.json"
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, separators=(",", ":"))
+        paths.append(path)
+    return paths
+
+
+def load_fixture(name, today=None):
+    """Fixture con date (risposte e voli registrati) spostate da RECORDED_ON a `today`."""
+    with (FIXTURES_DIR / f"{name}.json").open("r", encoding="utf-8") as f:
+        fixture = json.load(f)
+    delta = (today or date.today()) - RECORDED_ON
+    fixture["answers"] = _shift_dates(fixture["answers"], delta)
+    fixture["flights"] = _shift_dates(fixture["flights"], delta)
+    return fixture
+
+
+class CallCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def incr(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.counts = {}
+
+
+class ReplayLLM:
+    """Chat model finto: risponde con il contenuto registrato per il nodo riconosciuto dal prompt."""
+
+    def __init__(self, responses, counter):
+        self.responses = responses
+        self.counter = counter
+
+    def invoke(self, messages):
+        text = messages[-1].content if isinstance(messages, list) else str(messages)
+        node = llm_node_for(text)
+        self.counter.incr(f"llm_{node.lower()}")
+        content = self.responses[node]
+        prompt_tokens, completion_tokens = len(text) // 4, len(content) // 4
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+
+
+class ReplayMaps:
+    """Client googlemaps finto (find_place / places) sulle query registrate."""
+
+    def __init__(self, recorded, counter):
+        self.recorded = recorded
+        self.counter = counter
+
+    def find_place(self, input, input_type="textquery", fields=None, **kwargs):
+        self.counter.incr("maps_find_place")
+        candidate = self.recorded.get(input)
+        return {"status": "OK", "candidates": [candidate]} if candidate else {"status": "ZERO_RESULTS", "candidates": []}
+
+    def places(self, query=None, **kwargs):
+        self.counter.incr("maps_text_search")
+        result = self.recorded.get(query)
+        return {"status": "OK", "results": [result]} if result else {"status": "ZERO_RESULTS", "results": []}
+
+
+class _Response(io.BytesIO):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplaySerpApi:
+    """Sostituto di urllib.request.urlopen per le chiamate SerpApi Google Flights."""
+
+    def __init__(self, recorded, counter):
+        self.recorded = recorded
+        self.counter = counter
+
+    def __call__(self, url, timeout=None, **kwargs):
+        url = url if isinstance(url, str) else url.full_url
+        query = {k: v[0] for k, v in parse_qs(urlparse(url).query).items()}
+        self.counter.incr("serpapi")
+        key = f"{query.get('departure_id')}-{query.get('arrival_id')}-{query.get('outbound_date')}"
+        payload = self.recorded.get(key) or {"error": "Google Flights hasn't returned any results for this query."}
+        return _Response(json.dumps(payload).encode("utf-8"))
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Import dell'app senza chiavi reali né effetti collaterali nel repository
+# (logger e report scrivono in ./logs e ./outputs)
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ["LOG_TYPING"] = "0"
+os.environ["PLAN_STORE"] = "0"
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.chdir(tempfile.mkdtemp(prefix="travel_agent_tests_"))
@@ -0,0 +1,15 @@
+from app.core.metrics import metrics
+from app.tools.search import _resolve_airport_ids
+
+
+def test_city_airports_in_relevance_order():
+    assert _resolve_airport_ids("Milano") == ["MXP", "LIN", "BGY"]
+    assert _resolve_airport_ids("FCO") == ["FCO"]
+    assert _resolve_airport_ids("Pisa (PSA)") == ["PSA"]
+
+
+def test_cap_keeps_most_relevant_and_counts_dropped():
+    metrics.reset()
+    assert _resolve_airport_ids("Londra", limit=4) == ["LHR", "LGW", "STN", "LTN"]
+    assert metrics.snapshot()["counters"]["flight_airports_dropped"] == 2
+    assert _resolve_airport_ids("Londra", limit=10) == ["LHR", "LGW", "STN", "LTN", "LCY", "SEN"]
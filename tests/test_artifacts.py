@@ -0,0 +1,32 @@
+import os
+import time
+
+from app.core.artifacts import enforce_retention, write_artifact
+
+
+def _touch(path, age_s=0, size=10):
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age_s
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prefix_limits_retention_to_reports(tmp_path):
+    shared = _touch(tmp_path / "plans.ndjson", age_s=90 * 86400)
+    old = _touch(tmp_path / "viaggio_roma_a.html", age_s=90 * 86400)
+    recent = _touch(tmp_path / "viaggio_roma_b.html")
+    assert enforce_retention(tmp_path, max_age_s=86400, prefix="viaggio_") == 1
+    assert shared.exists() and recent.exists() and not old.exists()
+
+
+def test_max_files_keeps_newest_and_protected(tmp_path):
+    paths = [_touch(tmp_path / f"viaggio_{i}.html", age_s=100 - i) for i in range(4)]
+    enforce_retention(tmp_path, max_files=2, keep=[paths[0]])
+    assert [p.exists() for p in paths] == [True, False, True, True]
+
+
+def test_unchanged_artifact_is_not_rewritten(tmp_path):
+    first = write_artifact(tmp_path, "viaggio_roma", ".json", ["{}"], "trace")
+    second = write_artifact(tmp_path, "viaggio_roma", ".json", [b"{}"], "trace")
+    assert first == second
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(first)]
@@ -0,0 +1,63 @@
+from datetime import date
+
+import pytest
+
+from app.core.dates import parse_date, to_iso, validate_trip_dates
+
+TODAY = date(2027, 1, 15)  # venerdì
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2027-03-01", date(2027, 3, 1)),
+    ("2027/3/1", date(2027, 3, 1)),
+    ("01/03", date(2027, 3, 1)),
+    ("1.3.2028", date(2028, 3, 1)),
+    ("1/3/28", date(2028, 3, 1)),
+    ("1 marzo", date(2027, 3, 1)),
+    ("1° mar 2028", date(2028, 3, 1)),
+    ("March 1", date(2027, 3, 1)),
+    ("march 1st, 2028", date(2028, 3, 1)),
+    ("  1   MARZO ", date(2027, 3, 1)),
+])
+def test_absolute_formats(text, expected):
+    assert parse_date(text, TODAY) == expected
+
+
+def test_dates_without_year_are_the_next_occurrence():
+    assert parse_date("10 gennaio", TODAY) == date(2028, 1, 10)
+    assert parse_date("15 gennaio", TODAY) == TODAY
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("oggi", date(2027, 1, 15)),
+    ("domani", date(2027, 1, 16)),
+    ("dopodomani", date(2027, 1, 17)),
+    ("tra 3 giorni", date(2027, 1, 18)),
+    ("in 2 weeks", date(2027, 1, 29)),
+    ("+5", date(2027, 1, 20)),
+    ("lunedì", date(2027, 1, 18)),
+    ("venerdì prossimo", date(2027, 1, 22)),
+    ("next friday", date(2027, 1, 22)),
+])
+def test_relative_formats(text, expected):
+    assert parse_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text", ["", None, "boh", "31/02", "2027-13-01", "tra tre giorni", "32 marzo"])
+def test_invalid_dates(text):
+    assert parse_date(text, TODAY) is None
+
+
+def test_to_iso():
+    assert to_iso("1 marzo", TODAY) == "2027-03-01"
+    assert to_iso("mai", TODAY) is None
+
+
+def test_validate_trip_dates():
+    assert validate_trip_dates("1 marzo", "5 marzo", TODAY) == ("2027-03-01", "2027-03-05", None)
+    assert validate_trip_dates("domani", "", TODAY) == ("2027-01-16", "", None)
+    assert validate_trip_dates("2026-12-01", "", TODAY)[2] == "Data andata nel passato: 2026-12-01"
+    assert validate_trip_dates("boh", "", TODAY)[2] == "Data andata non valida: 'boh'"
+    depart, ret, error = validate_trip_dates("5 marzo", "1 marzo", TODAY)
+    assert (depart, ret) == ("2027-03-05", "") and "precedente all'andata" in error
+    assert validate_trip_dates("1 marzo", "mai", TODAY)[2] == "Data ritorno non valida: 'mai'"
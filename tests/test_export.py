@@ -0,0 +1,63 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from app.tools.export import NdjsonWriter, dumps_plan, iter_ndjson
+
+
+def _state(n):
+    return {
+        "destination": "Roma",
+        "days": "2",
+        "itinerary": [{"day_number": 1, "focus": "Centro", "places": [{"name": f"Luogo {i}"} for i in range(n)]}],
+    }
+
+
+def test_writers_on_the_same_path_share_one_lock(tmp_path):
+    path = tmp_path / "plans.ndjson"
+    assert NdjsonWriter(path)._lock is NdjsonWriter(str(path))._lock
+    assert NdjsonWriter(path)._lock is not NdjsonWriter(tmp_path / "other.ndjson")._lock
+
+
+def test_concurrent_appends_keep_whole_lines(tmp_path):
+    path = tmp_path / "plans.ndjson"
+    # Un writer nuovo per ogni piano, come append_ndjson_report
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: NdjsonWriter(path).write(_state(200), trace_id=f"t{i}"), range(40)))
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 40
+    assert sorted(json.loads(line)["trace_id"] for line in lines) == sorted(f"t{i}" for i in range(40))
+
+
+def test_iter_ndjson_skips_truncated_lines(tmp_path):
+    path = tmp_path / "plans.ndjson"
+    path.write_text(dumps_plan(_state(1)) + "\n\n{\"troncato\": \n", encoding="utf-8")
+    plans = list(iter_ndjson(path))
+    assert len(plans) == 1 and plans[0]["schema"] == "travel-agent/plan"
+
+
+def test_selected_flight_exports_ranking_fields(monkeypatch):
+    from app.engine import nodes
+    from app.tools.export import export_plan
+    from app.tools.publisher import _REPORT_STATE_KEYS
+
+    def fake_search(origin, destination, depart_date, return_date):
+        return [
+            {"title": f"{origin} 10:00", "price_value": 120.0, "duration": 100, "stops": 0, "depart_time": "10:00"},
+            {"title": f"{origin} 06:00", "price_value": 90.0, "duration": 300, "stops": 2, "depart_time": "06:00"},
+        ]
+
+    monkeypatch.setattr(nodes, "search_flights_tool", fake_search)
+    monkeypatch.setattr(nodes, "flights_available", lambda: True)
+    monkeypatch.setattr("builtins.input", lambda prompt="": "s")
+    state = {"destination": "Roma", "origin": "Milano", "days": "3",
+             "depart_date": "2099-03-01", "return_date": "2099-03-03"}
+    state.update(nodes.normalize_node(state))
+    state.update(nodes.flight_search_node(state))
+
+    snapshot = {key: state.get(key) for key in _REPORT_STATE_KEYS}
+    exported = export_plan(snapshot)
+    flight = exported["flights"][0]
+    assert flight["duration"] is not None and flight["stops"] is not None and flight["score"] is not None
+    assert flight["return"]["score"] is not None and flight["return"]["duration"] is not None
+    assert len(exported["flight_alternatives"]) == 1
+    assert exported["flight_alternatives"][0]["score"] >= flight["score"]
@@ -0,0 +1,55 @@
+import pytest
+
+from app.engine import nodes
+
+
+@pytest.fixture
+def fake_maps(monkeypatch):
+    """Maps finto: ogni nome è un luogo diverso, salvo gli alias in `same_place`."""
+    same_place = {"Colosseum Roma": "Colosseo Roma"}
+    calls = []
+
+    def lookup_place(query):
+        calls.append(query)
+        canonical = same_place.get(query, query)
+        return [{
+            "name": canonical.replace(" Roma", ""), "address": f"{canonical}, Roma, Italia", "rating": 4.5,
+            "place_id": f"id:{canonical}", "lat": 41.9, "lng": 12.5,
+        }], "OK"
+
+    monkeypatch.setattr(nodes, "lookup_place", lookup_place)
+    monkeypatch.setattr(nodes, "lookup_poi", lambda name, city: None)
+    monkeypatch.setattr(nodes, "maps_available", lambda: True)
+    return calls
+
+
+def _run(places_by_day):
+    state = {
+        "destination": "Roma",
+        "itinerary": [
+            {"day_number": idx + 1, "focus": "x", "places": [{"name": name} for name in names]}
+            for idx, names in enumerate(places_by_day)
+        ],
+    }
+    result = nodes.places_finder_node(state)
+    return nodes.apply_update(state, result)["itinerary"]
+
+
+def _names(itinerary):
+    return [place["name"] for day in itinerary for place in day["places"]]
+
+
+def test_similar_names_of_different_places_are_kept(fake_maps):
+    itinerary = _run([["Trattoria da Mario", "Trattoria da Maria"], ["Piazza Parigi 2-1", "Piazza Parigi 1-2"]])
+    assert _names(itinerary) == ["Trattoria da Mario", "Trattoria da Maria", "Piazza Parigi 2-1", "Piazza Parigi 1-2"]
+
+
+def test_same_canonical_name_is_dropped_without_lookup(fake_maps):
+    itinerary = _run([["Il Colosseo", "Pantheon"], ["Colosseo"]])
+    assert _names(itinerary) == ["Il Colosseo", "Pantheon"]
+    assert fake_maps == ["Il Colosseo Roma", "Pantheon Roma"]
+
+
+def test_same_resolved_place_is_dropped(fake_maps):
+    itinerary = _run([["Colosseo", "Colosseum"]])
+    assert _names(itinerary) == ["Colosseo"]
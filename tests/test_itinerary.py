@@ -0,0 +1,55 @@
+from app.core.itinerary import ItineraryDelta, apply_update, diff_itinerary, merge_itinerary
+
+
+def _day(n, *places):
+    return {"day_number": n, "focus": f"Giorno {n}", "places": [{"name": p} for p in places]}
+
+
+def test_list_update_replaces_the_itinerary():
+    current = [_day(1, "Colosseo")]
+    new = [_day(1, "Pantheon"), _day(2, "Trevi")]
+    assert merge_itinerary(current, new) is new
+
+
+def test_delta_replaces_only_changed_days_and_shares_the_rest():
+    current = [_day(1, "Colosseo"), _day(2, "Pantheon"), _day(3, "Trevi")]
+    merged = merge_itinerary(current, ItineraryDelta([_day(2, "Vaticano")]))
+    assert [d["places"][0]["name"] for d in merged] == ["Colosseo", "Vaticano", "Trevi"]
+    assert merged[0] is current[0] and merged[2] is current[2]
+    assert current[1]["places"][0]["name"] == "Pantheon"  # stato precedente intatto
+
+
+def test_delta_appends_new_days_in_order():
+    merged = ItineraryDelta([_day(3, "Trevi")]).apply([_day(1, "Colosseo")])
+    assert [d["day_number"] for d in merged] == [1, 3]
+    assert ItineraryDelta([_day(1, "Colosseo")]).apply(None) == [_day(1, "Colosseo")]
+
+
+def test_diff_contains_only_changed_days():
+    before = [_day(1, "Colosseo"), _day(2, "Pantheon")]
+    after = [before[0], _day(2, "Vaticano")]
+    delta = diff_itinerary(before, after)
+    assert isinstance(delta, ItineraryDelta) and list(delta.days) == [2]
+    # Giorno ricostruito ma uguale: non fa parte del delta
+    assert len(diff_itinerary(before, [_day(1, "Colosseo"), _day(2, "Pantheon")])) == 0
+
+
+def test_diff_falls_back_to_full_list_when_days_change():
+    before = [_day(1, "Colosseo"), _day(2, "Pantheon")]
+    after = [_day(1, "Colosseo")]
+    assert diff_itinerary(before, after) == after
+    assert diff_itinerary([], after) == after
+
+
+def test_diff_then_merge_round_trip():
+    before = [_day(n, f"Luogo {n}") for n in range(1, 8)]
+    after = [dict(day) for day in before]
+    after[4] = _day(5, "Nuovo")
+    assert merge_itinerary(before, diff_itinerary(before, after)) == after
+
+
+def test_apply_update_uses_the_reducer():
+    state = {"itinerary": [_day(1, "Colosseo"), _day(2, "Pantheon")], "retry_count": 0}
+    apply_update(state, {"itinerary": ItineraryDelta([_day(2, "Trevi")]), "retry_count": 1})
+    assert [d["places"][0]["name"] for d in state["itinerary"]] == ["Colosseo", "Trevi"]
+    assert state["retry_count"] == 1
@@ -0,0 +1,54 @@
+import pytest
+
+from app.tools import maps, resilience
+
+
+class FakeGmaps:
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def find_place(self, query, input_type, fields=None):
+        self.calls += 1
+        if self.status != "OK":
+            return {"status": self.status, "candidates": []}
+        return {"status": "OK", "candidates": [{
+            "name": query, "formatted_address": "Roma", "rating": 4.5, "place_id": "p1",
+            "geometry": {"location": {"lat": 41.9, "lng": 12.5}},
+        }]}
+
+    def places(self, query=None):
+        return {"status": "ZERO_RESULTS", "results": []}
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    monkeypatch.setattr(resilience, "_BREAKERS", {})
+    monkeypatch.setattr(resilience, "_LATENCIES", {})
+    monkeypatch.setattr(maps, "_cache", {})
+
+
+def test_status_is_returned_per_query(monkeypatch):
+    monkeypatch.setattr(maps, "gmaps", FakeGmaps("OVER_QUERY_LIMIT"))
+    results, status = maps.lookup_place("Colosseo Roma")
+    assert results == [] and status == "OVER_QUERY_LIMIT"
+
+    # Circuito aperto dalla quota: la query successiva non ne eredita lo stato
+    results, status = maps.lookup_place("Pantheon Roma")
+    assert results == [] and status == maps.STATUS_CIRCUIT_OPEN
+
+
+def test_cache_hit_reports_cached_status(monkeypatch):
+    fake = FakeGmaps("OK")
+    monkeypatch.setattr(maps, "gmaps", fake)
+    first, status = maps.lookup_place("Colosseo Roma")
+    assert status == "OK" and first[0]["lat"] == 41.9
+    again, status = maps.lookup_place("Colosseo Roma")
+    assert status == maps.STATUS_CACHED and again == first and fake.calls == 1
+
+
+def test_invalid_request_does_not_open_circuit(monkeypatch):
+    monkeypatch.setattr(maps, "gmaps", FakeGmaps("INVALID_REQUEST"))
+    for _ in range(resilience.FAILURE_THRESHOLD + 1):
+        assert maps.lookup_place("???")[1] == "INVALID_REQUEST"
+    assert maps.maps_available()
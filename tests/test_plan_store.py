@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from app.core import plan_store
+from app.graph import route_after_confidence, route_after_flights
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setattr(plan_store, "PLAN_STORE_ENABLED", True)
+    monkeypatch.setattr(plan_store, "PLAN_STORE_PATH", tmp_path / "plans.sqlite")
+    monkeypatch.setattr(plan_store, "_conn", None)
+    yield plan_store
+    if plan_store._conn is not None:
+        plan_store._conn.close()
+
+
+def _state(*places):
+    return {
+        "travel_style": "CULTURALE",
+        "itinerary": [{"day_number": 1, "focus": "Centro", "places": list(places)}],
+        "confidence_score": 1.0,
+    }
+
+
+def _place(name, verified=True):
+    return {"name": name, "description": "Verificato con Google Maps" if verified else "Non verificato (verifica interrotta)"}
+
+
+def test_equivalent_requests_share_a_key():
+    first = plan_store.plan_params({"destination": "Roma", "days_count": 3, "interests": "arte, cibo", "budget_value": 800.0})
+    second = plan_store.plan_params({"destination": " roma ", "days_count": 3, "interests": "cibo arte", "budget_value": 900.0})
+    assert plan_store.plan_key(first) == plan_store.plan_key(second)
+    assert first["budget"] == "750-1000"
+    assert plan_store.plan_params({"destination": "Roma"})["budget"] == "nd"
+
+
+def test_round_trip_and_missing_key(store):
+    params = {"destination": "roma"}
+    store.save_plan("k", params, _state(_place("Colosseo")))
+    cached = store.get_plan("k")
+    assert cached["itinerary"][0]["places"][0]["name"] == "Colosseo"
+    assert cached["stale_places"] == []
+    assert store.get_plan("altro") is None
+
+
+def test_only_verified_places_are_stamped(store):
+    store.save_plan("k", {}, _state(_place("Colosseo"), _place("Trattoria Inventata", verified=False)))
+    cached = store.get_plan("k")
+    assert set(cached["verified_at"]) == {"colosseo"}
+    assert cached["stale_places"] == ["Trattoria Inventata"]
+
+
+def test_fresh_timestamps_are_kept_and_stale_ones_refreshed(store):
+    old = time.time() - plan_store.PLACE_TTL_S - 10
+    recent = time.time() - 60
+    store.save_plan("k", {}, _state(_place("Colosseo"), _place("Pantheon")), {"colosseo": recent, "pantheon": old})
+    verified_at = store.get_plan("k")["verified_at"]
+    assert verified_at["colosseo"] == recent
+    assert verified_at["pantheon"] > recent
+
+
+def test_expired_plan_is_not_served(store, monkeypatch):
+    store.save_plan("k", {}, _state(_place("Colosseo")))
+    monkeypatch.setattr(plan_store, "PLAN_TTL_S", -1)
+    assert store.get_plan("k") is None
+
+
+def test_replanned_hit_goes_through_the_critic():
+    hit = {"key": "k", "hit": True, "stale_places": 2}
+    assert route_after_flights({"plan_cache": hit}) == "reverify"
+    assert route_after_confidence({"plan_cache": hit, "confidence_score": 1.0}) == "cached"
+    # Il Planner azzera l'hit quando ri-pianifica un piano salvato
+    replanned = {**hit, "hit": False}
+    assert route_after_confidence({"plan_cache": replanned, "confidence_score": 1.0}) == "continue"
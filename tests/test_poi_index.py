@@ -0,0 +1,32 @@
+import pytest
+
+from app.tools import poi_index
+from app.tools.poi_index import lookup_poi
+
+
+@pytest.fixture(autouse=True)
+def in_memory_index(monkeypatch, tmp_path):
+    # Indice ricostruito dal seed in una cartella temporanea (mai app/data/poi_index.sqlite)
+    monkeypatch.setattr(poi_index, "POI_DB_PATH", tmp_path / "poi_index.sqlite")
+    monkeypatch.setattr(poi_index, "_conn", None)
+    poi_index._city_index.cache_clear()
+    yield
+    poi_index._city_index.cache_clear()
+
+
+def test_name_and_alias_match_exactly():
+    assert lookup_poi("Colosseo", "Roma")["name"] == "Colosseo"
+    assert lookup_poi("Il Colosseo", "Rome")["name"] == "Colosseo"
+    assert lookup_poi("colosseum", "roma")["name"] == "Colosseo"
+    assert lookup_poi("Castel Sant Angelo", "Roma")["name"] == "Castel Sant'Angelo"
+
+
+def test_similar_but_different_places_are_not_matched():
+    assert lookup_poi("Galleria Borghese", "Roma") is None
+    assert lookup_poi("Fori Imperiali", "Roma") is None
+    assert lookup_poi("Palazzo Vecchio", "Firenze") is None
+    assert lookup_poi("Colosseo Quadrato", "Roma") is None
+
+
+def test_unknown_city():
+    assert lookup_poi("Colosseo", "Atlantide") is None
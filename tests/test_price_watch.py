@@ -0,0 +1,48 @@
+from datetime import date
+
+import pytest
+
+from app.tools import price_watch
+
+
+@pytest.fixture
+def calls(monkeypatch, tmp_path):
+    monkeypatch.setattr(price_watch, "PRICE_WATCH_DIR", tmp_path)
+    seen = []
+
+    def fake_search(**kwargs):
+        seen.append(kwargs)
+        return [{"title": "ITA", "price_value": 99.0}]
+
+    monkeypatch.setattr(price_watch, "search_flights_tool", fake_search)
+    return seen
+
+
+def test_check_bypasses_flight_cache(calls):
+    watch = price_watch.add_watch("Milano", "Londra", "2999-03-01")
+    event = price_watch.check_watch(watch)
+    assert event["best_price"] == 99.0
+    assert calls[0]["use_cache"] is False
+
+
+def test_expired_watch_is_not_searched_and_leaves_the_queue(calls):
+    price_watch.add_watch("Milano", "Londra", "2000-03-01")
+    price_watch.add_watch("Roma", "Parigi", "2999-03-01")
+    events = price_watch.run_scheduler(once=True)
+    assert {e["id"]: e.get("expired", False) for e in events} == {
+        "milano_londra_2000-03-01_ow": True,
+        "roma_parigi_2999-03-01_ow": False,
+    }
+    assert [c["origin"] for c in calls] == ["Roma"]
+    assert [w["id"] for w in price_watch.load_watches() if w["expired"]] == ["milano_londra_2000-03-01_ow"]
+
+    calls.clear()
+    events = price_watch.run_scheduler(once=True)
+    assert [e["id"] for e in events] == ["roma_parigi_2999-03-01_ow"]
+
+
+def test_is_expired():
+    today = date(2027, 3, 2)
+    assert price_watch.is_expired({"depart_date": "2027-03-01"}, today)
+    assert not price_watch.is_expired({"depart_date": "2027-03-02"}, today)
+    assert not price_watch.is_expired({"depart_date": ""}, today)
@@ -0,0 +1,52 @@
+import os
+
+from app.core.logger import TravelLogger
+from app.core.metrics import RunMetrics, metrics
+from app.tools import publisher
+
+
+def test_logger_creates_session_file_on_first_write(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    child = TravelLogger()
+    child.disable_file()
+    child.log_event("PUBLISHER", "INFO", "solo console")
+    assert not (tmp_path / "logs").exists()
+
+    parent = TravelLogger()
+    assert not (tmp_path / "logs").exists()
+    parent.log_event("PUBLISHER", "INFO", "su file")
+    assert os.listdir(tmp_path / "logs") == [os.path.basename(parent.session_file)]
+
+
+def test_merge_adds_child_snapshot():
+    parent = RunMetrics()
+    parent.incr("maps_calls", 2)
+    parent.record_time("report_docx", 0.5)
+    child = RunMetrics()
+    child.incr("maps_calls")
+    child.record_time("report_docx", 0.25)
+    parent.merge(child.snapshot())
+    snap = parent.snapshot()
+    assert snap["counters"]["maps_calls"] == 3
+    assert snap["timings"]["report_docx"] == {"calls": 2, "total_ms": 750.0, "last_ms": 250.0}
+
+
+def test_docx_worker_returns_its_metrics(monkeypatch):
+    def fake_docx(state):
+        metrics.incr("docx_pages", 3)
+        return "viaggio.docx"
+
+    monkeypatch.setattr(publisher, "generate_docx_report", fake_docx)
+    path, child_metrics = publisher._docx_worker({})
+    assert path == "viaggio.docx"
+    assert child_metrics["counters"] == {"docx_pages": 3}
+
+
+def test_docx_in_process_leaves_no_child_logs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    state = {"destination": "Roma", "itinerary": [
+        {"day_number": 1, "focus": "Centro", "places": [{"name": "Colosseo", "address": "Roma"}]},
+    ]}
+    path = publisher._docx_in_process(state)
+    assert path.endswith(".docx") and os.path.exists(path)
+    assert not (tmp_path / "logs").exists()
@@ -0,0 +1,49 @@
+from app.engine.ranking import _parse_hours, _parse_weights, _time_penalty, rank_flights
+
+
+def _row(title, price, duration=120, stops=0, depart_time="10:00"):
+    return {"title": title, "price_value": price, "duration": duration, "stops": stops, "depart_time": depart_time}
+
+
+def test_cheapest_wins_with_price_only_weights():
+    rows = [_row("caro", 300), _row("economico", 80), _row("medio", 150)]
+    ranked = rank_flights(rows, k=3, weights={"price": 1, "duration": 0, "stops": 0, "time": 0})
+    assert [r["title"] for r in ranked] == ["economico", "medio", "caro"]
+    assert ranked[0]["score"] == 0.0 and ranked[-1]["score"] == 1.0
+
+
+def test_top_k_and_stable_ties():
+    rows = [_row(f"volo {i}", 100) for i in range(10)]
+    ranked = rank_flights(rows, k=3)
+    assert [r["title"] for r in ranked] == ["volo 0", "volo 1", "volo 2"]
+
+
+def test_stops_and_departure_time_penalized():
+    rows = [_row("notturno con scalo", 100, stops=1, depart_time="03:00"), _row("diretto di giorno", 100)]
+    assert rank_flights(rows, k=1)[0]["title"] == "diretto di giorno"
+
+
+def test_missing_values_do_not_break_ranking():
+    rows = [{"title": "senza dati"}, _row("completo", 90)]
+    ranked = rank_flights(rows, k=2)
+    assert [r["title"] for r in ranked] == ["completo", "senza dati"]
+
+
+def test_rows_are_copied():
+    rows = [_row("a", 100)]
+    ranked = rank_flights(rows, k=1)
+    assert "score" in ranked[0] and "score" not in rows[0]
+
+
+def test_empty_input_and_k_zero():
+    assert rank_flights([], k=3) == []
+    assert rank_flights([_row("a", 1)], k=0) == []
+
+
+def test_config_parsers():
+    assert _parse_weights("price=0.7, stops=abc,time=0.3") == {"price": 0.7, "time": 0.3}
+    assert _parse_hours("6-22") == (6, 22)
+    assert _parse_hours("sempre") == (7, 21)
+    assert _time_penalty(9, (7, 21)) == 0.0
+    assert _time_penalty(4, (7, 21)) == 0.5
+    assert _time_penalty(None, (7, 21)) == 0.5
@@ -0,0 +1,50 @@
+import json
+
+from app.core.utils import repair_json, safe_json_parse
+from app.engine.structured import PLANNER_SCHEMA, parse_structured
+
+
+def test_single_quotes_and_python_literals():
+    repaired = repair_json("{'style': 'RELAX', 'ok': True, 'note': None}")
+    assert json.loads(repaired) == {"style": "RELAX", "ok": True, "note": None}
+
+
+def test_escaped_apostrophe_in_single_quoted_string():
+    assert json.loads(repair_json("{'focus': 'l\\'arte'}")) == {"focus": "l'arte"}
+
+
+def test_other_escapes_are_preserved():
+    assert json.loads(repair_json("{'a': 'x\\\"y', 'b': 'c\\\\d', 'c': 'riga\\nnuova'}")) == {
+        "a": 'x"y', "b": "c\\d", "c": "riga\nnuova",
+    }
+
+
+def test_double_quotes_inside_single_quoted_string():
+    assert json.loads(repair_json("{'name': 'Bar \"Da Gino\"'}")) == {"name": 'Bar "Da Gino"'}
+
+
+def test_prose_and_trailing_commas():
+    text = 'Ecco il piano:\n```json\n{"itinerary": [{"day_number": 1, "places": [],},],}\n```\nBuon viaggio!'
+    assert json.loads(repair_json(text)) == {"itinerary": [{"day_number": 1, "places": []}]}
+
+
+def test_truncated_output_drops_incomplete_element():
+    text = '{"itinerary": [{"day_number": 1, "places": [{"name": "Colosseo"}]}, {"day_number": 2, "pla'
+    data = json.loads(repair_json(text))
+    assert data["itinerary"][0]["places"] == [{"name": "Colosseo"}]
+
+
+def test_safe_json_parse_falls_back_to_default():
+    assert safe_json_parse("nessun json qui", {"fallback": True}) == {"fallback": True}
+
+
+def test_planner_schema_accepts_rest_day_without_places():
+    data, errors = parse_structured('{"itinerary": [{"day_number": 1, "focus": "Riposo", "places": []}]}', PLANNER_SCHEMA)
+    assert errors == []
+    assert data["itinerary"][0]["places"] == []
+
+
+def test_planner_schema_rejects_missing_places():
+    data, errors = parse_structured('{"itinerary": [{"day_number": 1}]}', PLANNER_SCHEMA)
+    assert data is None
+    assert any("places" in error for error in errors)
@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from app.tools import resilience
+from app.tools.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, ProviderError, RateLimiter,
+    SingleFlight, call_with_resilience,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_registry(monkeypatch):
+    monkeypatch.setattr(resilience, "_BREAKERS", {})
+    monkeypatch.setattr(resilience, "_LATENCIES", {})
+    monkeypatch.setattr(resilience, "_RATE_LIMITERS", {})
+
+
+def _fail(error):
+    def fn():
+        raise error
+    return fn
+
+
+def test_breaker_opens_after_threshold_and_recovers():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure("boom")
+    assert breaker.state == CLOSED
+    breaker.record_failure("boom")
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # una sola chiamata di prova
+    assert breaker.state == HALF_OPEN and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_quota_error_opens_circuit_immediately():
+    with pytest.raises(ProviderError):
+        call_with_resilience("quota_provider", _fail(ProviderError("OVER_QUERY_LIMIT", quota=True)))
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience("quota_provider", lambda: "mai chiamata")
+
+
+def test_client_errors_do_not_open_circuit(monkeypatch):
+    monkeypatch.setattr(resilience, "FAILURE_THRESHOLD", 2)
+    for _ in range(5):
+        with pytest.raises(ProviderError):
+            call_with_resilience("client_provider", _fail(ProviderError("INVALID_REQUEST", client_error=True)))
+    assert resilience.get_breaker("client_provider").state == CLOSED
+    assert call_with_resilience("client_provider", lambda: "ok") == "ok"
+
+
+def test_transport_errors_open_circuit():
+    breaker = resilience.get_breaker("flaky_provider")
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(OSError):
+            call_with_resilience("flaky_provider", _fail(OSError("connection reset")))
+    assert breaker.is_open
+
+
+def test_client_error_flag_ignored_for_quota():
+    assert ProviderError("429", quota=True, client_error=True).client_error is False
+
+
+def test_rate_limiter_try_acquire_respects_burst():
+    limiter = RateLimiter(rate_per_min=60, burst=2)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+
+def test_hedge_skipped_without_rate_limiter_token(monkeypatch):
+    provider = "hedged_provider"
+    resilience.get_breaker(provider)
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        resilience._LATENCIES[provider].observe(0.001)
+    limiter = RateLimiter(rate_per_min=1, burst=1)
+    assert limiter.try_acquire()  # bucket vuoto: la prima chiamata ha già preso il suo token
+    monkeypatch.setitem(resilience._RATE_LIMITERS, provider, limiter)
+
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return "ok"
+
+    assert resilience._hedged(provider, slow) == "ok"
+    assert len(calls) == 1
+
+
+def test_queue_wait_does_not_trigger_hedge(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    provider = "queued_provider"
+    resilience.get_breaker(provider)
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        resilience._LATENCIES[provider].observe(0.01)
+    primary_pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(resilience, "_PRIMARY_POOL", primary_pool)
+    release = threading.Event()
+    primary_pool.submit(release.wait)  # pool occupato: la prossima primaria resta in coda
+    threading.Timer(0.1, release.set).start()
+
+    calls = []
+
+    def fast():
+        calls.append(threading.current_thread().name)
+        return "ok"
+
+    assert resilience._hedged(provider, fast) == "ok"
+    assert len(calls) == 1 and not calls[0].startswith("hedge")
+    primary_pool.shutdown()
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "risultato"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    follower.start()
+    time.sleep(0.02)
+    release.set()
+    leader.join(1)
+    follower.join(1)
+    assert results == ["risultato", "risultato"]
+    assert len(calls) == 1
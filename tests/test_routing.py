@@ -0,0 +1,75 @@
+from app.engine.routing import optimize_itinerary
+
+
+def _place(name, lat, lng):
+    return {"name": name, "lat": lat, "lng": lng}
+
+
+NORTH = [_place(f"Nord {i}", 45.0 + i * 0.001, 9.0) for i in range(3)]
+SOUTH = [_place(f"Sud {i}", 41.0 + i * 0.001, 12.0) for i in range(3)]
+
+
+def test_regrouped_days_get_a_new_focus():
+    itinerary = [
+        {"day_number": 1, "focus": "Musei", "places": [NORTH[0], SOUTH[0], NORTH[1]]},
+        {"day_number": 2, "focus": "Cucina", "places": [SOUTH[1], NORTH[2], SOUTH[2]]},
+    ]
+    optimized, metrics = optimize_itinerary(itinerary)
+    assert metrics["regrouped"]
+    for day in optimized:
+        names = {p["name"].split()[0] for p in day["places"]}
+        assert len(names) == 1  # un solo cluster per giorno
+        assert day["focus"].startswith("Tappe vicine: ")
+        assert all(p["name"] in day["focus"] for p in day["places"])
+
+
+def test_unchanged_days_keep_planner_focus():
+    itinerary = [
+        {"day_number": 1, "focus": "Nord", "places": [NORTH[2], NORTH[0], NORTH[1]]},
+        {"day_number": 2, "focus": "Sud", "places": list(SOUTH)},
+    ]
+    optimized, _ = optimize_itinerary(itinerary)
+    assert [day["focus"] for day in optimized] == ["Nord", "Sud"]
+    assert sorted(p["name"] for p in optimized[0]["places"]) == sorted(p["name"] for p in NORTH)
+
+
+def test_input_itinerary_is_not_mutated():
+    day = {"day_number": 1, "focus": "Musei", "places": [NORTH[0], SOUTH[0], NORTH[1]]}
+    other = {"day_number": 2, "focus": "Cucina", "places": [SOUTH[1], NORTH[2], SOUTH[2]]}
+    optimize_itinerary([day, other])
+    assert day["focus"] == "Musei" and day["places"][1] is SOUTH[0]
+
+
+def _district(prefix, lat, lng, n=3):
+    return [_place(f"{prefix} {i}", lat + i * 0.002, lng + i * 0.002) for i in range(n)]
+
+
+def test_multi_city_days_keep_the_planner_order():
+    # Giorni 1-2 a Milano, 3-4 a Napoli; dentro ogni città i quartieri sono mescolati
+    brera, navigli = _district("Brera", 45.472, 9.187), _district("Navigli", 45.450, 9.175)
+    centro, vomero = _district("Centro", 40.848, 14.257), _district("Vomero", 40.845, 14.230)
+    itinerary = [
+        {"day_number": 1, "focus": "Milano", "places": [brera[0], navigli[0], brera[1]]},
+        {"day_number": 2, "focus": "Milano", "places": [navigli[1], brera[2], navigli[2]]},
+        {"day_number": 3, "focus": "Napoli", "places": [centro[0], vomero[0], centro[1]]},
+        {"day_number": 4, "focus": "Napoli", "places": [vomero[1], centro[2], vomero[2]]},
+    ]
+    optimized, metrics = optimize_itinerary(itinerary)
+    assert metrics["regrouped"]
+    cities = [{p["lat"] > 43 for p in day["places"]} for day in optimized]
+    assert cities == [{True}, {True}, {False}, {False}]
+    districts = [{p["name"].split()[0] for p in day["places"]} for day in optimized]
+    assert all(len(names) == 1 for names in districts)
+    # Un solo trasferimento Milano -> Napoli (~660 km), non andata e ritorno
+    assert 600 < metrics["transfer_km"] < 700
+    assert metrics["total_km"] < metrics["original_km"]
+
+
+def test_transfers_count_in_the_totals():
+    itinerary = [
+        {"day_number": 1, "focus": "Nord", "places": list(NORTH)},
+        {"day_number": 2, "focus": "Sud", "places": list(SOUTH)},
+    ]
+    _, metrics = optimize_itinerary(itinerary)
+    assert metrics["transfer_km"] > 400
+    assert metrics["total_km"] == round(sum(metrics["per_day_km"].values()) + metrics["transfer_km"], 2)
@@ -0,0 +1,47 @@
+from app.engine import nodes, prompts
+
+
+def _fake_pipeline(monkeypatch, aborted_variants):
+    calls = {"route": 0, "critic": 0}
+
+    def planner(state):
+        variant = state["planner_variant"]
+        return {"itinerary": [{"day_number": 1, "places": [{"name": variant[:20]}]}], "retry_count": 1}
+
+    def finder(state):
+        aborted = state["planner_variant"] in aborted_variants
+        return {"verification_aborted": "low_confidence" if aborted else None}
+
+    def route(state):
+        calls["route"] += 1
+        return {}
+
+    def confidence(state):
+        return {"confidence_score": 1.0}
+
+    def critic(state):
+        calls["critic"] += 1
+        return {"is_approved": True, "critic_feedback": None}
+
+    monkeypatch.setattr(nodes, "SPECULATIVE_CANDIDATES", 2)
+    monkeypatch.setattr(nodes, "trip_planner_node", planner)
+    monkeypatch.setattr(nodes, "places_finder_node", finder)
+    monkeypatch.setattr(nodes, "route_optimizer_node", route)
+    monkeypatch.setattr(nodes, "confidence_evaluator_node", confidence)
+    monkeypatch.setattr(nodes, "logistics_critic_node", critic)
+    return calls
+
+
+def test_aborted_candidate_skips_critic_and_selection(monkeypatch):
+    calls = _fake_pipeline(monkeypatch, {prompts.PLANNER_VARIANTS[0]})
+    update = nodes.speculative_planner_node({"retry_count": 0})
+    assert calls == {"route": 1, "critic": 1}
+    assert update["is_approved"] is True
+    assert update["itinerary"][0]["places"][0]["name"] == prompts.PLANNER_VARIANTS[1][:20]
+
+
+def test_all_candidates_aborted_falls_back_to_standard_loop(monkeypatch):
+    calls = _fake_pipeline(monkeypatch, set(prompts.PLANNER_VARIANTS[:2]))
+    update = nodes.speculative_planner_node({"retry_count": 0})
+    assert calls == {"route": 0, "critic": 0}
+    assert update == {"is_approved": False, "retry_count": 1}
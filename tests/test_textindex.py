@@ -0,0 +1,67 @@
+from app.core.textindex import TrigramIndex, fuzzy_unique, place_key, unique_places
+from app.engine.confidence import ConfidenceTracker
+
+
+def test_place_key_ignores_articles_accents_and_punctuation():
+    assert place_key("Il Colosseo") == place_key("colosseo") == "colosseo"
+    assert place_key("Castel Sant'Angelo") == place_key("Castel Sant Angelo")
+    assert place_key("Città del Vaticano") == "citta vaticano"
+
+
+def test_place_key_keeps_different_places_apart():
+    pairs = [
+        ("Trattoria da Mario", "Trattoria da Maria"),
+        ("Piazza Parigi 2-1", "Piazza Parigi 1-2"),
+        ("Chiesa di San Giovanni", "Chiesa di San Giovanni Battista"),
+    ]
+    for first, second in pairs:
+        assert place_key(first) != place_key(second)
+
+
+def test_unique_places_is_exact():
+    names = ["Il Colosseo", "Colosseo", "Trattoria da Mario", "Trattoria da Maria", "", "  "]
+    assert unique_places(names) == ["Il Colosseo", "Trattoria da Mario", "Trattoria da Maria"]
+
+
+def test_confidence_tracker_skip():
+    tracker = ConfidenceTracker(4, threshold=0.75)
+    tracker.record(True)
+    tracker.skip()
+    assert tracker.total == 3 and tracker.remaining == 2
+    tracker.record(True)
+    tracker.record(True)
+    tracker.skip()  # niente da togliere: il conteggio resta coerente
+    assert tracker.total == 3 and tracker.ratio == 1.0
+
+
+def test_trigram_index_matches_spelling_variants():
+    index = TrigramIndex(["Colosseo", "Musei Vaticani"])
+    assert index.contains("Colosseum")
+    assert index.best("Il Colosseo") == "Colosseo"
+    assert not index.contains("Piazza Navona")
+
+
+def test_fuzzy_unique_keeps_first_variant():
+    assert fuzzy_unique(["Colosseo", "Colosseum", "Pantheon", ""]) == ["Colosseo", "Pantheon"]
+
+
+def test_planner_drops_banned_place_variants(monkeypatch):
+    from app.engine import nodes
+
+    proposed = {"itinerary": [{"day_number": 1, "focus": "Centro", "places": [
+        {"name": "Colosseum", "address": ""},
+        {"name": "Piazza Navona", "address": ""},
+    ]}]}
+    monkeypatch.setattr(nodes, "invoke_structured", lambda *args, **kwargs: proposed)
+    state = {
+        "destination": "Roma",
+        "travel_style": "Cultura",
+        "days": 1,
+        "days_count": 1,
+        "critic_feedback": "Troppo turistico",
+        "itinerary": [{"day_number": 1, "focus": "Centro", "places": [{"name": "Colosseo", "address": ""}]}],
+    }
+    result = nodes.trip_planner_node(state)
+    names = [place["name"] for place in result["itinerary"][0]["places"]]
+    assert names == ["Piazza Navona"]
+    assert result["banned_places"] == ["Colosseo"]
@@ -0,0 +1,94 @@
+from datetime import date
+
+import pytest
+
+from app.engine import nodes
+
+
+def _flight(price=120.0):
+    return {"title": "ITA 10:00", "price_value": price, "duration": 100, "stops": 0, "depart_time": "10:00"}
+
+
+@pytest.fixture
+def trip():
+    state = {
+        "destination": "Roma", "origin": "Milano", "days": "5", "budget_total": "1000",
+        "depart_date": "2099-03-01", "return_date": "2099-03-05",
+    }
+    state.update(nodes.normalize_node(state))
+    return state
+
+
+def test_normalize_parses_once(trip):
+    assert trip["days_count"] == 5
+    assert trip["budget_value"] == 1000.0
+    assert trip["daily_budget"] == 200.0
+    assert (trip["depart_on"], trip["return_on"]) == (date(2099, 3, 1), date(2099, 3, 5))
+
+
+def test_normalize_without_budget_or_dates():
+    update = nodes.normalize_node({"days": "tre"})
+    assert update["days_count"] == 1
+    assert update["budget_value"] is None and update["daily_budget"] is None
+    assert update["depart_on"] is None and update["return_on"] is None
+
+
+def test_budget_label_uses_typed_budget(trip):
+    assert nodes._budget_label(trip) == "1000€ totale (indicativo)"
+    assert nodes._budget_label({}) == "Non specificato"
+
+
+def test_changed_departure_keeps_dates_and_duration_in_sync(trip, monkeypatch):
+    searched = []
+
+    def fake_search(origin, destination, depart_date, return_date):
+        searched.append((origin, depart_date, return_date))
+        # Nessun volo alla data originale, voli alla nuova data
+        return [] if depart_date == "2099-03-01" else [_flight()]
+
+    answers = iter(["s", "2099-03-03", "s"])
+    monkeypatch.setattr(nodes, "search_flights_tool", fake_search)
+    monkeypatch.setattr(nodes, "flights_available", lambda: True)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    trip["plan_cache"] = {"key": "k", "params": {}, "hit": True}
+
+    update = nodes.flight_search_node(trip)
+
+    assert searched[:2] == [("Milano", "2099-03-01", "2099-03-05"), ("Milano", "2099-03-03", "2099-03-05")]
+    assert update["depart_on"] == date(2099, 3, 3) and update["depart_date"] == "2099-03-03"
+    assert update["return_on"] == date(2099, 3, 5) and update["return_date"] == "2099-03-05"
+    assert (update["days"], update["days_count"], update["daily_budget"]) == ("3", 3, 333.33)
+    # Il piano salvato era per 5 giorni: non è più servibile
+    assert update["plan_cache"]["hit"] is False
+    assert update["flight_options"][0]["depart_date"] == "2099-03-03"
+
+
+def test_unchanged_dates_leave_duration_alone(trip, monkeypatch):
+    monkeypatch.setattr(nodes, "search_flights_tool", lambda **kwargs: [_flight()])
+    monkeypatch.setattr("builtins.input", lambda prompt="": "s")
+    update = nodes.flight_search_node(trip)
+    assert update["depart_date"] == "2099-03-01"
+    assert "days_count" not in update and "plan_cache" not in update
+
+
+def test_plan_saved_under_the_final_duration(trip, monkeypatch):
+    from app.core.plan_store import plan_key, plan_params
+    from app.tools import publisher
+
+    saved = []
+    monkeypatch.setattr(nodes, "search_flights_tool", lambda **kwargs: [] if kwargs["depart_date"] == "2099-03-01" else [_flight()])
+    monkeypatch.setattr(nodes, "flights_available", lambda: True)
+    monkeypatch.setattr(nodes, "save_plan", lambda key, params, state, verified_at=None: saved.append((key, params)))
+    monkeypatch.setattr(publisher, "publish_reports", lambda state, formats=None: {})
+    answers = iter(["s", "2099-03-03", "s"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+    trip.update(nodes.plan_lookup_node(trip))
+    assert trip["plan_cache"]["params"]["days"] == "5"
+    trip.update(nodes.flight_search_node(trip))
+    trip.update({"is_approved": True, "confidence_score": 1.0, "report_formats": "json"})
+    nodes.publisher_node(trip)
+
+    three_days = plan_params({**trip, "days_count": 3})
+    assert saved == [(plan_key(three_days), three_days)]
+    assert three_days["days"] == "3"